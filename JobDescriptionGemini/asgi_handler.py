@@ -0,0 +1,314 @@
+"""
+Async serving mode of handler.py
+
+$ pip install quart quart-cors hypercorn
+$ hypercorn asgi_handler:app --bind 0.0.0.0:3002
+
+A generation waits on Gemini for seconds, here it only holds a coroutine instead of a worker,
+so one process keeps up to GEMINI_MAX_CONCURRENCY generations in flight.
+"""
+
+import asyncio
+import os
+from functools import partial
+from quart import Quart, Response, request, jsonify
+from quart_cors import route_cors
+from generation import PromptTooLargeError, HTMLWrapStream, EVENT_STREAM, sse_event, stream_piece
+from usage import process_rss, configure_logging
+from resilience import UNAVAILABLE_ERRORS
+from service import GenerationService
+from singleflight import AsyncSingleFlight
+from batch import ndjsonMimetypeSet, read_ndjson, dump_line
+
+# Generations running at once, the rest wait for a free slot
+MAX_CONCURRENCY = int(os.getenv('GEMINI_MAX_CONCURRENCY', '100'))
+# Seconds a request waits for its generation, slot included, before a 504
+TIMEOUT = float(os.getenv('GEMINI_TIMEOUT', '30'))
+
+app = Quart(__name__)
+
+# Token counts of every generation are logged, see USAGE_LOG_LEVEL
+configure_logging()
+
+# The model, the generation cache and the upstream (rate limit, retries, circuit breaker), set up from the environment
+service = GenerationService.from_env()
+
+# Identical requests arriving together wait on one generation
+singleFlight = AsyncSingleFlight()
+
+
+class GenerationGate:
+    # Bounded concurrency for the async generation calls, with counters for /metrics
+    # The semaphore is created on the running event loop, asyncio primitives can not move between loops
+
+    def __init__(self, maxConcurrency, onTimeout=None):
+        self.maxConcurrency = maxConcurrency
+        # Called when a generation that got its slot times out, ex: to count it as a failure of Gemini
+        self.onTimeout = onTimeout
+        self.inFlight = 0
+        self.peakInFlight = 0
+        self.completed = 0
+        self.timeouts = 0
+        # Timeouts while waiting for a slot: local overload, not a slow Gemini
+        self.queueTimeouts = 0
+        self.failures = 0
+        self._semaphore = None
+        self._loop = None
+
+    def _getSemaphore(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._semaphore = asyncio.Semaphore(self.maxConcurrency)
+            self._loop = loop
+        return self._semaphore
+
+    def _release(self):
+        self.inFlight -= 1
+        self._semaphore.release()
+
+    async def start(self, generate, prompt, timeout):
+        # Waits for a slot and starts the generation, the slot is held until finish() is called
+        # Raises asyncio.TimeoutError when waiting for a slot plus the generation (its first chunk
+        # when streamed) takes longer than timeout
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        try:
+            await asyncio.wait_for(self._getSemaphore().acquire(), timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            self.queueTimeouts += 1
+            raise
+        self.inFlight += 1
+        self.peakInFlight = max(self.peakInFlight, self.inFlight)
+        try:
+            return await asyncio.wait_for(generate(prompt), deadline - loop.time())
+        except asyncio.TimeoutError:
+            self._release()
+            self.timeouts += 1
+            if self.onTimeout is not None:
+                self.onTimeout()
+            raise
+        except Exception:
+            self._release()
+            self.failures += 1
+            raise
+        except BaseException:
+            self._release()
+            raise
+
+    def finish(self, failed=False):
+        self._release()
+        if failed:
+            self.failures += 1
+        else:
+            self.completed += 1
+
+    async def run(self, generate, prompt, timeout):
+        response = await self.start(generate, prompt, timeout)
+        self.finish()
+        return response
+
+    def metrics(self):
+        return {
+            'maxConcurrency': self.maxConcurrency,
+            'inFlight': self.inFlight,
+            'peakInFlight': self.peakInFlight,
+            'completed': self.completed,
+            'timeouts': self.timeouts,
+            'queueTimeouts': self.queueTimeouts,
+            'failures': self.failures,
+        }
+
+
+# A timeout cancels the call to Gemini, it is still a failure for the circuit breaker
+# Only once the generation got its slot, a request that timed out waiting for one says nothing about Gemini
+gate = GenerationGate(MAX_CONCURRENCY, onTimeout=service.upstream.record_failure)
+
+
+class GenerationStream:
+    # Body of a /stream response: the chunks of a started generation, wrapped and formatted as they arrive
+    # The gate slot is held until the last chunk, or until Quart closes the body (ex: the client went away).
+    # A class rather than an async generator, so aclose() releases the slot even if it never started.
+    # The whole job description is cached under key once the last chunk arrived
+
+    def __init__(self, gate, response, eventStream, key=None, prompt=''):
+        self.gate = gate
+        self.response = response
+        self.prompt = prompt
+        self.eventStream = eventStream
+        self.key = key
+        self._chunks = response.__aiter__()
+        self._wrapper = HTMLWrapStream()
+        self._pieces = []
+        self._open = True
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        while self._open:
+            try:
+                chunk = await self._chunks.__anext__()
+                self._pieces.append(self._wrapper.feed(chunk.text))
+                piece = stream_piece(self._pieces[-1], self.eventStream)
+            except StopAsyncIteration:
+                service.usageStats.record(self.response, self.prompt)
+                await self.aclose()
+                generated = any(self._pieces)
+                self._pieces.append(self._wrapper.close())
+                if generated and self.key is not None:
+                    service.generationCache.set(self.key, ''.join(self._pieces))
+                piece = stream_piece(self._pieces[-1], self.eventStream)
+                if self.eventStream:
+                    return piece + sse_event('', event='done')
+                if piece:
+                    return piece
+                break
+            except Exception as e:
+                # The status code is already sent, an event stream reports the error, chunked HTML just ends
+                await self.aclose(failed=True)
+                if self.eventStream:
+                    return sse_event(str(e), event='error')
+                break
+            if piece:
+                return piece
+        raise StopAsyncIteration
+
+    async def aclose(self, failed=False):
+        if self._open:
+            self._open = False
+            self.gate.finish(failed)
+
+
+async def generate(prompt, key):
+    # One generation, cached once done
+    response = await gate.run(partial(service.upstream.call_async, service.model.generate_content_async), prompt,
+                              TIMEOUT)
+    return service.generated(response, prompt, key)
+
+
+@app.route('/', methods=['POST'])
+@route_cors(allow_origin='*')  # allow all origins all methods.
+async def handler():
+    try:
+        data, key, cached = service.lookup(await request.get_json(), request.args.get('regenerate') == '1')
+        if cached is not None:
+            return cached
+        prompt = service.prompt(data)
+        # A regenerate joining a generation already in flight gets that new one too
+        return await singleFlight.do(key, partial(generate, prompt, key))
+    except asyncio.TimeoutError:
+        return f"Generation timed out after {TIMEOUT} seconds", 504
+    except PromptTooLargeError as e:
+        return str(e), 413
+    except UNAVAILABLE_ERRORS as e:
+        return service.unavailable(data, e)
+    except KeyError as e:
+        return f"KeyError: {str(e)}", 400
+    except Exception as e:
+        return str(e), 500
+
+
+@app.route('/stream', methods=['POST'])
+@route_cors(allow_origin='*')  # allow all origins all methods.
+async def stream():
+    # Same as / but the job description is sent while Gemini writes it
+    # Accept: text/event-stream gets Server-Sent Events, anything else gets chunked HTML
+    eventStream = request.accept_mimetypes.best_match(['text/html', EVENT_STREAM]) == EVENT_STREAM
+    mimetype = EVENT_STREAM if eventStream else 'text/html'
+    try:
+        data, key, cached = service.lookup(await request.get_json(), request.args.get('regenerate') == '1')
+        if cached is not None:
+            body = sse_event(cached) + sse_event('', event='done') if eventStream else cached
+            return Response(body, mimetype=mimetype)
+        prompt = service.prompt(data)
+        # Returns once the first chunk arrives, TIMEOUT only bounds the time to the first chunk
+        response = await gate.start(
+            partial(service.upstream.call_async, service.model.generate_content_async, stream=True), prompt, TIMEOUT
+        )
+    except asyncio.TimeoutError:
+        return f"Generation timed out after {TIMEOUT} seconds", 504
+    except PromptTooLargeError as e:
+        return str(e), 413
+    except UNAVAILABLE_ERRORS as e:
+        return service.unavailable(data, e)
+    except KeyError as e:
+        return f"KeyError: {str(e)}", 400
+    except Exception as e:
+        return str(e), 500
+    headers = {'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}  # no proxy buffering
+    return Response(GenerationStream(gate, response, eventStream, key, prompt), mimetype=mimetype, headers=headers)
+
+
+# Generations of one /batch running at once, the gate still caps all of them together
+BATCH_CONCURRENCY = int(os.getenv('BATCH_CONCURRENCY', '8'))
+
+
+def batch_result(line, data, task):
+    # The finished NDJSON line of an item, a generation that timed out is a 504 like on '/'
+    if not task.cancelled() and isinstance(task.exception(), asyncio.TimeoutError):
+        line.update(status=504, error=f"Generation timed out after {TIMEOUT} seconds")
+        return dump_line(line)
+    return service.batch_result(line, data, task)
+
+
+async def batch_done(waiting):
+    # Lines of the items whose generation completed, waiting: task -> [(line, data)] sharing it
+    done, _ = await asyncio.wait(waiting, return_when=asyncio.FIRST_COMPLETED)
+    return [batch_result(line, data, task) for task in done for line, data in waiting.pop(task)]
+
+
+async def generate_batch(items):
+    # One NDJSON line per item, sent as soon as its job description is ready (not in the request order)
+    # Identical payloads share one generation
+    keyToTask = {}
+    waiting = {}
+    for line, data, key, prompt in service.plan_batch(items, keyToTask):
+        if isinstance(line, str):
+            yield line
+            continue
+        if prompt is not None:
+            task = asyncio.ensure_future(singleFlight.do(key, partial(generate, prompt, key)))
+            keyToTask[key] = task
+            waiting[task] = []
+        task = keyToTask[key]
+        if task in waiting:
+            waiting[task].append((line, data))
+        else:
+            # Its duplicate was already sent
+            yield batch_result(line, data, task)
+        while len(waiting) >= BATCH_CONCURRENCY:
+            for result in await batch_done(waiting):
+                yield result
+    while waiting:
+        for result in await batch_done(waiting):
+            yield result
+
+
+@app.route('/batch', methods=['POST'])
+@route_cors(allow_origin='*')  # allow all origins all methods.
+async def batch_handler():
+    # Body: JSON array or NDJSON of bodies of '/', each with an optional 'id'
+    # Response: NDJSON of {'index', 'id', 'status', 'html' or 'error'}, one line per item as it completes
+    if request.mimetype in ndjsonMimetypeSet:
+        items = read_ndjson((await request.get_data(as_text=True)).splitlines())
+    else:
+        items = await request.get_json(silent=True)
+        if not isinstance(items, list):
+            return jsonify({'error': 'Expected a JSON array or NDJSON of job metadata'}), 400
+
+    return Response(generate_batch(items), mimetype='application/x-ndjson')
+
+
+@app.route('/metrics', methods=['GET'])
+async def metrics():
+    return jsonify({
+        'process': {'pid': os.getpid(), 'rssBytes': process_rss()},
+        'generation': gate.metrics(),
+        **service.metrics(),
+        'singleFlight': singleFlight.metrics(),
+    })
+
+
+if __name__ == '__main__':
+    app.run(debug=True, port=3002)
@@ -0,0 +1,32 @@
+import json
+from generation import clean_metadata
+
+# Content types read as one item per line, anything else is read as a JSON array
+ndjsonMimetypeSet = {'application/x-ndjson', 'application/jsonl', 'application/json-seq'}
+
+
+def read_ndjson(lines):
+    # One item per line so that the whole upload is never held in memory
+    for line in lines:
+        line = line.strip()
+        if line:
+            try:
+                yield json.loads(line)
+            except ValueError:
+                yield None
+
+
+def parse_item(index, item):
+    # Returns the NDJSON line of an item (its index, its 'id' when given) and its cleaned metadata,
+    # the metadata is None when the item is not like the body of '/' and the line already has its error
+    line = {'index': index}
+    if isinstance(item, dict) and 'id' in item:
+        line['id'] = item['id']
+    if not isinstance(item, dict) or not isinstance(item.get('values'), dict):
+        line.update(status=400, error="Expected an object with 'values'")
+        return line, None
+    return line, clean_metadata(item['values'])
+
+
+def dump_line(line):
+    return json.dumps(line) + '\n'
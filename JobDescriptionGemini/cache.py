@@ -0,0 +1,163 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from generation import MODEL_NAME, INSTRUCTION, generation_config
+
+
+class LRUCache:
+    # In-process cache bounded by maxsize, least recently used entries are evicted first
+    # Entries older than ttl seconds are treated as missing (ttl=None keeps them until evicted)
+
+    def __init__(self, maxsize=1024, ttl=None, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expiresAt = entry
+            if expiresAt is not None and expiresAt <= self.clock():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        if self.maxsize <= 0:
+            return
+        expiresAt = None if self.ttl is None else self.clock() + self.ttl
+        with self._lock:
+            self._entries[key] = (value, expiresAt)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SQLiteCache:
+    # On-disk cache in one SQLite file, shared by the workers of a host and kept across restarts
+    # Expired entries are treated as missing and deleted every PURGE_INTERVAL writes
+
+    PURGE_INTERVAL = 1000
+
+    def __init__(self, path, ttl=None, clock=time.time):
+        self.path = path
+        self.ttl = ttl
+        self.clock = clock
+        self._writes = 0
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        # Readers do not wait on writers (other workers)
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.execute(
+            'CREATE TABLE IF NOT EXISTS generations (key TEXT PRIMARY KEY, value TEXT NOT NULL, expiresAt REAL)'
+        )
+
+    def get(self, key):
+        with self._lock:
+            row = self._connection.execute('SELECT value, expiresAt FROM generations WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            return None
+        value, expiresAt = row
+        if expiresAt is not None and expiresAt <= self.clock():
+            return None
+        return value
+
+    def set(self, key, value):
+        expiresAt = None if self.ttl is None else self.clock() + self.ttl
+        with self._lock:
+            self._connection.execute('INSERT OR REPLACE INTO generations VALUES (?, ?, ?)', (key, value, expiresAt))
+            self._writes += 1
+            if self._writes % self.PURGE_INTERVAL == 0:
+                self._connection.execute('DELETE FROM generations WHERE expiresAt <= ?', (self.clock(),))
+
+    def __len__(self):
+        with self._lock:
+            return self._connection.execute('SELECT COUNT(*) FROM generations').fetchone()[0]
+
+
+def normalize_value(value):
+    # Values that only differ in case, whitespace or list order are the same, ex: ' Python ' and 'python'
+    if isinstance(value, str):
+        return ' '.join(value.split()).casefold()
+    if isinstance(value, dict):
+        return {str(key): normalize_value(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple, set)):
+        return sorted((normalize_value(item) for item in value), key=lambda item: json.dumps(item, sort_keys=True))
+    return value
+
+
+# Changing the model, its config or the instruction changes every key
+_promptVersion = hashlib.sha256(
+    json.dumps([MODEL_NAME, INSTRUCTION, generation_config], sort_keys=True).encode('utf-8')
+).hexdigest()
+
+
+class GenerationCache:
+    # Generated job descriptions keyed by the canonical metadata (see clean_metadata)
+    # Backend errors (ex: a locked or unwritable file) count as misses and never fail the request
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+        self.bypasses = 0
+        self.errors = 0
+
+    def key(self, data):
+        # Sorted keys and normalized values, str(data) depends on the order the client sent the fields in
+        canonical = json.dumps(normalize_value(data), sort_keys=True, separators=(',', ':'), default=str)
+        return hashlib.sha256((_promptVersion + '\0' + canonical).encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        try:
+            value = self.backend.get(key)
+        except Exception:
+            self.errors += 1
+            value = None
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def bypass(self):
+        # The client asked for a new generation (regenerate), its result still replaces the cached one
+        self.bypasses += 1
+
+    def set(self, key, value):
+        try:
+            self.backend.set(key, value)
+        except Exception:
+            self.errors += 1
+
+    def metrics(self):
+        lookups = self.hits + self.misses
+        metrics = {
+            'backend': type(self.backend).__name__,
+            'hits': self.hits,
+            'misses': self.misses,
+            'bypasses': self.bypasses,
+            'errors': self.errors,
+            'hitRate': self.hits / lookups if lookups else 0,
+        }
+        if isinstance(self.backend, LRUCache):
+            metrics['size'] = len(self.backend)
+            metrics['maxsize'] = self.backend.maxsize
+        return metrics
+
+
+def create_generation_cache(path=None, maxsize=1024, ttl=None):
+    # path: SQLite file of the on-disk backend, otherwise an in-process LRU cache of maxsize entries
+    backend = SQLiteCache(path, ttl) if path else LRUCache(maxsize, ttl)
+    return GenerationCache(backend)
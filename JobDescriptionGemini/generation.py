@@ -0,0 +1,196 @@
+import html
+import re
+import google.generativeai as genai
+
+# Shared by handler.py (Flask) and asgi_handler.py (Quart)
+# See https://ai.google.dev/api/python/google/generativeai/GenerativeModel
+MODEL_NAME = "gemini-1.5-flash"
+generation_config = {
+  "temperature": 1,
+  "top_p": 0.95,
+  "top_k": 64,
+  "max_output_tokens": 2000, #8192,
+  "response_mime_type": "text/plain",
+}
+safety_settings = [
+  {
+    "category": "HARM_CATEGORY_HARASSMENT",
+    "threshold": "BLOCK_MEDIUM_AND_ABOVE",
+  },
+  {
+    "category": "HARM_CATEGORY_HATE_SPEECH",
+    "threshold": "BLOCK_MEDIUM_AND_ABOVE",
+  },
+  {
+    "category": "HARM_CATEGORY_SEXUALLY_EXPLICIT",
+    "threshold": "BLOCK_MEDIUM_AND_ABOVE",
+  },
+  {
+    "category": "HARM_CATEGORY_DANGEROUS_CONTENT",
+    "threshold": "BLOCK_MEDIUM_AND_ABOVE",
+  },
+]
+
+# Metadata that should not end up in the prompt
+ignoredKeySet = {'_id', 'description', 'industryId', 'companyLocationId', 'isExactLocation', 'hireTerm'}
+
+# Fixed part of every prompt, or the system instruction of the model (see create_model)
+INSTRUCTION = ("Write a job description in rich text from the metadata below. Leave out the job title and how to apply. "
+               "Do not use ** or #, style with tags such as <h1> or <strong> and put every text in a tag like <p>.\n"
+               "Metadata:\n")
+
+# Longest value kept for a field, ex: a long list of skills pasted in
+MAX_FIELD_CHARS = 500
+# Shortest a field is cut to when the metadata is over budget
+MIN_FIELD_CHARS = 40
+# Most (estimated) tokens of metadata sent in one prompt
+METADATA_TOKEN_BUDGET = 800
+
+
+class PromptTooLargeError(ValueError):
+    pass
+
+
+def create_model(api_key, instructed=False):
+    # Configure the generative AI library with the API key
+    # instructed: INSTRUCTION is set once as the system instruction and prompts only carry the metadata
+    genai.configure(api_key=api_key)
+    return genai.GenerativeModel(
+        model_name=MODEL_NAME,
+        safety_settings=safety_settings,
+        generation_config=generation_config,
+        system_instruction=INSTRUCTION if instructed else None,
+    )
+
+
+def clean_metadata(data):
+    # Drops ignored and empty fields in place, the request's 'values' dictionary
+    for key in list(data):
+        if key in ignoredKeySet or not data[key]:
+            del data[key]
+    if 'experienceLevel' in data and 'isExperienceRequired' in data:
+        del data['isExperienceRequired']
+    return data
+
+
+_tokenPiece = re.compile(r'\w+|[^\w\s]')
+
+
+def estimate_tokens(text):
+    # Local estimate of Gemini tokens, close enough for a budget: about 4 characters of a word per token,
+    # every punctuation mark is a token
+    return sum((len(piece) + 3) // 4 for piece in _tokenPiece.findall(text))
+
+
+def _truncate(text, limit):
+    # Cut at the last space before limit, ex: 'Python, Flask, Django' -> 'Python, Flask…'
+    if len(text) <= limit:
+        return text
+    end = text.rfind(' ', 0, limit)
+    return text[:end if end > limit // 2 else limit].rstrip(' ,;') + '…'
+
+
+def render_metadata(data, limit=MAX_FIELD_CHARS):
+    # One 'key: value' line per field instead of the quotes and brackets of str(data)
+    return '\n'.join(f'{key}: {_truncate(_text(value), limit)}' for key, value in data.items())
+
+
+def compact_metadata(data):
+    # render_metadata() within METADATA_TOKEN_BUDGET: the longest fields are cut shorter until it fits
+    limit = MAX_FIELD_CHARS
+    while True:
+        metadata = render_metadata(data, limit)
+        tokens = estimate_tokens(metadata)
+        if tokens <= METADATA_TOKEN_BUDGET:
+            return metadata
+        if limit <= MIN_FIELD_CHARS:
+            raise PromptTooLargeError(f"Job metadata is too large: about {tokens} tokens, at most {METADATA_TOKEN_BUDGET}")
+        limit = max(MIN_FIELD_CHARS, limit // 2)
+
+
+def build_prompt(data, instructed=False):
+    # instructed: the model already has INSTRUCTION as its system instruction
+    metadata = compact_metadata(clean_metadata(data))
+    return metadata if instructed else INSTRUCTION + metadata
+
+
+def wrap_html(text):
+    # Every text should be covered in a tag, ex: 'Hello' -> '<p>Hello</p>'
+    if not text or text[0] != '<' or text[-1] != '>':
+        return "<p>" + text + "</p>"
+    return text
+
+
+def _label(key):
+    # 'experienceLevel' -> 'Experience level'
+    return re.sub(r'(?<=[a-z])(?=[A-Z])', ' ', key).capitalize()
+
+
+def _text(value):
+    # A metadata value on one line
+    if isinstance(value, bool):
+        return 'Yes' if value else 'No'
+    if isinstance(value, (list, tuple)):
+        return ', '.join(_text(item) for item in value)
+    if isinstance(value, dict):
+        return '; '.join(f'{key}: {_text(item)}' for key, item in value.items())
+    return ' '.join(str(value).split())
+
+
+def fallback_html(data):
+    # Plain job description from the cleaned metadata alone, served while Gemini is unavailable
+    items = ''.join(f"<li><strong>{html.escape(_label(key))}:</strong> {html.escape(_text(value))}</li>"
+                    for key, value in data.items())
+    return f"<h2>About the job</h2><ul>{items}</ul>"
+
+
+class HTMLWrapStream:
+    # wrap_html() for a response that arrives in chunks: feed() each chunk, send what it returns, then close()
+    # Text that does not start with '<' is wrapped in <p> as it streams. Tag-delimited text is sent up to
+    # its last '>' and the rest is held back, if text is still left after the last tag it gets its own <p>
+
+    def __init__(self):
+        # None until the first character is known
+        self._wrapped = None
+        self._held = ''
+
+    def feed(self, chunk):
+        if not chunk:
+            return ''
+        if self._wrapped is None:
+            self._wrapped = chunk[0] != '<'
+            if self._wrapped:
+                return "<p>" + chunk
+        if self._wrapped:
+            return chunk
+        text = self._held + chunk
+        end = text.rfind('>') + 1
+        self._held = text[end:]
+        return text[:end]
+
+    def close(self):
+        if self._wrapped is None:
+            return "<p></p>"
+        if self._wrapped:
+            return "</p>"
+        held = self._held
+        self._held = ''
+        # Whitespace after the last tag is not text to cover
+        return "<p>" + held + "</p>" if held.strip() else held
+
+
+EVENT_STREAM = 'text/event-stream'
+
+
+def sse_event(data, event=None):
+    # One Server-Sent Event, every line of data gets its own 'data:' field
+    lines = [f'event: {event}'] if event else []
+    lines += ['data: ' + line for line in data.split('\n')]
+    return '\n'.join(lines) + '\n\n'
+
+
+def stream_piece(text, eventStream):
+    # What is sent to the client for a piece of generated HTML
+    if not text:
+        return ''
+    return sse_event(text) if eventStream else text
@@ -8,97 +8,169 @@ https://ai.google.dev/gemini-api/docs/get-started/python
 """
 
 import os
-from flask import Flask, request, jsonify
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from functools import partial
+from flask import Flask, request, jsonify, Response, stream_with_context
 from flask_cors import CORS, cross_origin
-import google.generativeai as genai
-from dotenv import load_dotenv
+from generation import PromptTooLargeError, HTMLWrapStream, EVENT_STREAM, sse_event, stream_piece
+from usage import process_rss, configure_logging
+from resilience import UNAVAILABLE_ERRORS
+from service import GenerationService
+from singleflight import SingleFlight
+from batch import ndjsonMimetypeSet, read_ndjson
 
-# Load the .env file
-load_dotenv()
+app = Flask(__name__)
 
-# Get the API key from the environment variable
-api_key = os.getenv('API_KEY')
-if not api_key:
-    raise ValueError("API key missing")
+# Token counts of every generation are logged, see USAGE_LOG_LEVEL
+configure_logging()
 
-# Configure the generative AI library with the API key
-genai.configure(api_key=api_key)
+# The model, the generation cache and the upstream (rate limit, retries, circuit breaker), set up from the environment
+service = GenerationService.from_env()
+
+# Identical requests arriving together wait on one generation
+singleFlight = SingleFlight()
+
+
+def generate(prompt, key):
+    # One generation, cached once done
+    response = service.upstream.call(service.model.generate_content, prompt)
+    return service.generated(response, prompt, key)
 
-app = Flask(__name__)
 
-# Create the model
-# See https://ai.google.dev/api/python/google/generativeai/GenerativeModel
-generation_config = {
-  "temperature": 1,
-  "top_p": 0.95,
-  "top_k": 64,
-  "max_output_tokens": 2000, #8192,
-  "response_mime_type": "text/plain",
-}
-safety_settings = [
-  {
-    "category": "HARM_CATEGORY_HARASSMENT",
-    "threshold": "BLOCK_MEDIUM_AND_ABOVE",
-  },
-  {
-    "category": "HARM_CATEGORY_HATE_SPEECH",
-    "threshold": "BLOCK_MEDIUM_AND_ABOVE",
-  },
-  {
-    "category": "HARM_CATEGORY_SEXUALLY_EXPLICIT",
-    "threshold": "BLOCK_MEDIUM_AND_ABOVE",
-  },
-  {
-    "category": "HARM_CATEGORY_DANGEROUS_CONTENT",
-    "threshold": "BLOCK_MEDIUM_AND_ABOVE",
-  },
-]
-
-model = genai.GenerativeModel(
-  model_name="gemini-1.5-flash",
-  safety_settings=safety_settings,
-  generation_config=generation_config,
-)
-
-chat_session = model.start_chat(
-  history=[]
-)
 @app.route('/', methods=['POST'])
 @cross_origin()  # allow all origins all methods.
 def handler():
     try:
-        data = request.json['values']
-        # print(data)
-        if '_id' in data:
-            del data['_id']
-        if 'description' in data:
-            del data['description']
-        if 'industryId' in data:
-            del data['industryId']
-        if 'companyLocationId' in data:
-            del data['companyLocationId']
-        if 'isExactLocation' in data:
-            del data['isExactLocation']
-        if 'hireTerm' in data:
-            del data['hireTerm']
-        for key in list(data):
-            if not data[key]:
-                del data[key]
-        if 'experienceLevel' in data and 'isExperienceRequired' in data:
-            del data['isExperienceRequired']
-        # print(data)
-        prompt = "Write me a job description in rich text format according to the following metadata dictionary. Do not include the job title or how-to-apply section. Do not use ** or #. Instead, if you want to style it, use tag such as <h1> or <strong>. Make sure every text is covered in tag like <p>. Here's the rest of metadata from the user:"  + str(data)
-        response = chat_session.send_message(prompt)
-        if not response.text or response.text[0] != '<' or response.text[-1] != '>':
-            response.text = "<p>" + response.text + "</p>"
-        # print(type(response.text))
-        return response.text
+        data, key, cached = service.lookup(request.json, request.args.get('regenerate') == '1')
+        if cached is not None:
+            return cached
+        prompt = service.prompt(data)
+        # A regenerate joining a generation already in flight gets that new one too
+        return singleFlight.do(key, partial(generate, prompt, key))
+    except PromptTooLargeError as e:
+        return str(e), 413
+    except UNAVAILABLE_ERRORS as e:
+        return service.unavailable(data, e)
     except KeyError as e:
         return f"KeyError: {str(e)}", 400
     except ValueError as e:
         return str(e), 500
     except Exception as e:
         return str(e), 500
-    
+
+
+def stream_pieces(response, eventStream, key, prompt):
+    # Pieces of a streamed generation as they arrive, as chunked HTML or as Server-Sent Events
+    # The whole job description is cached under key once the last chunk arrived
+    wrapper = HTMLWrapStream()
+    pieces = []
+    try:
+        for chunk in response:
+            pieces.append(wrapper.feed(chunk.text))
+            yield stream_piece(pieces[-1], eventStream)
+        generated = any(pieces)
+        pieces.append(wrapper.close())
+        yield stream_piece(pieces[-1], eventStream)
+        service.usageStats.record(response, prompt)
+        if generated:
+            service.generationCache.set(key, ''.join(pieces))
+        if eventStream:
+            yield sse_event('', event='done')
+    except Exception as e:
+        # The status code is already sent, an event stream reports the error, chunked HTML just ends
+        if eventStream:
+            yield sse_event(str(e), event='error')
+
+
+@app.route('/stream', methods=['POST'])
+@cross_origin()  # allow all origins all methods.
+def stream():
+    # Same as / but the job description is sent while Gemini writes it
+    # Accept: text/event-stream gets Server-Sent Events, anything else gets chunked HTML
+    eventStream = request.accept_mimetypes.best_match(['text/html', EVENT_STREAM]) == EVENT_STREAM
+    mimetype = EVENT_STREAM if eventStream else 'text/html'
+    try:
+        data, key, cached = service.lookup(request.json, request.args.get('regenerate') == '1')
+        if cached is not None:
+            body = sse_event(cached) + sse_event('', event='done') if eventStream else cached
+            return Response(body, mimetype=mimetype)
+        prompt = service.prompt(data)
+        # Returns once the first chunk arrives
+        response = service.upstream.call(service.model.generate_content, prompt, stream=True)
+    except PromptTooLargeError as e:
+        return str(e), 413
+    except UNAVAILABLE_ERRORS as e:
+        return service.unavailable(data, e)
+    except KeyError as e:
+        return f"KeyError: {str(e)}", 400
+    except Exception as e:
+        return str(e), 500
+    headers = {'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}  # no proxy buffering
+    return Response(stream_with_context(stream_pieces(response, eventStream, key, prompt)),
+                    mimetype=mimetype, headers=headers)
+
+
+# Generations of /batch running at once, shared by every batch of the process
+BATCH_CONCURRENCY = int(os.getenv('BATCH_CONCURRENCY', '8'))
+batchExecutor = ThreadPoolExecutor(BATCH_CONCURRENCY)
+
+
+def batch_done(waiting):
+    # Lines of the items whose generation completed, waiting: future -> [(line, data)] sharing it
+    done, _ = wait(waiting, return_when=FIRST_COMPLETED)
+    for future in done:
+        for line, data in waiting.pop(future):
+            yield service.batch_result(line, data, future)
+
+
+def generate_batch(items):
+    # One NDJSON line per item, sent as soon as its job description is ready (not in the request order)
+    # Identical payloads share one generation, the upload is read no further than the executor can keep up
+    keyToFuture = {}
+    waiting = {}
+    for line, data, key, prompt in service.plan_batch(items, keyToFuture):
+        if isinstance(line, str):
+            yield line
+            continue
+        if prompt is not None:
+            future = batchExecutor.submit(singleFlight.do, key, partial(generate, prompt, key))
+            keyToFuture[key] = future
+            waiting[future] = []
+        future = keyToFuture[key]
+        if future in waiting:
+            waiting[future].append((line, data))
+        else:
+            # Its duplicate was already sent
+            yield service.batch_result(line, data, future)
+        while len(waiting) >= BATCH_CONCURRENCY * 2:
+            yield from batch_done(waiting)
+    while waiting:
+        yield from batch_done(waiting)
+
+
+@app.route('/batch', methods=['POST'])
+@cross_origin()  # allow all origins all methods.
+def batch_handler():
+    # Body: JSON array or NDJSON of bodies of '/', each with an optional 'id'
+    # Response: NDJSON of {'index', 'id', 'status', 'html' or 'error'}, one line per item as it completes
+    if request.mimetype in ndjsonMimetypeSet:
+        items = read_ndjson(request.stream)
+    else:
+        items = request.get_json(silent=True)
+        if not isinstance(items, list):
+            return jsonify({'error': 'Expected a JSON array or NDJSON of job metadata'}), 400
+
+    return Response(stream_with_context(generate_batch(items)), mimetype='application/x-ndjson')
+
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    return jsonify({
+        'process': {'pid': os.getpid(), 'rssBytes': process_rss()},
+        **service.metrics(),
+        'singleFlight': singleFlight.metrics(),
+    })
+
+
 if __name__ == '__main__':
     app.run(debug=True, port=3002)
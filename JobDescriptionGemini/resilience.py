@@ -0,0 +1,261 @@
+import asyncio
+import math
+import random
+import threading
+import time
+from google.api_core import exceptions
+
+# Errors worth another try: 429 (ResourceExhausted is one) and 503
+RETRYABLE_ERRORS = (exceptions.TooManyRequests, exceptions.ServiceUnavailable)
+# Errors meaning Gemini is not healthy, raised at once but counted by the circuit breaker: other 5xx (ex: 500,
+# 504 DeadlineExceeded) and transport errors (ex: connection reset, socket timeout)
+# Any other error (a 4xx) means Gemini answered, it is healthy
+FAILURE_ERRORS = (exceptions.ServerError, OSError)
+
+
+class CircuitOpenError(Exception):
+    # Gemini failed too often lately, calls fail fast until retryAfter seconds have passed
+    def __init__(self, retryAfter):
+        super().__init__(f"Gemini is unavailable, retry in {math.ceil(retryAfter)} seconds")
+        self.retryAfter = retryAfter
+
+
+class RateLimitedError(Exception):
+    # No request token freed up in time, our own quota is used up
+    def __init__(self, retryAfter):
+        super().__init__(f"Too many generations, retry in {math.ceil(retryAfter)} seconds")
+        self.retryAfter = retryAfter
+
+
+# Errors meaning Gemini can not take the request now, the client should come back later
+UNAVAILABLE_ERRORS = (CircuitOpenError, RateLimitedError) + RETRYABLE_ERRORS
+
+
+def retry_after(error, default=1):
+    # Seconds for the Retry-After header of a response to one of UNAVAILABLE_ERRORS
+    return max(1, math.ceil(getattr(error, 'retryAfter', default)))
+
+
+class TokenBucket:
+    # Client-side rate limiter: rate tokens per second, up to capacity saved for bursts
+    # Adaptive: throttle() halves the rate after a 429, recover() adds back a twentieth of it per success
+
+    def __init__(self, rate, capacity, minRate=None, clock=time.monotonic):
+        self.baseRate = rate
+        self.rate = rate
+        self.minRate = minRate if minRate is not None else rate / 16
+        self.capacity = capacity
+        self.clock = clock
+        self._tokens = capacity
+        self._updatedAt = clock()
+        self._lock = threading.Lock()
+
+    def take(self):
+        # Takes a token and returns 0, or returns the seconds until the next token
+        with self._lock:
+            now = self.clock()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updatedAt) * self.rate)
+            self._updatedAt = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0
+            return (1 - self._tokens) / self.rate
+
+    def acquire(self, timeout, sleep=time.sleep):
+        # Waits up to timeout seconds for a token, raises RateLimitedError otherwise
+        waited = 0
+        while True:
+            wait = self.take()
+            if wait == 0:
+                return
+            if waited + wait > timeout:
+                raise RateLimitedError(wait)
+            sleep(wait)
+            waited += wait
+
+    async def acquire_async(self, timeout):
+        waited = 0
+        while True:
+            wait = self.take()
+            if wait == 0:
+                return
+            if waited + wait > timeout:
+                raise RateLimitedError(wait)
+            await asyncio.sleep(wait)
+            waited += wait
+
+    def throttle(self):
+        with self._lock:
+            self.rate = max(self.minRate, self.rate / 2)
+
+    def recover(self):
+        with self._lock:
+            self.rate = min(self.baseRate, self.rate + self.baseRate / 20)
+
+
+class CircuitBreaker:
+    # closed: calls go through. open: after failureThreshold failures in a row, calls fail fast for
+    # resetTimeout seconds. half-open: then a single probe call decides whether to close or open again
+
+    def __init__(self, failureThreshold=5, resetTimeout=30.0, clock=time.monotonic):
+        self.failureThreshold = failureThreshold
+        self.resetTimeout = resetTimeout
+        self.clock = clock
+        self.state = 'closed'
+        self.failures = 0
+        self.opened = 0
+        self._openedAt = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def check(self):
+        # Raises CircuitOpenError when the call should not be made
+        with self._lock:
+            if self.state == 'open':
+                remaining = self._openedAt + self.resetTimeout - self.clock()
+                if remaining > 0:
+                    raise CircuitOpenError(remaining)
+                self.state = 'half-open'
+            if self.state == 'half-open':
+                if self._probing:
+                    raise CircuitOpenError(self.resetTimeout)
+                self._probing = True
+
+    def record_success(self):
+        with self._lock:
+            self.state = 'closed'
+            self.failures = 0
+            self._probing = False
+
+    def cancel(self):
+        # The call ended without an answer from Gemini (ex: rate limited or cancelled), let another probe go
+        with self._lock:
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == 'half-open' or self.failures >= self.failureThreshold:
+                if self.state != 'open':
+                    self.opened += 1
+                self.state = 'open'
+                self._openedAt = self.clock()
+            self._probing = False
+
+
+class Upstream:
+    # Calls to Gemini through the rate limiter, retries with jittered exponential backoff on 429/503,
+    # and the circuit breaker. FAILURE_ERRORS are raised at once and count towards opening the circuit,
+    # other errors (ex: a bad request) are raised at once and do not trip the breaker.
+
+    def __init__(self, limiter, breaker, retries=3, baseDelay=0.5, maxDelay=8.0, limitWait=10.0,
+                 sleep=time.sleep, random=random.random):
+        self.limiter = limiter
+        self.breaker = breaker
+        self.retries = retries
+        self.baseDelay = baseDelay
+        self.maxDelay = maxDelay
+        self.limitWait = limitWait
+        self.sleep = sleep
+        self.random = random
+        self.calls = 0
+        self.retried = 0
+        self.failures = 0
+        self.rejected = 0
+
+    def backoff(self, attempt):
+        # Full jitter: clients that failed together do not all come back together
+        return self.random() * min(self.maxDelay, self.baseDelay * 2 ** attempt)
+
+    def _before(self):
+        try:
+            self.breaker.check()
+        except CircuitOpenError:
+            self.rejected += 1
+            raise
+        self.calls += 1
+
+    def _failed(self, error, attempt):
+        # Returns the seconds to wait before the next attempt, or None when there are no attempts left
+        if isinstance(error, exceptions.TooManyRequests):
+            self.limiter.throttle()
+        if attempt == self.retries:
+            self.failures += 1
+            self.breaker.record_failure()
+            return None
+        self.retried += 1
+        return self.backoff(attempt)
+
+    def _succeeded(self):
+        self.breaker.record_success()
+        self.limiter.recover()
+
+    def record_failure(self):
+        # A call that failed without an exception going through call() (ex: a timeout cancelled it)
+        self.failures += 1
+        self.breaker.record_failure()
+
+    def call(self, fn, *args, **kwargs):
+        self._before()
+        try:
+            for attempt in range(self.retries + 1):
+                self.limiter.acquire(self.limitWait, self.sleep)
+                try:
+                    result = fn(*args, **kwargs)
+                except RETRYABLE_ERRORS as e:
+                    delay = self._failed(e, attempt)
+                    if delay is None:
+                        raise
+                    self.sleep(delay)
+                    continue
+                except FAILURE_ERRORS:
+                    self.record_failure()
+                    raise
+                except Exception:
+                    # Gemini answered, it is healthy
+                    self._succeeded()
+                    raise
+                self._succeeded()
+                return result
+        finally:
+            self.breaker.cancel()
+
+    async def call_async(self, fn, *args, **kwargs):
+        self._before()
+        try:
+            for attempt in range(self.retries + 1):
+                await self.limiter.acquire_async(self.limitWait)
+                try:
+                    result = await fn(*args, **kwargs)
+                except RETRYABLE_ERRORS as e:
+                    delay = self._failed(e, attempt)
+                    if delay is None:
+                        raise
+                    await asyncio.sleep(delay)
+                    continue
+                except FAILURE_ERRORS:
+                    self.record_failure()
+                    raise
+                except Exception:
+                    self._succeeded()
+                    raise
+                self._succeeded()
+                return result
+        finally:
+            self.breaker.cancel()
+
+    def metrics(self):
+        return {
+            'calls': self.calls,
+            'retried': self.retried,
+            'failures': self.failures,
+            'rejected': self.rejected,
+            'rate': self.limiter.rate,
+            'circuit': self.breaker.state,
+            'circuitOpened': self.breaker.opened,
+        }
+
+
+def create_upstream(requestsPerMinute=1000, burst=20, retries=3, breakerFailures=5, breakerReset=30.0):
+    # requestsPerMinute: our Gemini quota, burst: requests allowed at once on top of it
+    return Upstream(TokenBucket(requestsPerMinute / 60, burst), CircuitBreaker(breakerFailures, breakerReset), retries)
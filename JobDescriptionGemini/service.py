@@ -0,0 +1,134 @@
+import os
+from dotenv import load_dotenv
+from generation import create_model, clean_metadata, build_prompt, wrap_html, fallback_html, PromptTooLargeError
+from usage import UsageStats
+from cache import create_generation_cache
+from resilience import create_upstream, retry_after, UNAVAILABLE_ERRORS
+from batch import parse_item, dump_line
+
+
+class GenerationService:
+    # Shared by handler.py (Flask) and asgi_handler.py (Quart): the model and what sits in front of it,
+    # and the steps of a request that do not depend on the web framework
+
+    def __init__(self, model, generationCache, upstream, instructed=False, fallbackEnabled=False):
+        self.model = model
+        self.generationCache = generationCache
+        self.upstream = upstream
+        self.instructed = instructed
+        self.fallbackEnabled = fallbackEnabled
+        self.usageStats = UsageStats()
+
+    @classmethod
+    def from_env(cls):
+        # Load the .env file
+        load_dotenv()
+
+        # Get the API key from the environment variable
+        api_key = os.getenv('API_KEY')
+        if not api_key:
+            raise ValueError("API key missing")
+
+        # GEMINI_SYSTEM_INSTRUCTION=1 sends the fixed instruction as the model's system instruction
+        instructed = os.getenv('GEMINI_SYSTEM_INSTRUCTION') == '1'
+        return cls(
+            # Every request is a fresh single-turn generation, nothing is kept between requests
+            create_model(api_key, instructed),
+            # Generated job descriptions by canonical metadata, GENERATION_CACHE_PATH keeps them in a SQLite file
+            # instead
+            create_generation_cache(
+                path=os.getenv('GENERATION_CACHE_PATH'),
+                maxsize=int(os.getenv('GENERATION_CACHE_SIZE', '1024')),
+                ttl=float(os.getenv('GENERATION_CACHE_TTL', '86400')),
+            ),
+            # Rate limit, retries on 429/503 and circuit breaker in front of Gemini
+            create_upstream(
+                requestsPerMinute=float(os.getenv('GEMINI_REQUESTS_PER_MINUTE', '1000')),
+                burst=int(os.getenv('GEMINI_BURST', '20')),
+                retries=int(os.getenv('GEMINI_RETRIES', '3')),
+                breakerFailures=int(os.getenv('GEMINI_BREAKER_FAILURES', '5')),
+                breakerReset=float(os.getenv('GEMINI_BREAKER_RESET', '30')),
+            ),
+            instructed,
+            # GEMINI_FALLBACK=template serves a job description made from the metadata while Gemini is unavailable
+            os.getenv('GEMINI_FALLBACK') == 'template',
+        )
+
+    def unavailable(self, data, error):
+        # Gemini can not take the request now: the templated job description, or a 503 to retry later
+        if self.fallbackEnabled:
+            return fallback_html(data), 200, {'X-Fallback': 'template'}
+        return str(error), 503, {'Retry-After': str(retry_after(error))}
+
+    def cached(self, key, regenerate=False):
+        # The cached job description of key, None when there is none or it should be generated again
+        if regenerate:
+            self.generationCache.bypass()
+            return None
+        return self.generationCache.get(key)
+
+    def lookup(self, body, regenerate=False):
+        # Cleaned metadata, cache key and cached job description of a request body
+        # 'regenerate': true in the body (or regenerate, ex: from ?regenerate=1) skips the cached one
+        data = clean_metadata(body['values'])
+        key = self.generationCache.key(data)
+        return data, key, self.cached(key, regenerate or body.get('regenerate'))
+
+    def prompt(self, data):
+        return build_prompt(data, self.instructed)
+
+    def generated(self, response, prompt, key):
+        # HTML of a finished generation, cached under key
+        self.usageStats.record(response, prompt)
+        text = wrap_html(response.text)
+        # An empty generation is not worth keeping
+        if response.text:
+            self.generationCache.set(key, text)
+        return text
+
+    def plan_batch(self, items, running):
+        # Walks the items of a /batch, yields (line, data, key, prompt) for each:
+        # - line is already the NDJSON line (a str) of an item needing no generation (invalid, cached, too large)
+        # - prompt is None when running (key -> generation of the batch) has the generation of its key already
+        # running is read as the items are walked, the caller adds each generation it starts to it
+        for index, item in enumerate(items):
+            line, data = parse_item(index, item)
+            if data is None:
+                yield dump_line(line), None, None, None
+                continue
+            key = self.generationCache.key(data)
+            if key in running:
+                yield line, data, key, None
+                continue
+            cached = self.cached(key, item.get('regenerate'))
+            if cached is not None:
+                line.update(status=200, html=cached)
+                yield dump_line(line), data, key, None
+                continue
+            try:
+                prompt = self.prompt(data)
+            except PromptTooLargeError as e:
+                line.update(status=413, error=str(e))
+                yield dump_line(line), data, key, None
+                continue
+            yield line, data, key, prompt
+
+    def batch_result(self, line, data, future):
+        # The finished NDJSON line of an item, status is the one '/' would have answered with
+        try:
+            line.update(status=200, html=future.result())
+        except UNAVAILABLE_ERRORS as e:
+            if self.fallbackEnabled:
+                line.update(status=200, html=fallback_html(data), fallback=True)
+            else:
+                line.update(status=503, error=str(e), retryAfter=retry_after(e))
+        except Exception as e:
+            line.update(status=500, error=str(e))
+        return dump_line(line)
+
+    def metrics(self):
+        return {
+            'usage': self.usageStats.metrics(),
+            'generationCache': self.generationCache.metrics(),
+            'upstream': self.upstream.metrics(),
+        }
@@ -0,0 +1,79 @@
+import asyncio
+import threading
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    # Concurrent calls with the same key share one execution of fn: the first caller runs it and
+    # the others wait for its result (or its exception). Nothing is kept once the call is done.
+
+    def __init__(self):
+        self.calls = 0
+        self.saved = 0
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.calls += 1
+            else:
+                self.saved += 1
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        try:
+            call.result = fn()
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def metrics(self):
+        return {'calls': self.calls, 'saved': self.saved, 'inFlight': len(self._calls)}
+
+
+class AsyncSingleFlight:
+    # SingleFlight for coroutines: fn() runs once as a task that every caller with the same key awaits
+    # The task is shielded, a caller going away (ex: a disconnect) does not cancel it for the others
+
+    def __init__(self):
+        self.calls = 0
+        self.saved = 0
+        self._tasks = {}
+
+    async def do(self, key, fn):
+        task = self._tasks.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._tasks[key] = task
+            task.add_done_callback(lambda task: self._done(key, task))
+            self.calls += 1
+        else:
+            self.saved += 1
+        return await asyncio.shield(task)
+
+    def _done(self, key, task):
+        if self._tasks.get(key) is task:
+            del self._tasks[key]
+        # Marks the exception as retrieved when every caller went away before the task failed
+        if not task.cancelled():
+            task.exception()
+
+    def metrics(self):
+        return {'calls': self.calls, 'saved': self.saved, 'inFlight': len(self._tasks)}
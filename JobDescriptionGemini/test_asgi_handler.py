@@ -0,0 +1,219 @@
+import asyncio
+import json
+import time
+import unittest
+from unittest.mock import patch, MagicMock
+import asgi_handler
+from asgi_handler import app, GenerationGate
+from cache import GenerationCache, LRUCache
+from resilience import create_upstream
+
+
+class StubModel:
+    # Stands in for the Gemini model: every generation takes latency seconds
+    def __init__(self, text="<p>This is a job description.</p>", latency=0.0):
+        self.text = text
+        self.latency = latency
+        self.prompts = []
+
+    async def generate_content_async(self, prompt, stream=False):
+        self.prompts.append(prompt)
+        await asyncio.sleep(self.latency)
+        if stream:
+            return self.chunks()
+        return MagicMock(text=self.text)
+
+    async def chunks(self):
+        # The text in 3 chunks, each a latency apart
+        size = len(self.text) // 3 + 1
+        for start in range(0, len(self.text), size):
+            yield MagicMock(text=self.text[start:start + size])
+            await asyncio.sleep(self.latency)
+
+
+class AsgiHandlerTestCase(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.app = app.test_client()
+        # Every test starts with an empty generation cache
+        patcher = patch.object(asgi_handler.service, 'generationCache', GenerationCache(LRUCache()))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        # and a closed circuit, with a quota that never limits the tests
+        patcher = patch.object(asgi_handler.service, 'upstream', create_upstream(requestsPerMinute=600000, burst=1000))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.test_data = {
+            'values': {
+                'experienceLevel': 'Mid',
+                'skills': 'Python, Flask',
+                'location': 'Remote'
+            }
+        }
+
+    def distinct(self, count):
+        # Different metadata per request, identical ones would share one generation
+        return [{'values': dict(self.test_data['values'], title=f'Cook {index}')} for index in range(count)]
+
+    async def post(self, test_data):
+        response = await self.app.post('/', json=test_data)
+        return response.status_code, await response.get_data(as_text=True)
+
+    async def test_handler_success(self):
+        stub = StubModel()
+        with patch.object(asgi_handler.service, 'model', stub), patch.object(asgi_handler, 'gate', GenerationGate(10)):
+            status, body = await self.post(self.test_data)
+        self.assertEqual(status, 200)
+        self.assertEqual(body, "<p>This is a job description.</p>")
+        self.assertIn("skills: Python, Flask", stub.prompts[0])
+
+    async def test_handler_html_wrapping(self):
+        with patch.object(asgi_handler.service, 'model', StubModel(text="This is a job description.")):
+            status, body = await self.post(self.test_data)
+        self.assertEqual(status, 200)
+        self.assertEqual(body, "<p>This is a job description.</p>")
+
+    async def test_handler_missing_values_key(self):
+        with patch.object(asgi_handler.service, 'model', StubModel()):
+            status, body = await self.post({})
+        self.assertEqual(status, 400)
+        self.assertIn("KeyError", body)
+
+    async def test_slow_generations_run_concurrently(self):
+        # 50 generations of 0.2 seconds each take about 0.2 seconds, not 10
+        gate = GenerationGate(100)
+        with patch.object(asgi_handler.service, 'model', StubModel(latency=0.2)), patch.object(asgi_handler, 'gate', gate):
+            start = time.perf_counter()
+            results = await asyncio.gather(*(self.post(test_data) for test_data in self.distinct(50)))
+            elapsed = time.perf_counter() - start
+        self.assertEqual([status for status, _ in results], [200] * 50)
+        self.assertLess(elapsed, 2)
+        self.assertEqual(gate.peakInFlight, 50)
+        self.assertEqual(gate.completed, 50)
+        self.assertEqual(gate.inFlight, 0)
+
+    async def test_concurrency_is_bounded(self):
+        gate = GenerationGate(5)
+        with patch.object(asgi_handler.service, 'model', StubModel(latency=0.05)), patch.object(asgi_handler, 'gate', gate):
+            results = await asyncio.gather(*(self.post(test_data) for test_data in self.distinct(20)))
+        self.assertEqual([status for status, _ in results], [200] * 20)
+        self.assertEqual(gate.peakInFlight, 5)
+
+    async def test_slow_generation_times_out(self):
+        gate = GenerationGate(10)
+        with patch.object(asgi_handler.service, 'model', StubModel(latency=5)), patch.object(asgi_handler, 'gate', gate), \
+                patch.object(asgi_handler, 'TIMEOUT', 0.1):
+            status, body = await self.post(self.test_data)
+        self.assertEqual(status, 504)
+        self.assertIn("timed out", body)
+        self.assertEqual(gate.timeouts, 1)
+        self.assertEqual(gate.inFlight, 0)
+
+    async def test_timeouts_count_as_failures(self):
+        upstream = create_upstream(requestsPerMinute=600000, burst=1000, breakerFailures=1)
+        gate = GenerationGate(10, onTimeout=upstream.record_failure)
+        with patch.object(asgi_handler.service, 'model', StubModel(latency=5)), patch.object(asgi_handler, 'gate', gate), \
+                patch.object(asgi_handler.service, 'upstream', upstream), patch.object(asgi_handler, 'TIMEOUT', 0.1):
+            status, _ = await self.post(self.test_data)
+        self.assertEqual(status, 504)
+        self.assertEqual(upstream.breaker.state, 'open')
+
+    async def test_queue_timeouts_do_not_open_the_circuit(self):
+        # Every slot busy (here with a stream not read yet) against a healthy Gemini: the requests only time out
+        # waiting for a slot
+        upstream = create_upstream(requestsPerMinute=600000, burst=1000, breakerFailures=1)
+        gate = GenerationGate(1, onTimeout=upstream.record_failure)
+        await gate.start(StubModel().generate_content_async, 'prompt', 1)
+        with patch.object(asgi_handler.service, 'model', StubModel()), patch.object(asgi_handler, 'gate', gate), \
+                patch.object(asgi_handler.service, 'upstream', upstream), patch.object(asgi_handler, 'TIMEOUT', 0.1):
+            status, _ = await self.post(self.test_data)
+            self.assertEqual(status, 504)
+            self.assertEqual((gate.timeouts, gate.queueTimeouts), (1, 1))
+            self.assertEqual(upstream.breaker.state, 'closed')
+            gate.finish()
+            status, _ = await self.post(self.test_data)
+        self.assertEqual(status, 200)
+        self.assertEqual(gate.inFlight, 0)
+
+    async def test_stream(self):
+        gate = GenerationGate(10)
+        stub = StubModel(text="Fry eggs", latency=0.05)
+        with patch.object(asgi_handler.service, 'model', stub), patch.object(asgi_handler, 'gate', gate):
+            response = await self.app.post('/stream', json=self.test_data)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(await response.get_data(as_text=True), "<p>Fry eggs</p>")
+        self.assertEqual(gate.completed, 1)
+        self.assertEqual(gate.inFlight, 0)
+
+    async def test_stream_server_sent_events(self):
+        with patch.object(asgi_handler.service, 'model', StubModel(text="<p>Fry eggs</p>")), \
+                patch.object(asgi_handler, 'gate', GenerationGate(10)):
+            response = await self.app.post('/stream', json=self.test_data, headers={'Accept': 'text/event-stream'})
+            body = await response.get_data(as_text=True)
+        self.assertEqual(response.mimetype, 'text/event-stream')
+        self.assertTrue(body.endswith("event: done\ndata: \n\n"))
+        self.assertEqual(''.join(line[len('data: '):] for line in body.split('\n') if line.startswith('data: ')),
+                         "<p>Fry eggs</p>")
+
+    async def test_stream_holds_its_slot_until_the_last_chunk(self):
+        gate = GenerationGate(10)
+        body = asgi_handler.GenerationStream(gate, StubModel(text="Fry eggs").chunks(), eventStream=False)
+        await gate.start(StubModel().generate_content_async, 'prompt', 1)
+        self.assertEqual(gate.inFlight, 1)
+        self.assertEqual(await body.__anext__(), "<p>Fry")
+        self.assertEqual(gate.inFlight, 1)
+        # Quart closes the body when the client goes away
+        await body.aclose()
+        self.assertEqual(gate.inFlight, 0)
+        await body.aclose()
+        self.assertEqual(gate.inFlight, 0)
+
+    async def test_stream_first_chunk_times_out(self):
+        gate = GenerationGate(10)
+        with patch.object(asgi_handler.service, 'model', StubModel(latency=5)), patch.object(asgi_handler, 'gate', gate), \
+                patch.object(asgi_handler, 'TIMEOUT', 0.1):
+            response = await self.app.post('/stream', json=self.test_data)
+        self.assertEqual(response.status_code, 504)
+        self.assertEqual(gate.inFlight, 0)
+
+    async def test_cache(self):
+        stub = StubModel()
+        with patch.object(asgi_handler.service, 'model', stub):
+            results = [await self.post(self.test_data) for _ in range(3)]
+            regenerated = await self.post(dict(self.test_data, regenerate=True))
+        self.assertEqual(results + [regenerated], [(200, "<p>This is a job description.</p>")] * 4)
+        self.assertEqual(len(stub.prompts), 2)
+        self.assertEqual(asgi_handler.service.generationCache.metrics()['hits'], 2)
+
+    async def test_identical_requests_share_one_generation(self):
+        stub = StubModel(latency=0.1)
+        singleFlight = asgi_handler.AsyncSingleFlight()
+        with patch.object(asgi_handler.service, 'model', stub), patch.object(asgi_handler, 'singleFlight', singleFlight):
+            results = await asyncio.gather(*(self.post(self.test_data) for _ in range(20)))
+        self.assertEqual(results, [(200, "<p>This is a job description.</p>")] * 20)
+        self.assertEqual(len(stub.prompts), 1)
+        self.assertEqual(singleFlight.metrics(), {'calls': 1, 'saved': 19, 'inFlight': 0})
+
+    async def test_batch(self):
+        gate = GenerationGate(100)
+        stub = StubModel(latency=0.05)
+        test_data = self.distinct(20) + self.distinct(5) + [{'id': 'x'}]
+        with patch.object(asgi_handler.service, 'model', stub), patch.object(asgi_handler, 'gate', gate), \
+                patch.object(asgi_handler, 'BATCH_CONCURRENCY', 5):
+            response = await self.app.post('/batch', json=test_data)
+            body = await response.get_data(as_text=True)
+        lines = sorted((json.loads(line) for line in body.splitlines()), key=lambda line: line['index'])
+        self.assertEqual([line['status'] for line in lines], [200] * 25 + [400])
+        self.assertEqual(lines[0]['html'], "<p>This is a job description.</p>")
+        self.assertEqual(len(stub.prompts), 20)
+        self.assertEqual(gate.peakInFlight, 5)
+
+    async def test_metrics(self):
+        response = await self.app.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        generation = (await response.get_json())['generation']
+        self.assertEqual(generation['maxConcurrency'], asgi_handler.MAX_CONCURRENCY)
+
+
+if __name__ == '__main__':
+    unittest.main()
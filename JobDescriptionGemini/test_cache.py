@@ -0,0 +1,87 @@
+import os
+import tempfile
+import unittest
+from cache import LRUCache, SQLiteCache, GenerationCache, create_generation_cache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class BrokenBackend:
+    def get(self, key):
+        raise OSError("disk I/O error")
+
+    def set(self, key, value):
+        raise OSError("disk I/O error")
+
+
+class CacheTestCase(unittest.TestCase):
+
+    def test_key_ignores_field_order_case_whitespace_and_list_order(self):
+        cache = GenerationCache(LRUCache())
+        first = cache.key({'skills': ['Python', 'Flask'], 'location': 'Remote', 'experienceLevel': 'Mid'})
+        second = cache.key({'experienceLevel': ' mid', 'location': 'remote ', 'skills': ['flask', 'python']})
+        self.assertEqual(first, second)
+
+    def test_key_changes_with_values(self):
+        cache = GenerationCache(LRUCache())
+        self.assertNotEqual(cache.key({'experienceLevel': 'Mid'}), cache.key({'experienceLevel': 'Senior'}))
+        self.assertNotEqual(cache.key({'experienceLevel': 'Mid'}), cache.key({'level': 'Mid'}))
+
+    def test_lru_evicts_least_recently_used(self):
+        cache = LRUCache(maxsize=2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+        self.assertEqual((cache.get('a'), cache.get('b'), cache.get('c')), (1, None, 3))
+
+    def test_lru_expires_after_ttl(self):
+        clock = FakeClock()
+        cache = LRUCache(ttl=10, clock=clock)
+        cache.set('a', 1)
+        clock.now += 11
+        self.assertIsNone(cache.get('a'))
+
+    def test_sqlite_keeps_entries_across_instances(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'generations.sqlite')
+            SQLiteCache(path).set('a', '<p>Cook</p>')
+            cache = SQLiteCache(path)
+            self.assertEqual(cache.get('a'), '<p>Cook</p>')
+            self.assertEqual(len(cache), 1)
+
+    def test_sqlite_expires_after_ttl(self):
+        with tempfile.TemporaryDirectory() as directory:
+            clock = FakeClock()
+            cache = SQLiteCache(os.path.join(directory, 'generations.sqlite'), ttl=10, clock=clock)
+            cache.set('a', '<p>Cook</p>')
+            clock.now += 11
+            self.assertIsNone(cache.get('a'))
+
+    def test_hit_rate_and_bypasses(self):
+        cache = create_generation_cache(maxsize=10)
+        cache.get('a')
+        cache.set('a', '<p>Cook</p>')
+        cache.get('a')
+        cache.get('a')
+        cache.bypass()
+        metrics = cache.metrics()
+        self.assertEqual((metrics['hits'], metrics['misses'], metrics['bypasses']), (2, 1, 1))
+        self.assertAlmostEqual(metrics['hitRate'], 2 / 3)
+        self.assertEqual(metrics['size'], 1)
+
+    def test_backend_errors_are_misses(self):
+        cache = GenerationCache(BrokenBackend())
+        cache.set('a', '<p>Cook</p>')
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(cache.metrics()['errors'], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,107 @@
+import subprocess
+import sys
+import unittest
+from unittest.mock import MagicMock
+from generation import INSTRUCTION, METADATA_TOKEN_BUDGET, clean_metadata, build_prompt, wrap_html, HTMLWrapStream, sse_event, \
+    render_metadata, estimate_tokens, PromptTooLargeError
+from usage import UsageStats
+
+
+class GenerationTestCase(unittest.TestCase):
+
+    def test_clean_metadata_drops_ignored_and_empty_fields(self):
+        data = {'_id': '1', 'description': 'old', 'skills': '', 'location': None,
+                'experienceLevel': 'Mid', 'isExperienceRequired': True, 'title': 'Cook'}
+        self.assertEqual(clean_metadata(data), {'experienceLevel': 'Mid', 'title': 'Cook'})
+
+    def test_build_prompt(self):
+        self.assertEqual(build_prompt({'title': 'Cook'}), INSTRUCTION + "title: Cook")
+
+    def test_build_prompt_with_system_instruction(self):
+        # The model already has the instruction, only the metadata is sent
+        self.assertEqual(build_prompt({'title': 'Cook'}, instructed=True), "title: Cook")
+
+    def test_metadata_is_one_line_per_field(self):
+        data = {'skills': ['Python', 'Flask'], 'isRemote': True, 'schedule': {'days': 'Mon-Fri'}, 'notes': 'Fast\n  paced'}
+        self.assertEqual(render_metadata(data), "skills: Python, Flask\nisRemote: Yes\nschedule: days: Mon-Fri\nnotes: Fast paced")
+
+    def test_long_fields_are_truncated_at_a_word(self):
+        self.assertEqual(render_metadata({'skills': 'Python, Flask, Django'}, limit=16), "skills: Python, Flask…")
+
+    def test_metadata_is_cut_to_the_token_budget(self):
+        data = {'title': 'Cook', 'notes': 'word ' * 1000, 'perks': 'perk ' * 1000}
+        prompt = build_prompt(data, instructed=True)
+        self.assertLessEqual(estimate_tokens(prompt), METADATA_TOKEN_BUDGET)
+        self.assertTrue(prompt.startswith("title: Cook\nnotes: word word"))
+
+    def test_metadata_over_budget_is_rejected(self):
+        data = {f'field{index}': 'word ' * 100 for index in range(200)}
+        with self.assertRaises(PromptTooLargeError):
+            build_prompt(data)
+
+    def test_estimate_tokens(self):
+        self.assertEqual(estimate_tokens(""), 0)
+        # 'experienceLevel' is 4 tokens, ':' 1, 'Mid' 1
+        self.assertEqual(estimate_tokens("experienceLevel: Mid"), 6)
+
+    def test_wrap_html(self):
+        self.assertEqual(wrap_html("<p>Hi</p>"), "<p>Hi</p>")
+        self.assertEqual(wrap_html("Hi"), "<p>Hi</p>")
+        self.assertEqual(wrap_html(""), "<p></p>")
+
+    def stream(self, chunks):
+        wrapper = HTMLWrapStream()
+        pieces = [wrapper.feed(chunk) for chunk in chunks]
+        return pieces + [wrapper.close()]
+
+    def test_wrap_stream_matches_wrap_html(self):
+        for chunks in (["<h1>Cook</h1><p>Fry", " eggs</p>"], ["This is ", "a job description."], [], [""]):
+            self.assertEqual(''.join(self.stream(chunks)), wrap_html(''.join(chunks)))
+
+    def test_wrap_stream_holds_back_text_after_the_last_tag(self):
+        pieces = self.stream(["<p>Fry eggs</p><str", "ong>Fast</strong> paced"])
+        self.assertEqual(pieces, ["<p>Fry eggs</p>", "<strong>Fast</strong>", "<p> paced</p>"])
+
+    def test_wrap_stream_wraps_plain_text_as_it_arrives(self):
+        self.assertEqual(self.stream(["Fry", " eggs"]), ["<p>Fry", " eggs", "</p>"])
+
+    def test_sse_event(self):
+        self.assertEqual(sse_event("<p>a\nb</p>"), "data: <p>a\ndata: b</p>\n\n")
+        self.assertEqual(sse_event("", event='done'), "event: done\ndata: \n\n")
+
+    def test_usage_stats(self):
+        usageStats = UsageStats()
+        for promptTokens in (80, 100, 90):
+            usageStats.record(MagicMock(usage_metadata=MagicMock(prompt_token_count=promptTokens, candidates_token_count=10)))
+        metrics = usageStats.metrics()
+        self.assertEqual(metrics['requests'], 3)
+        self.assertEqual(metrics['promptTokens'], 270)
+        self.assertEqual(metrics['outputTokens'], 30)
+        self.assertEqual(metrics['averagePromptTokens'], 90)
+        self.assertEqual(metrics['lastPromptTokens'], 90)
+        self.assertEqual(metrics['maxPromptTokens'], 100)
+
+    def test_usage_stats_logs_tokens(self):
+        usageStats = UsageStats()
+        with self.assertLogs('usage', level='INFO') as logs:
+            usageStats.record(MagicMock(usage_metadata=MagicMock(prompt_token_count=7, candidates_token_count=300)),
+                              "experienceLevel: Mid")
+        self.assertEqual(logs.output, ["INFO:usage:Gemini tokens: prompt 7 (estimated 6), output 300"])
+        self.assertEqual(usageStats.metrics()['estimatedPromptTokens'], 6)
+
+    def test_usage_logs_are_emitted(self):
+        # Without any logging set up, as when the app runs
+        code = ('from unittest.mock import MagicMock; import usage; usage.configure_logging(); '
+                'usage.UsageStats().record(MagicMock(usage_metadata=MagicMock(prompt_token_count=7, '
+                'candidates_token_count=300)))')
+        result = subprocess.run([sys.executable, '-c', code], check=True, capture_output=True, text=True)
+        self.assertIn("usage: Gemini tokens: prompt 7 (estimated 0), output 300", result.stderr)
+
+    def test_usage_stats_without_usage_metadata(self):
+        usageStats = UsageStats()
+        usageStats.record(object())
+        self.assertEqual(usageStats.metrics()['promptTokens'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
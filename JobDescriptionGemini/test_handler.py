@@ -2,16 +2,29 @@ import unittest
 from unittest.mock import patch, MagicMock
 import json
 import os
+import time
+import handler
 from handler import app
+from cache import GenerationCache, LRUCache
+from google.api_core import exceptions
+from resilience import create_upstream, Upstream, TokenBucket, CircuitBreaker
 
 class HandlerTestCase(unittest.TestCase):
 
     def setUp(self):
         self.app = app.test_client()
         self.app.testing = True
+        # Every test starts with an empty generation cache
+        patcher = patch.object(handler.service, 'generationCache', GenerationCache(LRUCache()))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        # and a closed circuit, with a quota that never limits the tests
+        patcher = patch.object(handler.service, 'upstream', create_upstream(requestsPerMinute=600000, burst=1000))
+        patcher.start()
+        self.addCleanup(patcher.stop)
 
-    @patch('handler.chat_session.send_message')
-    def test_handler_success(self, mock_send_message):
+    @patch('handler.service.model.generate_content')
+    def test_handler_success(self, mock_generate_content):
         # 1. Tests the handler function with a successful API response.
         # Arrange
         test_data = {
@@ -22,7 +35,7 @@ class HandlerTestCase(unittest.TestCase):
             }
         }
         response_text = "<p>This is a job description.</p>"
-        mock_send_message.return_value = MagicMock(text=response_text)
+        mock_generate_content.return_value = MagicMock(text=response_text)
 
         # Act
         response = self.app.post('/', data=json.dumps(test_data), content_type='application/json')
@@ -34,12 +47,12 @@ class HandlerTestCase(unittest.TestCase):
         self.assertIn(response_text, response.data.decode('utf-8'))
         # This checks if the response_text is part of the actual response body.
 
-    @patch('handler.chat_session.send_message')
-    def test_handler_missing_values_key(self, mock_send_message):
+    @patch('handler.service.model.generate_content')
+    def test_handler_missing_values_key(self, mock_generate_content):
         # 2. Tests the handler function when the 'values' key is missing from the request payload.
         # Arrange
         test_data = {}
-        mock_send_message.return_value = MagicMock(text="")
+        mock_generate_content.return_value = MagicMock(text="")
 
         # Act
         response = self.app.post('/', data=json.dumps(test_data), content_type='application/json')
@@ -48,8 +61,8 @@ class HandlerTestCase(unittest.TestCase):
         self.assertEqual(response.status_code, 400)
         self.assertIn("KeyError", response.data.decode('utf-8'))
 
-    @patch('handler.chat_session.send_message')
-    def test_handler_with_empty_fields(self, mock_send_message):
+    @patch('handler.service.model.generate_content')
+    def test_handler_with_empty_fields(self, mock_generate_content):
         # 3. Tests the handler function with empty values for 'skills' and 'location'.
         # Arrange
         test_data = {
@@ -60,7 +73,7 @@ class HandlerTestCase(unittest.TestCase):
             }
         }
         response_text = "<p>This is a job description.</p>"
-        mock_send_message.return_value = MagicMock(text=response_text)
+        mock_generate_content.return_value = MagicMock(text=response_text)
 
         # Act
         response = self.app.post('/', data=json.dumps(test_data), content_type='application/json')
@@ -69,8 +82,8 @@ class HandlerTestCase(unittest.TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertIn(response_text, response.data.decode('utf-8'))
     
-    @patch('handler.chat_session.send_message')
-    def test_handler_html_wrapping(self, mock_send_message):
+    @patch('handler.service.model.generate_content')
+    def test_handler_html_wrapping(self, mock_generate_content):
         # 4. Ensures the handler correctly wraps the response in HTML tags if the API response is not already formatted.
         # Arrange
         test_data = {
@@ -81,7 +94,7 @@ class HandlerTestCase(unittest.TestCase):
             }
         }
         response_text = "This is a job description."
-        mock_send_message.return_value = MagicMock(text=response_text)
+        mock_generate_content.return_value = MagicMock(text=response_text)
 
         # Act
         response = self.app.post('/', data=json.dumps(test_data), content_type='application/json')
@@ -90,8 +103,8 @@ class HandlerTestCase(unittest.TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertIn("<p>" + response_text + "</p>", response.data.decode('utf-8'))
         
-    @patch('handler.chat_session.send_message')
-    def test_handler_empty_api_response(self, mock_send_message):
+    @patch('handler.service.model.generate_content')
+    def test_handler_empty_api_response(self, mock_generate_content):
         # 5. Simulates an empty response from the API and checks if the handler correctly wraps it in <p></p> tags.
         # Arrange
         test_data = {
@@ -102,7 +115,7 @@ class HandlerTestCase(unittest.TestCase):
             }
         }
         response_text = ""
-        mock_send_message.return_value = MagicMock(text=response_text)
+        mock_generate_content.return_value = MagicMock(text=response_text)
 
         # Act
         response = self.app.post('/', data=json.dumps(test_data), content_type='application/json')
@@ -111,6 +124,257 @@ class HandlerTestCase(unittest.TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response.data.decode('utf-8'), "<p></p>")
 
+    @patch('handler.service.model.generate_content')
+    def test_handler_is_stateless(self, mock_generate_content):
+        # 6. Every request is a single-turn generation: the prompt does not grow with previous requests
+        # Arrange
+        test_data = {
+            'values': {
+                'experienceLevel': 'Mid',
+                'skills': 'Python, Flask',
+                'location': 'Remote'
+            },
+            'regenerate': True
+        }
+        mock_generate_content.return_value = MagicMock(
+            text="<p>This is a job description.</p>",
+            usage_metadata=MagicMock(prompt_token_count=90, candidates_token_count=300),
+        )
+
+        # Act
+        for _ in range(3):
+            response = self.app.post('/', data=json.dumps(test_data), content_type='application/json')
+            self.assertEqual(response.status_code, 200)
+        metrics = self.app.get('/metrics').get_json()
+
+        # Assert
+        prompts = [call.args[0] for call in mock_generate_content.call_args_list]
+        self.assertEqual(len(prompts), 3)
+        self.assertEqual(len(set(prompts)), 1)
+        self.assertIn("skills: Python, Flask", prompts[0])
+        self.assertEqual(metrics['usage']['lastPromptTokens'], 90)
+        self.assertEqual(metrics['usage']['maxPromptTokens'], 90)
+        self.assertGreater(metrics['process']['rssBytes'], 0)
+
+    @patch('handler.service.model.generate_content')
+    def test_stream_html(self, mock_generate_content):
+        # 7. /stream sends the job description chunk by chunk as HTML
+        # Arrange
+        test_data = {'values': {'experienceLevel': 'Mid', 'skills': 'Python, Flask'}}
+        sent = []
+
+        def chunks():
+            for text in ["<h1>Cook</h1><p>Fry", " eggs</p>"]:
+                sent.append(text)
+                yield MagicMock(text=text)
+        mock_generate_content.return_value = chunks()
+
+        # Act
+        response = self.app.post('/stream', data=json.dumps(test_data), content_type='application/json', buffered=False)
+        pieces = response.iter_encoded()
+        first = next(pieces)
+
+        # Assert
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, 'text/html')
+        self.assertEqual(mock_generate_content.call_args.kwargs, {'stream': True})
+        # The first piece is sent before Gemini is done
+        self.assertEqual(first, b"<h1>Cook</h1><p>")
+        self.assertEqual(sent, ["<h1>Cook</h1><p>Fry"])
+        self.assertEqual(first + b''.join(pieces), b"<h1>Cook</h1><p>Fry eggs</p>")
+
+    @patch('handler.service.model.generate_content')
+    def test_stream_server_sent_events(self, mock_generate_content):
+        # 8. Accept: text/event-stream gets the wrapped chunks as Server-Sent Events
+        # Arrange
+        test_data = {'values': {'experienceLevel': 'Mid'}}
+        mock_generate_content.return_value = iter([MagicMock(text="Fry"), MagicMock(text=" eggs")])
+
+        # Act
+        response = self.app.post('/stream', data=json.dumps(test_data), content_type='application/json',
+                                 headers={'Accept': 'text/event-stream'})
+
+        # Assert
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, 'text/event-stream')
+        self.assertEqual(response.data.decode('utf-8'),
+                         "data: <p>Fry\n\ndata:  eggs\n\ndata: </p>\n\nevent: done\ndata: \n\n")
+
+    @patch('handler.service.model.generate_content')
+    def test_stream_missing_values_key(self, mock_generate_content):
+        # 9. Errors before the first chunk still get a status code
+        response = self.app.post('/stream', data=json.dumps({}), content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("KeyError", response.data.decode('utf-8'))
+        mock_generate_content.assert_not_called()
+
+    @patch('handler.service.model.generate_content')
+    def test_handler_cache(self, mock_generate_content):
+        # 10. The same metadata in another order or case is served from the cache, regenerate asks Gemini again
+        # Arrange
+        mock_generate_content.return_value = MagicMock(text="<p>This is a job description.</p>")
+        first = {'values': {'experienceLevel': 'Mid', 'skills': 'Python, Flask', 'location': 'Remote'}}
+        second = {'values': {'location': 'remote', 'skills': 'python, flask', 'experienceLevel': 'Mid', '_id': '42'}}
+
+        # Act
+        responses = [self.app.post('/', data=json.dumps(first), content_type='application/json'),
+                     self.app.post('/', data=json.dumps(second), content_type='application/json'),
+                     self.app.post('/?regenerate=1', data=json.dumps(second), content_type='application/json')]
+        metrics = self.app.get('/metrics').get_json()['generationCache']
+
+        # Assert
+        self.assertEqual([response.data.decode('utf-8') for response in responses],
+                         ["<p>This is a job description.</p>"] * 3)
+        self.assertEqual(mock_generate_content.call_count, 2)
+        self.assertEqual((metrics['hits'], metrics['misses'], metrics['bypasses']), (1, 1, 1))
+        self.assertEqual(metrics['hitRate'], 0.5)
+
+    @patch('handler.service.model.generate_content')
+    def test_stream_is_cached(self, mock_generate_content):
+        # 11. A streamed job description is cached once complete and served whole the next time
+        # Arrange
+        test_data = {'values': {'experienceLevel': 'Mid'}}
+        mock_generate_content.return_value = iter([MagicMock(text="Fry"), MagicMock(text=" eggs")])
+
+        # Act
+        streamed = self.app.post('/stream', data=json.dumps(test_data), content_type='application/json')
+        # Reading the body runs the stream to its end
+        streamed = streamed.data.decode('utf-8')
+        cached = self.app.post('/', data=json.dumps(test_data), content_type='application/json')
+
+        # Assert
+        self.assertEqual(streamed, "<p>Fry eggs</p>")
+        self.assertEqual(cached.data.decode('utf-8'), "<p>Fry eggs</p>")
+        self.assertEqual(mock_generate_content.call_count, 1)
+
+    def failing_upstream(self):
+        # Retries right away and opens the circuit after 2 failed requests
+        return Upstream(TokenBucket(1000, 1000), CircuitBreaker(2, 30), retries=1, sleep=lambda seconds: None)
+
+    @patch('handler.service.model.generate_content')
+    def test_handler_upstream_unavailable(self, mock_generate_content):
+        # 12. 429/503 are retried, then the client gets a 503 with Retry-After instead of a bare 500
+        # Arrange
+        mock_generate_content.side_effect = exceptions.ServiceUnavailable("overloaded")
+        test_data = {'values': {'experienceLevel': 'Mid'}}
+
+        # Act
+        with patch.object(handler.service, 'upstream', self.failing_upstream()):
+            responses = [self.app.post('/', data=json.dumps(test_data), content_type='application/json')
+                         for _ in range(3)]
+
+        # Assert
+        self.assertEqual([response.status_code for response in responses], [503] * 3)
+        self.assertEqual(responses[0].headers['Retry-After'], '1')
+        # The third request failed fast on the open circuit
+        self.assertEqual(responses[2].headers['Retry-After'], '30')
+        self.assertEqual(mock_generate_content.call_count, 4)
+
+    @patch('handler.service.model.generate_content')
+    def test_handler_template_fallback(self, mock_generate_content):
+        # 13. GEMINI_FALLBACK=template serves a job description made from the metadata
+        # Arrange
+        mock_generate_content.side_effect = exceptions.ResourceExhausted("quota")
+        test_data = {'values': {'experienceLevel': 'Mid', 'skills': 'Python <3'}}
+
+        # Act
+        with patch.object(handler.service, 'upstream', self.failing_upstream()), patch.object(handler.service, 'fallbackEnabled', True):
+            response = self.app.post('/', data=json.dumps(test_data), content_type='application/json')
+
+        # Assert
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers['X-Fallback'], 'template')
+        self.assertEqual(response.data.decode('utf-8'), "<h2>About the job</h2><ul><li><strong>Experience level:</strong> Mid</li>"
+                                                        "<li><strong>Skills:</strong> Python &lt;3</li></ul>")
+
+    def read_batch(self, response):
+        lines = [json.loads(line) for line in response.data.decode('utf-8').splitlines()]
+        return sorted(lines, key=lambda line: line['index'])
+
+    @patch('handler.service.model.generate_content')
+    def test_batch(self, mock_generate_content):
+        # 14. /batch generates identical payloads once and answers every item with its own status
+        # Arrange
+        mock_generate_content.side_effect = lambda prompt: MagicMock(text="<p>" + prompt[-20:] + "</p>")
+        test_data = [
+            {'id': 'a', 'values': {'experienceLevel': 'Mid', 'skills': 'Python'}},
+            {'id': 'b', 'values': {'skills': 'python', 'experienceLevel': 'Mid'}},
+            {'id': 'c', 'values': {'experienceLevel': 'Senior'}},
+            {'id': 'd'},
+            'not an object',
+        ]
+
+        # Act
+        response = self.app.post('/batch', data=json.dumps(test_data), content_type='application/json')
+        lines = self.read_batch(response)
+
+        # Assert
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, 'application/x-ndjson')
+        self.assertEqual(mock_generate_content.call_count, 2)
+        self.assertEqual([line['index'] for line in lines], [0, 1, 2, 3, 4])
+        self.assertEqual([line['status'] for line in lines], [200, 200, 200, 400, 400])
+        self.assertEqual(lines[0]['id'], 'a')
+        self.assertEqual(lines[0]['html'], lines[1]['html'])
+        self.assertNotEqual(lines[0]['html'], lines[2]['html'])
+        self.assertNotIn('id', lines[4])
+
+    @patch('handler.service.model.generate_content')
+    def test_batch_ndjson_runs_concurrently(self, mock_generate_content):
+        # 15. NDJSON items are generated concurrently, never more than BATCH_CONCURRENCY at once
+        # Arrange
+        running = []
+        peak = []
+
+        def slow_generation(prompt):
+            running.append(prompt)
+            peak.append(len(running))
+            time.sleep(0.05)
+            running.remove(prompt)
+            return MagicMock(text="<p>This is a job description.</p>")
+        mock_generate_content.side_effect = slow_generation
+        body = '\n'.join(json.dumps({'values': {'title': f'Cook {index}'}}) for index in range(16))
+
+        # Act
+        start = time.perf_counter()
+        response = self.app.post('/batch', data=body, content_type='application/x-ndjson')
+        lines = self.read_batch(response)
+        elapsed = time.perf_counter() - start
+
+        # Assert
+        self.assertEqual([line['status'] for line in lines], [200] * 16)
+        self.assertLessEqual(max(peak), handler.BATCH_CONCURRENCY)
+        self.assertGreater(max(peak), 1)
+        self.assertLess(elapsed, 16 * 0.05)
+
+    @patch('handler.service.model.generate_content')
+    def test_batch_upstream_unavailable(self, mock_generate_content):
+        # 16. A failed item gets its own status, the others are still answered
+        # Arrange
+        mock_generate_content.side_effect = exceptions.ServiceUnavailable("overloaded")
+        test_data = [{'values': {'experienceLevel': 'Mid'}}]
+
+        # Act
+        with patch.object(handler.service, 'upstream', self.failing_upstream()):
+            lines = self.read_batch(self.app.post('/batch', data=json.dumps(test_data), content_type='application/json'))
+
+        # Assert
+        self.assertEqual(lines[0]['status'], 503)
+        self.assertEqual(lines[0]['retryAfter'], 1)
+
+    def test_batch_not_an_array(self):
+        # 17. Anything but a JSON array or NDJSON is rejected
+        response = self.app.post('/batch', data=json.dumps({'values': {}}), content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+    @patch('handler.service.model.generate_content')
+    def test_handler_metadata_too_large(self, mock_generate_content):
+        # 18. Metadata that can not fit the token budget is rejected before calling Gemini
+        test_data = {'values': {f'field{index}': 'word ' * 100 for index in range(200)}}
+        response = self.app.post('/', data=json.dumps(test_data), content_type='application/json')
+        self.assertEqual(response.status_code, 413)
+        mock_generate_content.assert_not_called()
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,187 @@
+import asyncio
+import unittest
+from google.api_core import exceptions
+from resilience import TokenBucket, CircuitBreaker, Upstream, CircuitOpenError, RateLimitedError, retry_after
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class FakeGemini:
+    # Local stand-in for Gemini: raises the scripted errors first, then answers after latency seconds
+    def __init__(self, errors=(), latency=0.0, text="<p>Cook</p>"):
+        self.errors = list(errors)
+        self.latency = latency
+        self.text = text
+        self.calls = 0
+
+    def generate_content(self, prompt):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return self.text
+
+    async def generate_content_async(self, prompt):
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        if self.errors:
+            raise self.errors.pop(0)
+        return self.text
+
+
+class TokenBucketTestCase(unittest.TestCase):
+
+    def test_burst_then_rate(self):
+        clock = FakeClock()
+        bucket = TokenBucket(rate=2, capacity=3, clock=clock)
+        self.assertEqual([bucket.take() for _ in range(3)], [0, 0, 0])
+        self.assertAlmostEqual(bucket.take(), 0.5)
+        clock.now += 0.5
+        self.assertEqual(bucket.take(), 0)
+
+    def test_acquire_waits_then_gives_up(self):
+        clock = FakeClock()
+        bucket = TokenBucket(rate=1, capacity=1, clock=clock)
+        bucket.acquire(timeout=0, sleep=clock.sleep)
+        bucket.acquire(timeout=2, sleep=clock.sleep)
+        self.assertAlmostEqual(clock.now, 1001.0)
+        with self.assertRaises(RateLimitedError) as context:
+            bucket.acquire(timeout=0.5, sleep=clock.sleep)
+        self.assertEqual(retry_after(context.exception), 1)
+
+    def test_throttle_and_recover(self):
+        bucket = TokenBucket(rate=16, capacity=1, clock=FakeClock())
+        for _ in range(10):
+            bucket.throttle()
+        self.assertEqual(bucket.rate, 1)
+        for _ in range(100):
+            bucket.recover()
+        self.assertEqual(bucket.rate, 16)
+
+
+class CircuitBreakerTestCase(unittest.TestCase):
+
+    def test_opens_after_failures_in_a_row(self):
+        clock = FakeClock()
+        breaker = CircuitBreaker(failureThreshold=3, resetTimeout=30, clock=clock)
+        breaker.record_failure()
+        breaker.record_success()
+        for _ in range(3):
+            breaker.check()
+            breaker.record_failure()
+        self.assertEqual(breaker.state, 'open')
+        clock.now += 10
+        with self.assertRaises(CircuitOpenError) as context:
+            breaker.check()
+        self.assertEqual(retry_after(context.exception), 20)
+
+    def test_half_open_lets_one_probe_through(self):
+        clock = FakeClock()
+        breaker = CircuitBreaker(failureThreshold=1, resetTimeout=30, clock=clock)
+        breaker.record_failure()
+        clock.now += 30
+        breaker.check()
+        self.assertEqual(breaker.state, 'half-open')
+        with self.assertRaises(CircuitOpenError):
+            breaker.check()
+        # The probe failed: open for another resetTimeout
+        breaker.record_failure()
+        self.assertEqual(breaker.state, 'open')
+        clock.now += 30
+        breaker.check()
+        breaker.record_success()
+        self.assertEqual(breaker.state, 'closed')
+        self.assertEqual(breaker.opened, 2)
+
+
+class UpstreamTestCase(unittest.TestCase):
+
+    def create(self, retries=3, failureThreshold=2):
+        self.clock = FakeClock()
+        self.sleeps = []
+        return Upstream(TokenBucket(1000, 1000, clock=self.clock), CircuitBreaker(failureThreshold, 30, self.clock),
+                        retries=retries, baseDelay=0.5, maxDelay=8, sleep=self.sleeps.append, random=lambda: 1.0)
+
+    def test_retries_429_and_503_with_backoff(self):
+        upstream = self.create()
+        gemini = FakeGemini([exceptions.ResourceExhausted("quota"), exceptions.ServiceUnavailable("overloaded")])
+        self.assertEqual(upstream.call(gemini.generate_content, 'prompt'), "<p>Cook</p>")
+        self.assertEqual(gemini.calls, 3)
+        self.assertEqual(self.sleeps, [0.5, 1.0])
+        # The 429 slowed the limiter down, the success brought a little back
+        self.assertLess(upstream.limiter.rate, 1000)
+
+    def test_backoff_is_jittered_and_capped(self):
+        upstream = self.create()
+        upstream.random = lambda: 0.5
+        self.assertEqual([upstream.backoff(attempt) for attempt in range(6)], [0.25, 0.5, 1, 2, 4, 4])
+
+    def test_gives_up_and_opens_the_circuit(self):
+        upstream = self.create(retries=1, failureThreshold=2)
+        gemini = FakeGemini([exceptions.ServiceUnavailable("overloaded")] * 4)
+        for _ in range(2):
+            with self.assertRaises(exceptions.ServiceUnavailable):
+                upstream.call(gemini.generate_content, 'prompt')
+        # Fails fast without calling Gemini
+        with self.assertRaises(CircuitOpenError):
+            upstream.call(gemini.generate_content, 'prompt')
+        self.assertEqual(gemini.calls, 4)
+        metrics = upstream.metrics()
+        self.assertEqual((metrics['failures'], metrics['rejected'], metrics['circuit']), (2, 1, 'open'))
+
+    def test_other_errors_are_not_retried(self):
+        upstream = self.create()
+        gemini = FakeGemini([exceptions.InvalidArgument("bad prompt")])
+        with self.assertRaises(exceptions.InvalidArgument):
+            upstream.call(gemini.generate_content, 'prompt')
+        self.assertEqual(gemini.calls, 1)
+        self.assertEqual(upstream.breaker.state, 'closed')
+
+    def test_server_and_transport_errors_open_the_circuit(self):
+        upstream = self.create(failureThreshold=3)
+        errors = [exceptions.InternalServerError("boom"), exceptions.DeadlineExceeded("slow"), ConnectionResetError()]
+        gemini = FakeGemini(errors)
+        for error in errors:
+            with self.assertRaises(type(error)):
+                upstream.call(gemini.generate_content, 'prompt')
+        # Not retried, but counted
+        self.assertEqual(gemini.calls, 3)
+        self.assertEqual(upstream.breaker.state, 'open')
+        self.assertEqual(upstream.metrics()['failures'], 3)
+
+
+class AsyncUpstreamTestCase(unittest.IsolatedAsyncioTestCase):
+
+    async def test_retries_with_latency(self):
+        upstream = Upstream(TokenBucket(1000, 1000), CircuitBreaker(5, 30), retries=2, baseDelay=0.01)
+        gemini = FakeGemini([exceptions.ServiceUnavailable("overloaded")], latency=0.01)
+        self.assertEqual(await upstream.call_async(gemini.generate_content_async, 'prompt'), "<p>Cook</p>")
+        self.assertEqual(gemini.calls, 2)
+        self.assertEqual(upstream.metrics()['retried'], 1)
+
+    async def test_cancelled_probe_lets_the_next_one_through(self):
+        breaker = CircuitBreaker(1, 0)
+        breaker.record_failure()
+        upstream = Upstream(TokenBucket(1000, 1000), breaker)
+        with self.assertRaises(asyncio.TimeoutError):
+            await asyncio.wait_for(upstream.call_async(FakeGemini(latency=5).generate_content_async, 'prompt'), 0.01)
+        self.assertEqual(await upstream.call_async(FakeGemini().generate_content_async, 'prompt'), "<p>Cook</p>")
+        self.assertEqual(breaker.state, 'closed')
+
+    async def test_server_error_opens_the_circuit(self):
+        upstream = Upstream(TokenBucket(1000, 1000), CircuitBreaker(1, 30))
+        with self.assertRaises(exceptions.GatewayTimeout):
+            await upstream.call_async(FakeGemini([exceptions.GatewayTimeout("slow")]).generate_content_async, 'prompt')
+        self.assertEqual(upstream.breaker.state, 'open')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+import json
+import unittest
+from google.api_core import exceptions
+from cache import GenerationCache, LRUCache
+from resilience import create_upstream
+from service import GenerationService
+
+
+class Done:
+    # A finished generation, like a completed future or task
+    def __init__(self, result=None, error=None):
+        self._result = result
+        self._error = error
+
+    def result(self):
+        if self._error is not None:
+            raise self._error
+        return self._result
+
+
+class ServiceTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.service = GenerationService(None, GenerationCache(LRUCache()), create_upstream())
+
+    def test_plan_batch(self):
+        cachedKey = self.service.generationCache.key({'title': 'Cook'})
+        self.service.generationCache.set(cachedKey, '<p>Cook</p>')
+        items = [
+            {'values': {'title': 'Nurse'}},
+            'not an object',
+            {'id': 'cook', 'values': {'title': 'Cook'}},
+            {'values': {'title': 'Nurse'}},
+        ]
+        running = {}
+        planned = []
+        for line, data, key, prompt in self.service.plan_batch(items, running):
+            planned.append((line, prompt is not None))
+            if prompt is not None:
+                running[key] = 'generation'
+        # The duplicate joins the generation started for the first item
+        self.assertEqual(planned[0], ({'index': 0}, True))
+        self.assertEqual(json.loads(planned[1][0])['status'], 400)
+        self.assertEqual(json.loads(planned[2][0]), {'index': 2, 'id': 'cook', 'status': 200, 'html': '<p>Cook</p>'})
+        self.assertEqual(planned[3], ({'index': 3}, False))
+
+    def test_batch_result_and_fallback(self):
+        overloaded = Done(error=exceptions.ServiceUnavailable("overloaded"))
+        self.assertEqual(json.loads(self.service.batch_result({'index': 0}, {}, Done('<p>Cook</p>'))),
+                         {'index': 0, 'status': 200, 'html': '<p>Cook</p>'})
+        self.assertEqual(json.loads(self.service.batch_result({'index': 0}, {}, overloaded))['status'], 503)
+        self.assertEqual(self.service.unavailable({'title': 'Cook'}, overloaded._error)[1], 503)
+
+        self.service.fallbackEnabled = True
+        line = json.loads(self.service.batch_result({'index': 0}, {'title': 'Cook'}, overloaded))
+        self.assertEqual((line['status'], line['fallback']), (200, True))
+        self.assertEqual(self.service.unavailable({'title': 'Cook'}, overloaded._error)[2], {'X-Fallback': 'template'})
+
+    def test_lookup_and_regenerate(self):
+        data, key, cached = self.service.lookup({'values': {'title': 'Cook'}})
+        self.assertIsNone(cached)
+        self.service.generationCache.set(key, '<p>Cook</p>')
+        self.assertEqual(self.service.lookup({'values': {'title': 'Cook'}})[2], '<p>Cook</p>')
+        self.assertIsNone(self.service.lookup({'values': {'title': 'Cook'}, 'regenerate': True})[2])
+        self.assertIsNone(self.service.lookup({'values': {'title': 'Cook'}}, regenerate=True)[2])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+import asyncio
+import threading
+import time
+import unittest
+from singleflight import SingleFlight, AsyncSingleFlight
+
+
+class SingleFlightTestCase(unittest.TestCase):
+
+    def run_together(self, singleFlight, key, fn, count):
+        results = [None] * count
+        errors = [None] * count
+
+        def call(index):
+            try:
+                results[index] = singleFlight.do(key, fn)
+            except Exception as e:
+                errors[index] = e
+
+        threads = [threading.Thread(target=call, args=(index,)) for index in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results, errors
+
+    def test_concurrent_calls_share_one_execution(self):
+        singleFlight = SingleFlight()
+        calls = []
+
+        def generate():
+            calls.append(1)
+            time.sleep(0.1)
+            return "<p>Cook</p>"
+
+        results, errors = self.run_together(singleFlight, 'key', generate, 10)
+        self.assertEqual(results, ["<p>Cook</p>"] * 10)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(singleFlight.metrics(), {'calls': 1, 'saved': 9, 'inFlight': 0})
+
+    def test_followers_get_the_exception(self):
+        singleFlight = SingleFlight()
+
+        def generate():
+            time.sleep(0.1)
+            raise ValueError("quota exceeded")
+
+        results, errors = self.run_together(singleFlight, 'key', generate, 5)
+        self.assertEqual([str(error) for error in errors], ["quota exceeded"] * 5)
+
+    def test_sequential_calls_run_again(self):
+        singleFlight = SingleFlight()
+        self.assertEqual(singleFlight.do('key', lambda: 1), 1)
+        self.assertEqual(singleFlight.do('key', lambda: 2), 2)
+        self.assertEqual(singleFlight.metrics()['saved'], 0)
+
+
+class AsyncSingleFlightTestCase(unittest.IsolatedAsyncioTestCase):
+
+    async def test_concurrent_calls_share_one_execution(self):
+        singleFlight = AsyncSingleFlight()
+        calls = []
+
+        async def generate():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return "<p>Cook</p>"
+
+        results = await asyncio.gather(*(singleFlight.do('key', generate) for _ in range(10)))
+        self.assertEqual(results, ["<p>Cook</p>"] * 10)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(singleFlight.metrics(), {'calls': 1, 'saved': 9, 'inFlight': 0})
+
+    async def test_cancelled_caller_does_not_cancel_the_others(self):
+        singleFlight = AsyncSingleFlight()
+
+        async def generate():
+            await asyncio.sleep(0.05)
+            return "<p>Cook</p>"
+
+        leader = asyncio.ensure_future(singleFlight.do('key', generate))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(singleFlight.do('key', generate))
+        await asyncio.sleep(0)
+        leader.cancel()
+        self.assertEqual(await follower, "<p>Cook</p>")
+
+
+if __name__ == '__main__':
+    unittest.main()
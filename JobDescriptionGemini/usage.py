@@ -0,0 +1,66 @@
+import logging
+import os
+import resource
+import threading
+from generation import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+
+def configure_logging(level=None):
+    # The token counts of each request are logged at INFO, which Python drops until logging is configured
+    # Adds a stderr handler to the root logger unless the server already set one up (ex: gunicorn --log-config),
+    # and lets this module log at USAGE_LOG_LEVEL (default INFO) while other loggers stay at WARNING
+    logging.basicConfig(format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+    logger.setLevel(level or os.getenv('USAGE_LOG_LEVEL', 'INFO'))
+
+
+def process_rss():
+    # Current resident set size of this process in bytes
+    try:
+        with open('/proc/self/statm') as file:
+            return int(file.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        # No /proc (ex: macOS), fall back to the peak RSS (kilobytes on Linux, bytes on macOS)
+        maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return maxrss if os.uname().sysname == 'Darwin' else maxrss * 1024
+
+
+class UsageStats:
+    # Token counts reported by Gemini (response.usage_metadata) over the life of the process
+    # With one single-turn request per generation, lastPromptTokens stays flat however long the process runs
+
+    def __init__(self):
+        self.requests = 0
+        self.estimatedPromptTokens = 0
+        self.promptTokens = 0
+        self.outputTokens = 0
+        self.lastPromptTokens = 0
+        self.maxPromptTokens = 0
+        self._lock = threading.Lock()
+
+    def record(self, response, prompt=''):
+        # prompt: the prompt sent, its local estimate is logged next to the count Gemini reported
+        usage = getattr(response, 'usage_metadata', None)
+        promptTokens = int(getattr(usage, 'prompt_token_count', 0) or 0)
+        outputTokens = int(getattr(usage, 'candidates_token_count', 0) or 0)
+        estimatedTokens = estimate_tokens(prompt)
+        logger.info("Gemini tokens: prompt %d (estimated %d), output %d", promptTokens, estimatedTokens, outputTokens)
+        with self._lock:
+            self.requests += 1
+            self.estimatedPromptTokens += estimatedTokens
+            self.promptTokens += promptTokens
+            self.outputTokens += outputTokens
+            self.lastPromptTokens = promptTokens
+            self.maxPromptTokens = max(self.maxPromptTokens, promptTokens)
+
+    def metrics(self):
+        return {
+            'requests': self.requests,
+            'estimatedPromptTokens': self.estimatedPromptTokens,
+            'promptTokens': self.promptTokens,
+            'outputTokens': self.outputTokens,
+            'averagePromptTokens': self.promptTokens / self.requests if self.requests else 0,
+            'lastPromptTokens': self.lastPromptTokens,
+            'maxPromptTokens': self.maxPromptTokens,
+        }
@@ -0,0 +1,167 @@
+"""
+Micro-benchmarks for the KeywordTagging text pipeline.
+No language model is needed, only the string processing is measured.
+
+$ python benchmark.py
+"""
+
+import time
+from htmltext import html_to_text
+from tokenizer import tokenize, wordStopperSet, unnecessaryEndsSet, sentenceStopperSet
+from matcher import TagMatcher
+from salary import extract_salaries, best_salary
+from tags import tagDict, phraseDict
+
+# Rich text paragraph similar to what the frontend sends, repeated to reach the target size
+paragraph = (
+    '<h2>About the role</h2><p>We are looking for a <strong>full-time</strong> warehouse associate '
+    'to join our team. Pay: $18 - $22 per hour, plus weekend bonuses! Must be fluent in English and Spanish. '
+    '<a href="https://example.com/apply?ref=board">Apply here</a>.</p>'
+    '<ul><li>Health, dental and vision insurance</li><li>401k with company match</li>'
+    '<li>Flexible schedule (evening/night shifts available)</li></ul>\n'
+)
+
+
+# Pasted postings often contain divider lines and long tracking URLs, which are single long tokens
+divider = '<p>' + '.' * 2000 + '</p><p>https://example.com/track?' + 'utm=job&' * 250 + '</p>\n'
+
+
+def make_description(kilobytes, block=paragraph):
+    repeat = kilobytes * 1024 // len(block) + 1
+    return (block * repeat)[:kilobytes * 1024]
+
+
+def legacy_tokenize(jobDescription):
+    # The two char-by-char passes handler() used before htmltext.py and tokenizer.py, kept only for comparison
+    sentences = []
+    words = []
+    beginningOfSentence = 0
+    skipping = False
+    for jobDescriptionIndex, char in enumerate(jobDescription):
+        if char == '>':
+            skipping = False
+            beginningOfSentence = jobDescriptionIndex + 1
+        elif skipping:
+            continue
+        elif char in sentenceStopperSet and beginningOfSentence < jobDescriptionIndex or jobDescriptionIndex == len(jobDescription) - 1:
+            if char == '<':
+                skipping = True
+            sentence = jobDescription[beginningOfSentence: jobDescriptionIndex].strip()
+            while sentence and sentence[-1] in unnecessaryEndsSet:
+                sentence = sentence[:-1]
+            while sentence and sentence[0] in unnecessaryEndsSet:
+                sentence = sentence[1:]
+            if sentence:
+                sentences.append(sentence)
+            beginningOfSentence = jobDescriptionIndex + 1
+
+    beginningOfWord = 0
+    for jobDescriptionIndex, char in enumerate(jobDescription):
+        if char in wordStopperSet and beginningOfWord < jobDescriptionIndex or jobDescriptionIndex == len(jobDescription) - 1:
+            word = jobDescription[beginningOfWord: jobDescriptionIndex].strip().lower()
+            while word and word[-1] in unnecessaryEndsSet:
+                word = word[:-1]
+            while word and word[0] in unnecessaryEndsSet:
+                word = word[1:]
+            if word:
+                words.append(word)
+            beginningOfWord = jobDescriptionIndex + 1
+    return sentences, words
+
+
+def current_tokenize(jobDescription):
+    text = html_to_text(jobDescription)
+    tokens = tokenize(text)
+    sentences = [text[start:end] for start, end in tokens.sentences]
+    words = [text[start:end].lower() for start, end in tokens.words]
+    return sentences, words
+
+
+def best_of(function, argument, repeat=7):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(argument)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def bench_tokenizer():
+    print('html to text + tokenizer (ms per KB)')
+    print(f"{'size':>8} {'before':>10} {'after':>10} {'speedup':>8}")
+    for name, block in (('prose', paragraph), ('long tokens', paragraph + divider)):
+        print(name)
+        for kilobytes in (1, 10, 50, 200):
+            jobDescription = make_description(kilobytes, block)
+            before = best_of(legacy_tokenize, jobDescription) * 1000 / kilobytes
+            after = best_of(current_tokenize, jobDescription) * 1000 / kilobytes
+            print(f'{kilobytes:>6}KB {before:>10.3f} {after:>10.3f} {before / after:>7.1f}x')
+
+
+def bench_matcher():
+    # Matching time should not grow with the size of the tag dictionary
+    print('tag matcher (ms per KB)')
+    _, words = current_tokenize(make_description(200))
+    largeTagDict = dict(tagDict)
+    for index in range(5000):
+        largeTagDict[f'skill{index}'] = ['skills', f'skill{index}']
+        largeTagDict[f'certified skill{index} specialist'] = ['skills', f'skill{index}']
+    for name, matcher in (('45 entries', TagMatcher(tagDict, phraseDict)),
+                          ('10k entries', TagMatcher(largeTagDict, phraseDict))):
+        elapsed = best_of(matcher.group_values, words) * 1000 / 200
+        print(f'{name:>12} {elapsed:>10.3f}')
+
+
+# Pay lines the way employers write them in postings
+salaryCorpus = [
+    '<p>Compensation: $60,000 - $80,000 per year, plus annual bonus.</p>',
+    '<p>Pay: $18 - $22 per hour. $500 sign-on bonus after 90 days!</p>',
+    '<p>We offer a competitive salary of $50000 to $70000 per year for the right candidate.</p>',
+    '<li>Starting at $25/hr with raises every 6 months</li>',
+    '<p>Salary range: $95k–$120k a year depending on experience.</p>',
+    '<p>USD 50,000 per year, 401(k) match up to 4%.</p>',
+    '<p>Servers earn $9 per hour plus tips (average $80000 a year).</p>',
+    '<p>Hourly rate of $20.50, weekend differential of $2/hr.</p>',
+    '<p>Monthly stipend: $4,000 - $5,000 monthly for the internship.</p>',
+    '<p>This is a volunteer position, no pay. Call 555-1234.</p>',
+]
+
+
+def legacy_salary(words):
+    # The '$' word collection and string sorting handler() used before salary.py, kept only for comparison
+    salaryList = []
+    for word in words:
+        if word[0] == "$":
+            word = word[1:].replace(',', '')
+            wordIndex = 0
+            while wordIndex < len(word) and word[wordIndex].isdigit():
+                wordIndex += 1
+            salaryList.append(word[:wordIndex])
+    if not salaryList:
+        return None
+    salaryList = sorted(salaryList)
+    if len(salaryList) == 1:
+        return int(salaryList[0] or 0), int(salaryList[0] or 0)
+    return int(salaryList[-2] or 0) if len(salaryList[-1]) - len(salaryList[-2]) <= 1 else int(salaryList[-1] or 0), int(salaryList[-1] or 0)
+
+
+def current_salary(words):
+    salary = best_salary(extract_salaries(words))
+    return salary and (salary.min, salary.max, salary.period, salary.confidence)
+
+
+def bench_salary():
+    print('salary extraction (microseconds per posting)')
+    wordsList = [current_tokenize(posting)[1] for posting in salaryCorpus]
+    repeat = 200
+    for name, function in (('before', legacy_salary), ('after', current_salary)):
+        elapsed = best_of(lambda wordsList: [function(words) for words in wordsList * repeat], wordsList)
+        print(f'{name:>8} {elapsed * 1e6 / (len(wordsList) * repeat):>10.2f}')
+    for posting, words in zip(salaryCorpus, wordsList):
+        print(f'  {str(legacy_salary(words)):<16} {str(current_salary(words)):<36} {html_to_text(posting)[:60]}')
+
+
+if __name__ == '__main__':
+    bench_tokenizer()
+    bench_matcher()
+    bench_salary()
@@ -0,0 +1,109 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+
+
+class LRUCache:
+    # In-process cache bounded by maxsize, least recently used entries are evicted first
+    # Entries older than ttl seconds are treated as missing (ttl=None keeps them until evicted)
+
+    def __init__(self, maxsize=1024, ttl=None, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expiresAt = entry
+            if expiresAt is not None and expiresAt <= self.clock():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        if self.maxsize <= 0:
+            return
+        expiresAt = None if self.ttl is None else self.clock() + self.ttl
+        with self._lock:
+            self._entries[key] = (value, expiresAt)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class RedisCache:
+    # Shared cache on anything with the redis-py get(key) / set(key, value, ex=seconds) interface
+    # Values are stored as JSON, eviction is left to the server (ex: maxmemory-policy allkeys-lru)
+
+    def __init__(self, client, ttl=None, prefix='keywordtagging:'):
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def get(self, key):
+        value = self.client.get(self.prefix + key)
+        return None if value is None else json.loads(value)
+
+    def set(self, key, value):
+        self.client.set(self.prefix + key, json.dumps(value), ex=self.ttl)
+
+
+def normalize_description(jobDescription):
+    # Re-saves that only differ in whitespace share a cache entry
+    return ' '.join(jobDescription.split())
+
+
+class ResultCache:
+    # Tagging results keyed by a hash of the normalized description and the tag dictionary version
+    # Backend errors (ex: Redis down) count as misses and never fail the request
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    def key(self, jobDescription, version):
+        content = version + '\0' + normalize_description(jobDescription)
+        return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        try:
+            value = self.backend.get(key)
+        except Exception:
+            self.errors += 1
+            value = None
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def set(self, key, value):
+        try:
+            self.backend.set(key, value)
+        except Exception:
+            self.errors += 1
+
+    def metrics(self):
+        metrics = {
+            'backend': type(self.backend).__name__,
+            'hits': self.hits,
+            'misses': self.misses,
+            'errors': self.errors,
+        }
+        if isinstance(self.backend, LRUCache):
+            metrics['size'] = len(self.backend)
+            metrics['maxsize'] = self.backend.maxsize
+        return metrics
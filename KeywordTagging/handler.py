@@ -1,27 +1,31 @@
-from flask import Flask, request, jsonify
+import time
+# Startup time reported by /metrics is measured from here to the end of this module
+startupStart = time.perf_counter()
+from flask import Flask, request, jsonify, Response, stream_with_context
 from flask_cors import CORS, cross_origin
+import os
 import json
-import fasttext
-from tags import tagDict
+from htmltext import html_to_text
+from tokenizer import tokenize
+from language import detect_languages, SentenceMemo
+from tagstore import TagStore
+from salary import extract_salaries, best_salary
+from langmodel import LazyModel, process_rss
+from cache import LRUCache, RedisCache, ResultCache
 
 app = Flask(__name__)
 app.config['CORS_HEADERS'] = 'Content-Type'
 
 # Path to the downloaded language identification model
-lang_model_path = 'lid.176.bin'
+# LANG_MODEL_PATH=lid.176.ftz uses the quantized model (<1 MB instead of ~130 MB) for a little less accuracy
+lang_model_path = os.getenv('LANG_MODEL_PATH', 'lid.176.bin')
 
-try:
-    # Load the FastText language identification model
-    lang_model = fasttext.load_model(lang_model_path)
-except Exception as e:
-    raise RuntimeError(f"Failed to load language model: {str(e)}")
-
-# Set to use to detect when to catch a word for tagging
-wordStopperSet = {' ', '(', ')', '{', '}', '[', ']', '-', '/', ':', ';', '&', '+', '<', '>'}
-# Set to use to detect some unnecessary ends of a word. Newly added for salary info processing
-unnecessaryEndsSet = {'.', ',', '(', ')', '{', '}', '[', ']', '-', '!', '/', ':', ';', '&', '+', '<', '>'}
-# Set to use to detect when to catch a sentence for language detection
-sentenceStopperSet = {'.', '!', '。', '<', '>'}
+# The FastText language identification model is loaded on first use
+# With LANG_MODEL_PRELOAD=1 it is loaded at import, so `gunicorn --preload` loads it once before forking
+# and the workers share its memory copy-on-write
+lang_model = LazyModel(lang_model_path)
+if os.getenv('LANG_MODEL_PRELOAD') == '1':
+    lang_model.get()
 
 # Detectable (immigrants-friendly) language Set 
 """
@@ -40,10 +44,72 @@ Japanese (ja)
 """
 topLanguageSet = {'en', 'es', 'fr', 'zh', 'hi', 'ar', 'pt', 'bn', 'ru', 'ur', 'ko', 'ja'}
 
+# Tag dictionary compiled into a matcher, loaded from TAG_DICT_PATH (JSON/YAML) when set, otherwise from tags.py
+# The file is checked for changes at most every TAG_DICT_RELOAD_INTERVAL seconds and swapped in without a restart
+tagStore = TagStore(os.getenv('TAG_DICT_PATH'), float(os.getenv('TAG_DICT_RELOAD_INTERVAL', '5')))
+
+
+def create_result_cache():
+    # Results of '/' keyed by description hash + tag dictionary version, so re-saves skip all processing
+    # In-process LRU by default (RESULT_CACHE_SIZE=0 disables it), shared Redis when REDIS_URL is set
+    ttl = float(os.getenv('RESULT_CACHE_TTL', '3600')) or None
+    redisUrl = os.getenv('REDIS_URL')
+    if redisUrl:
+        import redis
+        return ResultCache(RedisCache(redis.Redis.from_url(redisUrl), int(ttl) if ttl else None))
+    return ResultCache(LRUCache(int(os.getenv('RESULT_CACHE_SIZE', '1024')), ttl))
+
+
+resultCache = create_result_cache()
+# fastText predictions per sentence, so an edited posting only re-detects its changed sentences
+languageMemo = SentenceMemo(int(os.getenv('LANGUAGE_MEMO_SIZE', '50000')))
+
+
+def tag_description(text, tokens, detectedLanguages, tagIndex):
+    # Tag the plain text of one job description from its tokens, its detected languages (unprocessed)
+    # and a tag dictionary version
+    # Returns the same dict handler() responds with
+
+    # Filter the detected language set to only have top 12 languages for immigrants
+    detectedLanguages = [lang.upper() for lang in detectedLanguages if lang in topLanguageSet]
+    
+    # ex: { 'employmentType': ['fullTime', 'partTime', 'hybrid']}
+    groupToKeywordDict = {}
+    salaries = []
+    if 'EN' in detectedLanguages:
+        # Process each word in lowercase
+        words = [text[start:end].lower() for start, end in tokens.words]
+        # Longest tagDict / phraseDict matches in one scan over the words
+        # Example: 'full-time' is ('full', 'time') which matches 'full time': ['jobType', 'fullTime']
+        groupToKeywordDict = {group: list(values) for group, values in tagIndex.matcher.group_values(words).items()}
+
+        # Salary mentions ('$60k–$80k', '$25/hr', 'USD 50,000 per year'...) from the same words
+        salaries = extract_salaries(words)
+
+    groupToKeywordDict.setdefault('languages', [])
+    groupToKeywordDict['languages'] += [lang for lang in detectedLanguages if lang not in groupToKeywordDict['languages']]
+    
+    # Process the salary info
+    # salaryList: every amount found, the most likely pay of the job is in groupToKeywordDict
+    salaryList = sorted({value for salary in salaries for value in (salary.min, salary.max)})
+    salary = best_salary(salaries)
+    if salary:
+        # A single amount is the minimum, ex: '$50,000 and up'
+        groupToKeywordDict['payType'] = 'range' if salary.min != salary.max else 'minimum'
+        groupToKeywordDict['salary'] = {'max': salary.max, 'min': salary.min}
+        groupToKeywordDict['payPeriod'] = salary.period
+
+    return {
+        'group_to_keyword_dict': groupToKeywordDict,
+        'salary': salaryList,
+        'salary_confidence': salary.confidence if salary else None
+    }
+
 
 @app.route('/', methods=['POST'])
 @cross_origin()  # allow all origins all methods.
 def handler():
+    tagStore.maybe_reload()
     data = request.json
     if not data:
             return jsonify({'error': 'No data provided'}), 400
@@ -52,124 +118,159 @@ def handler():
     if not jobDescription:
         return jsonify({'error': 'No job description provided'}), 400
 
+    tagIndex = tagStore.current
+    try:
+        cacheKey = resultCache.key(jobDescription, tagIndex.version)
+    except Exception as e:
+        # ex: a description that is not a string
+        return jsonify({'error': f'Processing failed: {str(e)}'}), 400
+    result = resultCache.get(cacheKey)
+    if result is not None:
+        return jsonify(result), 200
+
     try:
+        # Rich text to plain text with one block (p, li, h1...) per line
+        text = html_to_text(jobDescription)
+        # One pass over the text for sentence spans and word spans
+        tokens = tokenize(text)
         # detectedLanguages: Set of detected languages (unprocessed)
-        detectedLanguages = set()
-        
-        # ex: { 'employmentType': ['full', 'part', 'hybrid']}
-        groupToKeywordDict = {}
-        
-        # beginningOfSentence: index where the last sentence ends in jobDescription
-        beginningOfSentence = 0
-        # beginningOfWord: index where the last word ends in jobDescription
-        beginningOfWord = 0
-        groupToKeywordDict['languages'] = set()
-        salaryList = []
-        skipping = False
-
-        for jobDescriptionIndex, char in enumerate(jobDescription):
-            # Don't process anything inside the tag
-            if char == '>':
-                skipping = False
-                beginningOfSentence = jobDescriptionIndex + 1
-            elif skipping:
+        # All sentences are classified with one batched fastText call
+        detectedLanguages = detect_languages(lang_model, [text], [tokens], languageMemo)[0]
+        result = tag_description(text, tokens, detectedLanguages, tagIndex)
+    except Exception as e:
+        return jsonify({'error': f'Processing failed: {str(e)}'}), 400
+
+    resultCache.set(cacheKey, result)
+
+    return jsonify(result), 200
+
+
+# Number of job descriptions sharing one batched fastText call in /batch
+BATCH_CHUNK_SIZE = 256
+ndjsonMimetypeSet = {'application/x-ndjson', 'application/jsonl', 'application/json-seq'}
+
+
+def read_ndjson(stream):
+    # Read one job description per line so that the whole upload is never held in memory
+    for line in stream:
+        line = line.strip()
+        if line:
+            try:
+                yield json.loads(line)
+            except ValueError:
+                yield None
+
+
+def tag_chunk(chunk):
+    # chunk: list of (index, item) where item looks like the body of '/'
+    # Every line is a JSON object with the index of the item and either the '/' result or an error
+    # The whole chunk is tagged with the same dictionary version
+    tagIndex = tagStore.current
+    lines = []
+    # pending: (line, job description, cache key) of the items that are not in the result cache
+    pending = []
+    for index, item in chunk:
+        line = {'index': index}
+        if isinstance(item, dict) and 'id' in item:
+            line['id'] = item['id']
+        if not item or not isinstance(item, dict):
+            line['error'] = 'No data provided'
+        elif not item.get('description'):
+            line['error'] = 'No job description provided'
+        else:
+            try:
+                cacheKey = resultCache.key(item['description'], tagIndex.version)
+            except Exception as e:
+                line['error'] = f'Processing failed: {str(e)}'
+                lines.append(line)
                 continue
-            elif char in sentenceStopperSet and beginningOfSentence < jobDescriptionIndex or jobDescriptionIndex == len(jobDescription) - 1:
-                if char == '<':
-                    skipping = True
-                # Detect language for each sentence
-                sentence = jobDescription[beginningOfSentence: jobDescriptionIndex].strip()
-                while sentence and sentence[-1] in unnecessaryEndsSet:
-                        sentence = sentence[:-1]
-                while sentence and sentence[0] in unnecessaryEndsSet:
-                    sentence = sentence[1:]
-                if len(sentence) >= 10:  # Skip empty sentences
-                    # Predict the language of the job description
-                    predictions = lang_model.predict(sentence, k=1)  # k=1 returns the top prediction
-                    lang = predictions[0][0].replace('__label__', '')
-                    confidence = predictions[1][0]
-                    #print(lang, confidence, sentence)
-                    if confidence > 0.8:
-                        detectedLanguages.add(lang)
-                # Update beginningOfSentence
-                beginningOfSentence = jobDescriptionIndex + 1
-            
-        # Filter the detected language set to only have top 12 languages for immigrants
-        detectedLanguages = [lang.upper() for lang in detectedLanguages if lang in topLanguageSet]
-        
-        if 'EN' in detectedLanguages:
-            for jobDescriptionIndex, char in enumerate(jobDescription):
-                if char in wordStopperSet and beginningOfWord < jobDescriptionIndex or jobDescriptionIndex == len(jobDescription) - 1:
-                    # Process each word in lowercase
-                    word = jobDescription[beginningOfWord: jobDescriptionIndex].strip().lower()
-                    while word and word[-1] in unnecessaryEndsSet:
-                        word = word[:-1]
-                    while word and word[0] in unnecessaryEndsSet:
-                        word = word[1:]
-                    if word:
-                        if word in tagDict:
-                            group = tagDict[word][0]
-                            # Example: (word: tagDict[word][0]) is ('full': 'employmentType')
-                            # Inside groupToKeywordDict, we want to store
-                            # { 'employmentType': ['full', 'part', 'hybrid']}
-                            if group in groupToKeywordDict:
-                                groupToKeywordDict[group].add(word)
-                            else:
-                                groupToKeywordDict[group] = {word}
-                        elif word[0] == "$":
-                            # Process the salary info when $ is detected and there are less than 2 salary info
-                            # If there are more than 2 salary info, the rest are probably tips or too complicated to process 
-                            word = word[1:].replace(',', '')
-                            wordIndex = 0
-                            while wordIndex < len(word) and word[wordIndex].isdigit():
-                                wordIndex += 1
-                            salaryList.append(word[:wordIndex])
-
-                        
-                    # Update beginningOfWord
-                    beginningOfWord = jobDescriptionIndex + 1
-                
-        # Before putting into JSON
-        # Translate each keyword to the matching keyword in our database
-        for group in groupToKeywordDict:
-            # group ex: 'employmentType'
-            # groupToKeywordDict[group] ex: ['full', 'part', 'hybrid']
-            # key ex: 'full', 'part', 'hybrid'
-            groupToKeywordDict[group] = [tagDict[key][1] for key in list(groupToKeywordDict[group])]
-
-        groupToKeywordDict['languages'] += [lang for lang in detectedLanguages if lang not in groupToKeywordDict['languages']]
-        
-        # Process the salary info
-        if salaryList:
-            # Sort the salaryList to get the max and min salary
-            salaryList = sorted(salaryList)
-            if len(salaryList) == 1:
-                groupToKeywordDict['payType'] = 'minimum'
-                groupToKeywordDict['salary'] = {'max': int(salaryList[0]), 'min': int(salaryList[0])}
-            else:
-                # If there are more than 1 salary info, it is a range
-                # It cannot be zero because we already checked if there is any salary info
-                groupToKeywordDict['payType'] = 'range'
-                # The last element is the max salary and the second to last element is the min salary
-                # The rest of smaller salary info are probably tips
-                groupToKeywordDict['salary'] = {'max': int(salaryList[-1]), 'min': int(salaryList[-2]) if len(salaryList[-1]) - len(salaryList[-2]) <= 1 else int(salaryList[-1])}
-                # print(groupToKeywordDict['salary'])
-
-            if len(str(groupToKeywordDict['salary']['max'])) <= 3:
-                # If the salary is hourly, it is less than $1000
-                groupToKeywordDict['payPeriod'] = 'hourly'
+            result = resultCache.get(cacheKey)
+            if result is None:
+                pending.append((line, item['description'], cacheKey))
             else:
-                # $1,000 ~ $999,999 and over is yearly
-                groupToKeywordDict['payPeriod'] = 'yearly'
+                line.update(result)
+        lines.append(line)
+
+    # A description that can not be read only fails its own line
+    parsed = []
+    texts = []
+    tokensList = []
+    for line, jobDescription, cacheKey in pending:
+        try:
+            text = html_to_text(jobDescription)
+            tokens = tokenize(text)
+        except Exception as e:
+            line['error'] = f'Processing failed: {str(e)}'
+            continue
+        parsed.append((line, cacheKey))
+        texts.append(text)
+        tokensList.append(tokens)
 
+    try:
+        # One batched fastText call for the whole chunk
+        languagesList = detect_languages(lang_model, texts, tokensList, languageMemo)
     except Exception as e:
-        return jsonify({'error': f'Processing failed: {str(e)}'}), 400
+        languagesList = []
+        for line, _ in parsed:
+            line['error'] = f'Processing failed: {str(e)}'
+
+    for (line, cacheKey), text, tokens, detectedLanguages in zip(parsed, texts, tokensList, languagesList):
+        try:
+            result = tag_description(text, tokens, detectedLanguages, tagIndex)
+        except Exception as e:
+            line['error'] = f'Processing failed: {str(e)}'
+            continue
+        resultCache.set(cacheKey, result)
+        line.update(result)
 
+    for line in lines:
+        yield json.dumps(line) + '\n'
+
+
+def tag_batch(items):
+    chunk = []
+    for index, item in enumerate(items):
+        chunk.append((index, item))
+        if len(chunk) == BATCH_CHUNK_SIZE:
+            yield from tag_chunk(chunk)
+            chunk = []
+    if chunk:
+        yield from tag_chunk(chunk)
+
+
+@app.route('/batch', methods=['POST'])
+@cross_origin()  # allow all origins all methods.
+def batch_handler():
+    # Body: JSON array or NDJSON of {'description': ..., 'id': optional}
+    # Response: NDJSON streamed back in the same order, one line per item
+    tagStore.maybe_reload()
+    if request.mimetype in ndjsonMimetypeSet:
+        items = read_ndjson(request.stream)
+    else:
+        items = request.get_json(silent=True)
+        if not isinstance(items, list):
+            return jsonify({'error': 'Expected a JSON array or NDJSON of job descriptions'}), 400
+
+    return Response(stream_with_context(tag_batch(items)), mimetype='application/x-ndjson')
+
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
     return jsonify({
-        'group_to_keyword_dict': groupToKeywordDict,
-        'salary': salaryList
+        'process': {
+            'pid': os.getpid(),
+            'rssBytes': process_rss(),
+            'startupSeconds': startupSeconds,
+        },
+        'langModel': lang_model.metrics(),
+        'resultCache': resultCache.metrics(),
+        'languageMemo': languageMemo.metrics(),
+        'tagDictionary': tagStore.metrics(),
     }), 200
 
+
+startupSeconds = time.perf_counter() - startupStart
+
 if __name__ == '__main__':
     try:
         app.run(debug=True, port=3001)
@@ -0,0 +1,107 @@
+import html
+import re
+
+# Tags that start or end a block of text, their boundaries always end a sentence
+blockTagSet = {
+    'address', 'article', 'aside', 'blockquote', 'br', 'dd', 'div', 'dl', 'dt', 'figcaption', 'footer',
+    'form', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'header', 'hr', 'li', 'main', 'nav', 'ol', 'p', 'pre',
+    'section', 'table', 'td', 'th', 'title', 'tr', 'ul',
+}
+# Tags whose content is not text of the job description
+skippedTagSet = {'script', 'style', 'noscript', 'template', 'head', 'svg', 'iframe', 'object'}
+
+# Attributes may contain '>' inside quotes, ex: <p title="a > b">
+_attributes = r'''(?:[^>"']|"[^"]*"|'[^']*')*'''
+# Every piece of markup, the text is what is between two matches
+#   comment - start of a comment, skipped up to its '-->'
+#   skip    - a skipped tag, ex: <script>, skipped with its content up to its end tag
+#   tag     - name of any other start or end tag, ex: 'p' for <p class="x"> or </p>
+#   partial - markup cut off by the end of the input, fed again with the next chunk
+# The end of a comment or skipped tag is found with one forward search from its start, an unclosed one skips the rest
+_markup = re.compile(
+    r'(?P<comment><!--)'
+    r'|<(?P<skip>' + '|'.join(sorted(skippedTagSet)) + r')\b' + _attributes + r'>'
+    r'|</?(?P<tag>[a-zA-Z][\w:-]*)' + _attributes + r'>'
+    r'|<[!?][^>]*>'
+    r'|(?P<partial><[a-zA-Z/!?].*)\Z',
+    re.S | re.I
+)
+_commentEnd = re.compile(r'-->')
+_skippedEnds = {tag: re.compile(r'</' + tag + r'\s*>', re.I) for tag in skippedTagSet}
+# While skipping, the end of a chunk is kept for the next one in case it holds the start of the end tag
+_SKIPPED_TAIL = 64
+_whitespace = re.compile(r'\s+')
+
+
+class HTMLTextStream:
+    # Incremental HTML to text: feed() chunks of rich text, get back the blocks of text completed so far
+    # Entities are decoded, tags and attributes are dropped, <script>/<style> content is skipped
+    # and whitespace is collapsed like a browser does. Markup is found with one compiled regex.
+
+    def __init__(self):
+        self._pending = ''
+        self._parts = []
+        # End of the comment or skipped tag being skipped, None when in text
+        self._skipping = None
+
+    def _endBlock(self, blocks):
+        text = ''.join(self._parts)
+        self._parts = []
+        if '&' in text:
+            text = html.unescape(text)
+        text = _whitespace.sub(' ', text).strip()
+        if text:
+            blocks.append(text)
+
+    def _process(self, final):
+        data = self._pending
+        self._pending = ''
+        blocks = []
+        position = 0
+        while True:
+            if self._skipping is not None:
+                end = self._skipping.search(data, position)
+                if end is None:
+                    if not final:
+                        self._pending = data[max(position, len(data) - _SKIPPED_TAIL):]
+                    break
+                self._skipping = None
+                position = end.end()
+            match = _markup.search(data, position)
+            if match is None:
+                self._parts.append(data[position:])
+                break
+            if match.start() > position:
+                self._parts.append(data[position:match.start()])
+            position = match.end()
+            if match.group('partial') is not None:
+                if not final:
+                    # Wait for the rest of the markup
+                    self._pending = match.group('partial')
+                break
+            if match.group('comment') is not None:
+                self._skipping = _commentEnd
+            elif match.group('skip') is not None:
+                self._skipping = _skippedEnds[match.group('skip').lower()]
+            elif match.group('tag').lower() in blockTagSet:
+                self._endBlock(blocks)
+        if final:
+            self._skipping = None
+            self._endBlock(blocks)
+        return blocks
+
+    def feed(self, chunk):
+        self._pending += chunk
+        return self._process(final=False)
+
+    def close(self):
+        # An unclosed tag or <script> at the very end is dropped
+        return self._process(final=True)
+
+
+def html_to_text(html):
+    # One block per line: the tokenizer treats '\n' as the end of a sentence
+    stream = HTMLTextStream()
+    blocks = stream.feed(html)
+    blocks += stream.close()
+    return '\n'.join(blocks)
@@ -0,0 +1,60 @@
+import os
+import resource
+import threading
+import time
+import fasttext
+
+
+def process_rss():
+    # Current resident set size of this process in bytes
+    try:
+        with open('/proc/self/statm') as file:
+            return int(file.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        # No /proc (ex: macOS), fall back to the peak RSS (kilobytes on Linux, bytes on macOS)
+        maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return maxrss if os.uname().sysname == 'Darwin' else maxrss * 1024
+
+
+class LazyModel:
+    # fastText model loaded on first use and then shared by every request of the process
+    # Loading it before the server forks (preload) lets workers share its pages copy-on-write
+
+    def __init__(self, path):
+        self.path = path
+        self.loadSeconds = None
+        self.rssDelta = None
+        self.loadedInPid = None
+        self._model = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        model = self._model
+        if model is not None:
+            return model
+        with self._lock:
+            if self._model is None:
+                rssBefore = process_rss()
+                start = time.perf_counter()
+                try:
+                    model = fasttext.load_model(self.path)
+                except Exception as e:
+                    raise RuntimeError(f"Failed to load language model: {str(e)}")
+                self.loadSeconds = time.perf_counter() - start
+                self.rssDelta = process_rss() - rssBefore
+                self.loadedInPid = os.getpid()
+                self._model = model
+        return self._model
+
+    def predict(self, *args, **kwargs):
+        return self.get().predict(*args, **kwargs)
+
+    def metrics(self):
+        return {
+            'path': self.path,
+            'loaded': self._model is not None,
+            'loadSeconds': self.loadSeconds,
+            'rssDeltaBytes': self.rssDelta,
+            # Different from the worker pid when the model was preloaded before fork
+            'loadedInPid': self.loadedInPid,
+        }
@@ -0,0 +1,83 @@
+import hashlib
+import sys
+from cache import LRUCache
+from tokenizer import tokenize
+
+# Sentences shorter than this are too short for a reliable prediction
+MIN_SENTENCE_LENGTH = 10
+# Predictions below this confidence are ignored
+CONFIDENCE_THRESHOLD = 0.8
+
+
+class SentenceMemo:
+    # Bounded store of fastText predictions keyed by sentence hash
+    # Autosaves of a long posting only send new or edited sentences to the model
+
+    def __init__(self, maxsize=50000):
+        self.cache = LRUCache(maxsize)
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, sentence):
+        # 16 byte digest instead of the sentence itself keeps the memory per entry small and fixed
+        return hashlib.blake2b(sentence.encode('utf-8'), digest_size=16).digest()
+
+    def get(self, sentence):
+        prediction = self.cache.get(self.key(sentence))
+        if prediction is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return prediction
+
+    def set(self, sentence, prediction):
+        self.cache.set(self.key(sentence), prediction)
+
+    def metrics(self):
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self.cache), 'maxsize': self.cache.maxsize}
+
+
+def detect_languages(lang_model, jobDescriptions, tokensList=None, memo=None):
+    # Detect the languages of many job descriptions with a single batched fastText call
+    # Sentences already in memo (a SentenceMemo) are not sent to the model again
+    # Returns one set of (unprocessed) language codes per job description, ex: [{'en', 'es'}, {'fr'}]
+    if tokensList is None:
+        tokensList = [tokenize(jobDescription) for jobDescription in jobDescriptions]
+
+    # sentenceToOwners: unique sentence -> indexes of the job descriptions it appears in
+    sentenceToOwners = {}
+    for owner, (jobDescription, tokens) in enumerate(zip(jobDescriptions, tokensList)):
+        for start, end in tokens.sentences:
+            if end - start >= MIN_SENTENCE_LENGTH:
+                # fastText predicts one line at a time, '\n' always ends a sentence so it is never inside one
+                sentence = jobDescription[start:end]
+                sentenceToOwners.setdefault(sentence, set()).add(owner)
+
+    detectedLanguages = [set() for _ in jobDescriptions]
+    if not sentenceToOwners:
+        return detectedLanguages
+
+    # prediction: (language code, confidence)
+    sentenceToPrediction = {}
+    sentences = []
+    for sentence in sentenceToOwners:
+        prediction = memo.get(sentence) if memo is not None else None
+        if prediction is None:
+            sentences.append(sentence)
+        else:
+            sentenceToPrediction[sentence] = prediction
+
+    if sentences:
+        labels, confidences = lang_model.predict(sentences, k=1)  # k=1 returns the top prediction
+        for sentence, label, confidence in zip(sentences, labels, confidences):
+            # Interned so that memo entries share one string per language
+            prediction = (sys.intern(label[0].replace('__label__', '')), float(confidence[0]))
+            sentenceToPrediction[sentence] = prediction
+            if memo is not None:
+                memo.set(sentence, prediction)
+
+    for sentence, (lang, confidence) in sentenceToPrediction.items():
+        if confidence > CONFIDENCE_THRESHOLD:
+            for owner in sentenceToOwners[sentence]:
+                detectedLanguages[owner].add(lang)
+    return detectedLanguages
@@ -0,0 +1,72 @@
+from tokenizer import tokenize
+
+# Key of a trie node that holds the [group, value] of the phrase ending at that node
+# Words are never empty, so it cannot collide with a word
+_tagKey = ''
+
+
+def normalize_phrase(phrase):
+    # Split a phrase the same way job descriptions are split, ex: '401(k)' -> ('401', 'k')
+    return tuple(phrase[start:end].lower() for start, end in tokenize(phrase).words)
+
+
+class TagMatcher:
+    # Word-level trie compiled once from tagDict and the phrase table
+    # ex: {'paid': {'time': {'off': {'': ['benefits', 'paidTimeOff']}}}}
+
+    def __init__(self, tagDict, phraseDict=None):
+        self.root = {}
+        self.longestPhrase = 0
+        self.size = 0
+        for phrase, tag in list(tagDict.items()) + list((phraseDict or {}).items()):
+            self.add(phrase, tag)
+
+    def add(self, phrase, tag):
+        words = normalize_phrase(phrase)
+        if not words:
+            return
+        node = self.root
+        for word in words:
+            node = node.setdefault(word, {})
+        if _tagKey not in node:
+            self.size += 1
+        node[_tagKey] = tag
+        self.longestPhrase = max(self.longestPhrase, len(words))
+
+    def matches(self, words):
+        # Leftmost-longest, non-overlapping matches over lowercase words
+        # Yields (first word index, last word index + 1, [group, value])
+        # Each word is visited at most longestPhrase times, so a scan stays linear in the number of words
+        root = self.root
+        wordsLength = len(words)
+        index = 0
+        while index < wordsLength:
+            node = root.get(words[index])
+            if node is None:
+                index += 1
+                continue
+            matchEnd = -1
+            tag = None
+            end = index + 1
+            while True:
+                if _tagKey in node:
+                    matchEnd = end
+                    tag = node[_tagKey]
+                if end == wordsLength:
+                    break
+                node = node.get(words[end])
+                if node is None:
+                    break
+                end += 1
+            if matchEnd < 0:
+                index += 1
+            else:
+                yield index, matchEnd, tag
+                index = matchEnd
+
+    def group_values(self, words):
+        # ex: { 'jobType': {'fullTime'}, 'workplace': {'onSite'} }
+        groupToValues = {}
+        for _, _, (group, value) in self.matches(words):
+            groupToValues.setdefault(group, set()).add(value)
+        return groupToValues
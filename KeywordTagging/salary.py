@@ -0,0 +1,149 @@
+import re
+from collections import namedtuple
+
+# One salary mention: numbers are ints when whole (ex: 60000) or floats (ex: 20.5)
+# period: 'hourly', 'daily', 'weekly', 'monthly' or 'yearly'
+# confidence: 0.4 ~ 1.0, higher when the period is written out and when it is a range
+Salary = namedtuple('Salary', ['min', 'max', 'period', 'confidence'])
+
+# Words that follow an amount, ex: '$25/hr' -> ('$25', 'hr'), '50,000 per year' -> ('50,000', 'per', 'year')
+periodWordDict = {
+    'h': 'hourly', 'hr': 'hourly', 'hrs': 'hourly', 'hour': 'hourly', 'hourly': 'hourly',
+    'day': 'daily', 'daily': 'daily',
+    'wk': 'weekly', 'week': 'weekly', 'weekly': 'weekly',
+    'mo': 'monthly', 'month': 'monthly', 'monthly': 'monthly',
+    'yr': 'yearly', 'year': 'yearly', 'yearly': 'yearly', 'annum': 'yearly', 'annually': 'yearly', 'annual': 'yearly',
+}
+# Words that precede an amount, ex: 'hourly rate of $25', 'annual salary: $60k'
+periodAdjectiveDict = {
+    'hourly': 'hourly', 'daily': 'daily', 'weekly': 'weekly', 'monthly': 'monthly', 'yearly': 'yearly', 'annual': 'yearly',
+}
+# Words that can sit between an amount and its period, or between a period adjective and an amount
+fillerWordSet = {'per', 'a', 'an', 'each', 'every', 'usd', 'dollars', 'salary', 'pay', 'rate', 'wage', 'wages',
+                 'compensation', 'base', 'of', 'is', 'range', 'starting', 'at', 'from', 'between'}
+# Words between the two amounts of a range, ex: '$50000 to $70000'. A '-' is a word stopper, so
+# '$18 - $22' are two consecutive words
+rangeWordSet = {'to', 'and', 'through', 'thru', '~'}
+# Words that mark the next number as money, ex: 'USD 50,000'
+currencyWordSet = {'$', 'usd', 'us$'}
+
+_moneyFirstChars = {'$', 'u'}
+_number = r'(\d{1,3}(?:,\d{3})+|\d+)(\.\d+)?(k)?'
+# A whole word: '$60,000', '$60k', '$20.50', 'usd50000' or a range in one word, ex: '$60k–$80k'
+_moneyWord = re.compile(r'(?:\$|usd|us\$)' + _number + r'(?:[–—~]\$?' + _number + r')?')
+# A number after a currency word, ex: '50,000' in 'USD 50,000'
+_numberWord = re.compile(_number + r'(?:[–—~]\$?' + _number + r')?')
+
+
+def _value(digits, decimals, thousands):
+    value = float(digits.replace(',', '') + (decimals or ''))
+    if thousands:
+        value *= 1000
+    return int(value) if value.is_integer() else value
+
+
+def _amounts(match):
+    # 1 or 2 values of a matched money word
+    values = [_value(*match.group(1, 2, 3))]
+    if match.group(4) is not None:
+        # The 'k' of the upper bound applies to both, ex: '$60–80k'
+        thousands = match.group(6) or match.group(3)
+        values.append(_value(match.group(4), match.group(5), thousands))
+        if values[0] < 1000 <= values[1] and thousands and not match.group(3):
+            values[0] = _value(match.group(1), match.group(2), thousands)
+    return values
+
+
+def _moneyAt(words, index):
+    # Returns (values, index of the last word used) when words[index] starts an amount, otherwise None
+    word = words[index]
+    if word[0] in _moneyFirstChars:
+        match = _moneyWord.fullmatch(word)
+        if match:
+            return _amounts(match), index
+        if word in currencyWordSet and index + 1 < len(words):
+            match = _numberWord.fullmatch(words[index + 1])
+            if match:
+                return _amounts(match), index + 1
+    return None
+
+
+def _periodAfter(words, index):
+    for word in words[index + 1: index + 4]:
+        if word in periodWordDict:
+            return periodWordDict[word]
+        if word not in fillerWordSet:
+            return None
+    return None
+
+
+def _periodBefore(words, index):
+    for word in reversed(words[max(index - 4, 0): index]):
+        if word in periodAdjectiveDict:
+            return periodAdjectiveDict[word]
+        if word not in fillerWordSet:
+            return None
+    return None
+
+
+def extract_salaries(words):
+    # Every salary mention in a list of lowercase words (see tokenizer.py), in one pass over the words
+    # Only words starting with '$' or 'u' (for 'usd') are looked at closely
+    salaries = []
+    wordsLength = len(words)
+    # Index of the first word not used by the previous mention
+    nextIndex = 0
+    for index, word in enumerate(words):
+        # Cheap first character check before any regex
+        if word[0] not in _moneyFirstChars or index < nextIndex:
+            continue
+        money = _moneyAt(words, index)
+        if money is None:
+            continue
+        values, last = money
+        # Range written as separate words: '$18 - $22', '$50000 to $70000'
+        if len(values) == 1:
+            lowerIndex = last
+            upperIndex = last + 1
+            if upperIndex < wordsLength and words[upperIndex] in rangeWordSet:
+                upperIndex += 1
+            if upperIndex < wordsLength:
+                upper = _moneyAt(words, upperIndex)
+                if upper is not None:
+                    values.append(upper[0][-1])
+                    last = upper[1]
+                else:
+                    # The upper bound often has no '$', ex: '$18-22/hr'
+                    match = _numberWord.fullmatch(words[upperIndex])
+                    if match and _amounts(match)[-1] > values[0]:
+                        values.append(_amounts(match)[-1])
+                        last = upperIndex
+                # As in one word, the 'k' of the upper bound applies to a bare lower bound, ex: '$60-80k'
+                if len(values) == 2 and values[0] < 1000 <= values[1] and words[last].endswith('k') \
+                        and not words[lowerIndex].endswith('k'):
+                    lower = values[0] * 1000
+                    values[0] = int(lower) if float(lower).is_integer() else lower
+
+        period = _periodAfter(words, last) or _periodBefore(words, index)
+        confidence = 0.5
+        if period is None:
+            # Less than $1000 is probably hourly, $1,000 ~ $999,999 and over is probably yearly
+            period = 'hourly' if max(values) < 1000 else 'yearly'
+        else:
+            confidence += 0.3
+        if len(values) == 2:
+            confidence += 0.2
+        salaries.append(Salary(min(values), max(values), period, round(confidence, 2)))
+        nextIndex = last + 1
+    return salaries
+
+
+def best_salary(salaries):
+    # The mention most likely to be the pay of the job, ex: '$18 - $22 per hour' over a '$500 sign-on bonus'
+    if not salaries:
+        return None
+    best = max(salaries, key=lambda salary: (salary.confidence, salary.max))
+    if any((salary.min, salary.max) != (best.min, best.max) for salary in salaries):
+        # Other amounts (bonuses, tips...) make it less certain
+        best = best._replace(confidence=round(best.confidence - 0.1, 2))
+    return best
@@ -41,8 +41,26 @@ tagDict = {
     'teamwork': ['skills', 'Teamwork'],
     'leadership': ['skills', 'Leadership'],
     'adaptability': ['skills', 'Adaptability'],
-    'site': ['workplace', 'onSite'],
+    'onsite': ['workplace', 'onSite'],
     'remote': ['workplace', 'remote'],
     'hybrid': ['workplace', 'hybrid']
     }
-    
\ No newline at end of file
+
+# Multi-word phrases, split with the same word stoppers as the job description
+# ex: 'on-site' and 'on site' both match 'on site', '401(k)' matches '401 k'
+# The longest phrase wins, so 'site' alone (ex: 'job site', 'web site') is no longer tagged
+phraseDict = {
+    'full time': ['jobType', 'fullTime'],
+    'part time': ['jobType', 'partTime'],
+    'night shift': ['workShift', 'nightShift'],
+    'evening shift': ['workShift', 'eveningShift'],
+    'health insurance': ['benefits', 'health'],
+    'life insurance': ['benefits', 'life'],
+    '401(k)': ['benefits', '_401k'],
+    'paid time off': ['benefits', 'paidTimeOff'],
+    'employee discount': ['benefits', 'employeeDiscounts'],
+    'referral bonus': ['benefits', 'referral'],
+    'on site': ['workplace', 'onSite'],
+    'in person': ['workplace', 'onSite'],
+    'work from home': ['workplace', 'remote'],
+}
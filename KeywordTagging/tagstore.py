@@ -0,0 +1,130 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import namedtuple
+from matcher import TagMatcher
+from tags import tagDict, phraseDict
+
+# Compiled, read-only view of one version of the tag dictionary
+# Requests read TagStore.current once and keep using that snapshot even if a reload swaps it
+TagIndex = namedtuple('TagIndex', ['version', 'matcher', 'entries', 'compileSeconds', 'loadedAt', 'source'])
+
+
+def fingerprint(content):
+    return hashlib.sha256(content).hexdigest()[:12]
+
+
+def parse_tag_file(path, content):
+    # File format (JSON or YAML):
+    # { "version": "optional", "tags": { "full": ["jobType", "fullTime"] }, "phrases": { "full time": [...] } }
+    if path.endswith(('.yaml', '.yml')):
+        try:
+            import yaml
+        except ImportError:
+            raise RuntimeError("PyYAML is required to load a YAML tag dictionary")
+        data = yaml.safe_load(content)
+    else:
+        data = json.loads(content)
+    if not isinstance(data, dict) or not isinstance(data.get('tags'), dict):
+        raise ValueError(f"{path} must contain a 'tags' dictionary")
+    phrases = data.get('phrases') or {}
+    if not isinstance(phrases, dict):
+        raise ValueError(f"{path}: 'phrases' must be a dictionary")
+    for section, entries in (('tags', data['tags']), ('phrases', phrases)):
+        for key, entry in entries.items():
+            # Checked here so a bad entry fails the reload instead of every request tagged with it
+            if not isinstance(entry, (list, tuple)) or len(entry) != 2 or not all(isinstance(item, str) for item in entry):
+                raise ValueError(f"{path}: {section} '{key}' must be a [group, value] pair of strings, got {entry!r}")
+    return data['tags'], phrases, str(data.get('version') or fingerprint(content))
+
+
+def compile_tags(tags, phrases, version, source):
+    start = time.perf_counter()
+    matcher = TagMatcher(tags, phrases)
+    return TagIndex(version, matcher, matcher.size, time.perf_counter() - start, time.time(), source)
+
+
+def builtin_index():
+    content = json.dumps({'tags': tagDict, 'phrases': phraseDict}, sort_keys=True).encode()
+    return compile_tags(tagDict, phraseDict, 'builtin-' + fingerprint(content), 'tags.py')
+
+
+class TagStore:
+    # Holds the active TagIndex and swaps it when the tag file changes
+    # Swapping is a single attribute assignment, so readers never wait for a reload
+
+    def __init__(self, path=None, reloadInterval=5.0):
+        self.path = path
+        self.reloadInterval = reloadInterval
+        self.lastError = None
+        self.reloads = 0
+        self._mtime = None
+        self._checkedAt = 0.0
+        self._lock = threading.Lock()
+        self.current = builtin_index() if path is None else self._load()
+
+    def _load(self):
+        mtime = os.stat(self.path).st_mtime_ns
+        with open(self.path, 'rb') as file:
+            content = file.read()
+        tags, phrases, version = parse_tag_file(self.path, content)
+        index = compile_tags(tags, phrases, version, self.path)
+        self._mtime = mtime
+        return index
+
+    def reload(self):
+        # Compile the file into a new index and swap it in, returns True when the index changed
+        # On failure the previous index stays active and the error is kept for /metrics
+        with self._lock:
+            return self._reload()
+
+    def _reload(self):
+        if self.path is None:
+            return False
+        try:
+            if os.stat(self.path).st_mtime_ns == self._mtime:
+                return False
+            index = self._load()
+        except Exception as e:
+            self.lastError = f'{type(e).__name__}: {e}'
+            return False
+        self.lastError = None
+        self.reloads += 1
+        self.current = index
+        return True
+
+    def maybe_reload(self):
+        # Called on every request: at most once per reloadInterval, check the file in a background thread
+        if self.path is None or time.monotonic() - self._checkedAt < self.reloadInterval:
+            return
+        if not self._lock.acquire(blocking=False):
+            return  # Another thread is already reloading
+        self._checkedAt = time.monotonic()
+
+        def run():
+            try:
+                self._reload()
+            finally:
+                self._lock.release()
+
+        threading.Thread(target=run, daemon=True).start()
+
+    def metrics(self):
+        index = self.current
+        return {
+            'version': index.version,
+            'source': index.source,
+            'entries': index.entries,
+            'compileSeconds': index.compileSeconds,
+            'loadedAt': index.loadedAt,
+            'reloads': self.reloads,
+            'lastError': self.lastError,
+        }
+
+
+if __name__ == '__main__':
+    # Export the built-in dictionary as a starting point for TAG_DICT_PATH
+    # $ python tagstore.py > tags.json
+    print(json.dumps({'version': builtin_index().version, 'tags': tagDict, 'phrases': phraseDict}, indent=2))
@@ -0,0 +1,91 @@
+import unittest
+from cache import LRUCache, RedisCache, ResultCache, normalize_description
+
+
+class FakeRedis:
+    # Local stand-in for redis.Redis with the two commands the cache uses
+    def __init__(self):
+        self.values = {}
+        self.expirations = {}
+
+    def get(self, key):
+        return self.values.get(key)
+
+    def set(self, key, value, ex=None):
+        self.values[key] = value.encode('utf-8')
+        self.expirations[key] = ex
+
+
+class BrokenRedis:
+    def get(self, key):
+        raise ConnectionError('connection refused')
+
+    def set(self, key, value, ex=None):
+        raise ConnectionError('connection refused')
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class LRUCacheTestCase(unittest.TestCase):
+
+    def test_evicts_least_recently_used(self):
+        cache = LRUCache(maxsize=2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+        self.assertEqual(cache.get('a'), 1)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('c'), 3)
+        self.assertEqual(len(cache), 2)
+
+    def test_ttl(self):
+        clock = FakeClock()
+        cache = LRUCache(maxsize=2, ttl=10, clock=clock)
+        cache.set('a', 1)
+        clock.now = 9.9
+        self.assertEqual(cache.get('a'), 1)
+        clock.now = 10
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(len(cache), 0)
+
+    def test_zero_size_disables_the_cache(self):
+        cache = LRUCache(maxsize=0)
+        cache.set('a', 1)
+        self.assertIsNone(cache.get('a'))
+
+
+class ResultCacheTestCase(unittest.TestCase):
+
+    def test_key_ignores_whitespace_and_depends_on_version(self):
+        resultCache = ResultCache(LRUCache())
+        self.assertEqual(normalize_description(' Full  time\n role '), 'Full time role')
+        self.assertEqual(resultCache.key('Full  time\nrole', 'v1'), resultCache.key('Full time role ', 'v1'))
+        self.assertNotEqual(resultCache.key('Full time role', 'v1'), resultCache.key('Full time role', 'v2'))
+
+    def test_hits_and_misses_with_redis_backend(self):
+        redis = FakeRedis()
+        resultCache = ResultCache(RedisCache(redis, ttl=60))
+        key = resultCache.key('Full time role', 'v1')
+        self.assertIsNone(resultCache.get(key))
+        resultCache.set(key, {'salary': ['60000']})
+        self.assertEqual(resultCache.get(key), {'salary': ['60000']})
+        self.assertEqual(redis.expirations['keywordtagging:' + key], 60)
+        self.assertEqual(resultCache.metrics(), {'backend': 'RedisCache', 'hits': 1, 'misses': 1, 'errors': 0})
+
+    def test_backend_errors_are_misses(self):
+        resultCache = ResultCache(RedisCache(BrokenRedis()))
+        resultCache.set('key', {})
+        self.assertIsNone(resultCache.get('key'))
+        self.assertEqual(resultCache.metrics()['errors'], 2)
+        self.assertEqual(resultCache.metrics()['misses'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
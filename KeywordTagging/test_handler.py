@@ -1,6 +1,7 @@
 import unittest
 from unittest.mock import patch, MagicMock
 import json
+import handler
 from handler import app
 from tags import tagDict
 
@@ -10,6 +11,8 @@ class HandlerTestCase(unittest.TestCase):
         global app
         cls.app = app.test_client()
         cls.app.testing = True
+        # Load the real model now, the lazy loader would otherwise keep whichever model the first test loads
+        handler.lang_model.get()
 
     def post_job_description(self, description):
             return self.app.post('/', data=json.dumps({'description': description}),
@@ -113,7 +116,7 @@ class HandlerTestCase(unittest.TestCase):
             self.assertEqual(response_data['group_to_keyword_dict']['salary']['max'], 70000)
             self.assertIn('partTime', response_data['group_to_keyword_dict']['jobType'])
 
-    @patch('handler.fasttext.load_model')
+    @patch('langmodel.fasttext.load_model')
     def test_english_language_detection(self, mock_load_model):
         mock_model = MagicMock()
         mock_model.predict.return_value = (['__label__en'], [0.99])
@@ -129,7 +132,7 @@ class HandlerTestCase(unittest.TestCase):
         self.assertIn('group_to_keyword_dict', response_data)
         self.assertIn('EN', response_data['group_to_keyword_dict']['languages'])
 
-    @patch('handler.fasttext.load_model')
+    @patch('langmodel.fasttext.load_model')
     def test_spanish_language_detection(self, mock_load_model):
         mock_model = MagicMock()
         mock_model.predict.return_value = (['__label__es'], [0.99])
@@ -145,7 +148,7 @@ class HandlerTestCase(unittest.TestCase):
         self.assertIn('group_to_keyword_dict', response_data)
         self.assertIn('ES', response_data['group_to_keyword_dict']['languages'])
 
-    @patch('handler.fasttext.load_model')
+    @patch('langmodel.fasttext.load_model')
     def test_french_language_detection(self, mock_load_model):
         mock_model = MagicMock()
         mock_model.predict.return_value = (['__label__fr'], [0.99])
@@ -161,7 +164,7 @@ class HandlerTestCase(unittest.TestCase):
         self.assertIn('group_to_keyword_dict', response_data)
         self.assertIn('FR', response_data['group_to_keyword_dict']['languages'])
 
-    @patch('handler.fasttext.load_model')
+    @patch('langmodel.fasttext.load_model')
     def test_chinese_language_detection(self, mock_load_model):
         mock_model = MagicMock()
         mock_model.predict.return_value = (['__label__zh'], [0.99])
@@ -177,7 +180,7 @@ class HandlerTestCase(unittest.TestCase):
         self.assertIn('group_to_keyword_dict', response_data)
         self.assertIn('ZH', response_data['group_to_keyword_dict']['languages'])
 
-    @patch('handler.fasttext.load_model')
+    @patch('langmodel.fasttext.load_model')
     def test_hindi_language_detection(self, mock_load_model):
         mock_model = MagicMock()
         mock_model.predict.return_value = (['__label__hi'], [0.99])
@@ -193,7 +196,7 @@ class HandlerTestCase(unittest.TestCase):
         self.assertIn('group_to_keyword_dict', response_data)
         self.assertIn('HI', response_data['group_to_keyword_dict']['languages'])
 
-    @patch('handler.fasttext.load_model')
+    @patch('langmodel.fasttext.load_model')
     def test_arabic_language_detection(self, mock_load_model):
         mock_model = MagicMock()
         mock_model.predict.return_value = (['__label__ar'], [0.99])
@@ -209,7 +212,7 @@ class HandlerTestCase(unittest.TestCase):
         self.assertIn('group_to_keyword_dict', response_data)
         self.assertIn('AR', response_data['group_to_keyword_dict']['languages'])
 
-    @patch('handler.fasttext.load_model')
+    @patch('langmodel.fasttext.load_model')
     def test_portuguese_language_detection(self, mock_load_model):
         mock_model = MagicMock()
         mock_model.predict.return_value = (['__label__pt'], [0.99])
@@ -225,7 +228,7 @@ class HandlerTestCase(unittest.TestCase):
         self.assertIn('group_to_keyword_dict', response_data)
         self.assertIn('PT', response_data['group_to_keyword_dict']['languages'])
 
-    @patch('handler.fasttext.load_model')
+    @patch('langmodel.fasttext.load_model')
     def test_bengali_language_detection(self, mock_load_model):
         mock_model = MagicMock()
         mock_model.predict.return_value = (['__label__bn'], [0.99])
@@ -241,7 +244,7 @@ class HandlerTestCase(unittest.TestCase):
         self.assertIn('group_to_keyword_dict', response_data)
         self.assertIn('BN', response_data['group_to_keyword_dict']['languages'])
 
-    @patch('handler.fasttext.load_model')
+    @patch('langmodel.fasttext.load_model')
     def test_russian_language_detection(self, mock_load_model):
         mock_model = MagicMock()
         mock_model.predict.return_value = (['__label__ru'], [0.99])
@@ -257,7 +260,7 @@ class HandlerTestCase(unittest.TestCase):
         self.assertIn('group_to_keyword_dict', response_data)
         self.assertIn('RU', response_data['group_to_keyword_dict']['languages'])
 
-    @patch('handler.fasttext.load_model')
+    @patch('langmodel.fasttext.load_model')
     def test_urdu_language_detection(self, mock_load_model):
         mock_model = MagicMock()
         mock_model.predict.return_value = (['__label__ur'], [0.99])
@@ -273,7 +276,7 @@ class HandlerTestCase(unittest.TestCase):
         self.assertIn('group_to_keyword_dict', response_data)
         self.assertIn('UR', response_data['group_to_keyword_dict']['languages'])
 
-    @patch('handler.fasttext.load_model')
+    @patch('langmodel.fasttext.load_model')
     def test_korean_language_detection(self, mock_load_model):
         mock_model = MagicMock()
         mock_model.predict.return_value = (['__label__ko'], [0.99])
@@ -289,7 +292,7 @@ class HandlerTestCase(unittest.TestCase):
         self.assertIn('group_to_keyword_dict', response_data)
         self.assertIn('KO', response_data['group_to_keyword_dict']['languages'])
 
-    @patch('handler.fasttext.load_model')
+    @patch('langmodel.fasttext.load_model')
     def test_japanese_language_detection(self, mock_load_model):
         mock_model = MagicMock()
         mock_model.predict.return_value = (['__label__ja'], [0.99])
@@ -306,5 +309,124 @@ class HandlerTestCase(unittest.TestCase):
         self.assertIn('JA', response_data['group_to_keyword_dict']['languages'])
 
 
+    def test_handler_phrases(self):
+        response = self.post_job_description('<p>This is an on-site warehouse position with paid time off and a 401(k) plan. Visit our job site to apply.</p>')
+        self.assertEqual(response.status_code, 200)
+        response_data = response.get_json()
+        self.assertEqual(response_data['group_to_keyword_dict']['workplace'], ['onSite'])
+        self.assertIn('_401k', response_data['group_to_keyword_dict']['benefits'])
+        self.assertIn('paidTimeOff', response_data['group_to_keyword_dict']['benefits'])
+
+    def test_metrics_tag_dictionary(self):
+        response = self.app.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        tagDictionary = response.get_json()['tagDictionary']
+        self.assertTrue(tagDictionary['version'])
+        self.assertGreater(tagDictionary['entries'], 0)
+        self.assertIn('compileSeconds', tagDictionary)
+        self.assertTrue(response.get_json()['langModel']['loaded'])
+        self.assertGreater(response.get_json()['process']['rssBytes'], 0)
+
+    def test_handler_rich_text(self):
+        response = self.post_job_description(
+            '<style>.pay > span { color: red; }</style>'
+            '<p title="Salary > $100000">We offer a salary of $50,000 &amp; up for this remote position.</p>'
+            '<script>var tracking = "$999999";</script>')
+        self.assertEqual(response.status_code, 200)
+        response_data = response.get_json()
+        self.assertEqual(response_data['group_to_keyword_dict']['salary'], {'max': 50000, 'min': 50000})
+        self.assertEqual(response_data['group_to_keyword_dict']['workplace'], ['remote'])
+
+    def test_handler_hourly_salary_with_bonus(self):
+        response = self.post_job_description('<p>We are hiring warehouse associates for the night shift. The pay is $18 - $22 per hour, plus a $500 sign-on bonus after 90 days.</p>')
+        self.assertEqual(response.status_code, 200)
+        response_data = response.get_json()
+        self.assertEqual(response_data['group_to_keyword_dict']['salary'], {'min': 18, 'max': 22})
+        self.assertEqual(response_data['group_to_keyword_dict']['payType'], 'range')
+        self.assertEqual(response_data['group_to_keyword_dict']['payPeriod'], 'hourly')
+        self.assertEqual(response_data['salary'], [18, 22, 500])
+        self.assertEqual(response_data['salary_confidence'], 0.9)
+
+    @patch('handler.detect_languages')
+    def test_result_cache(self, mock_detect_languages):
+        mock_detect_languages.return_value = [{'en'}]
+        description = '<p>Remote   customer support role with dental insurance.</p>'
+        before = self.app.get('/metrics').get_json()['resultCache']
+
+        first = self.post_job_description(description)
+        # Same description re-saved with different whitespace
+        second = self.post_job_description(description.replace('   ', ' ') + '\n')
+        self.assertEqual(first.get_json(), second.get_json())
+        self.assertEqual(mock_detect_languages.call_count, 1)
+
+        after = self.app.get('/metrics').get_json()['resultCache']
+        self.assertEqual(after['hits'] - before['hits'], 1)
+        self.assertEqual(after['misses'] - before['misses'], 1)
+
+    def test_batch_json_array(self):
+        test_data = [
+            {'id': 'a', 'description': '<p>We are looking for a full-time Python developer. Salary: $60000 - $80000 per year. Must be fluent in Spanish.</p>'},
+            {'id': 'b', 'description': ''},
+            {'id': 'c', 'description': '<p>We offer a competitive salary of $50000 to $70000 per year for the right candidate. Part-time positions are also available.</p>'},
+        ]
+
+        response = self.app.post('/batch', data=json.dumps(test_data), content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, 'application/x-ndjson')
+        lines = [json.loads(line) for line in response.data.decode('utf-8').splitlines()]
+        self.assertEqual([line['index'] for line in lines], [0, 1, 2])
+        self.assertEqual([line['id'] for line in lines], ['a', 'b', 'c'])
+        self.assertIn('fullTime', lines[0]['group_to_keyword_dict']['jobType'])
+        self.assertEqual(lines[0]['group_to_keyword_dict']['salary'], {'min': 60000, 'max': 80000})
+        self.assertEqual(lines[1]['error'], 'No job description provided')
+        self.assertIn('partTime', lines[2]['group_to_keyword_dict']['jobType'])
+
+    def test_batch_ndjson_matches_single_requests(self):
+        descriptions = [
+            '<p>Looking for a Python developer. Must be fluent in French and Spanish. Offering flexible work hours and bonuses.</p>',
+            '<p>Thrives in a collaborative environment, utilizing excellent communication and teamwork skills to achieve shared goals.</p>',
+        ]
+        body = '\n'.join(json.dumps({'description': description}) for description in descriptions) + '\nnot json\n'
+
+        response = self.app.post('/batch', data=body, content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, 200)
+        lines = [json.loads(line) for line in response.data.decode('utf-8').splitlines()]
+        self.assertEqual(len(lines), 3)
+        for line, description in zip(lines, descriptions):
+            single = self.post_job_description(description).get_json()
+            del line['index']
+            self.assertEqual(line, single)
+        self.assertEqual(lines[2]['error'], 'No data provided')
+
+    def test_description_not_a_string(self):
+        response = self.app.post('/', data=json.dumps({'description': 123}), content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('Processing failed', response.get_json()['error'])
+
+        test_data = [{'description': 123}, {'description': '<p>Part-time positions are available.</p>'}]
+        response = self.app.post('/batch', data=json.dumps(test_data), content_type='application/json')
+        lines = [json.loads(line) for line in response.data.decode('utf-8').splitlines()]
+        self.assertEqual(len(lines), 2)
+        self.assertIn('Processing failed', lines[0]['error'])
+        self.assertIn('partTime', lines[1]['group_to_keyword_dict']['jobType'])
+
+    def test_batch_item_that_can_not_be_read(self):
+        html_to_text = handler.html_to_text
+        def fail_on_broken(description):
+            if 'broken' in description:
+                raise ValueError('unreadable')
+            return html_to_text(description)
+        test_data = [{'description': '<p>broken</p>'}, {'description': '<p>Part-time positions are available.</p>'}]
+        with patch('handler.html_to_text', side_effect=fail_on_broken):
+            response = self.app.post('/batch', data=json.dumps(test_data), content_type='application/json')
+        lines = [json.loads(line) for line in response.data.decode('utf-8').splitlines()]
+        self.assertEqual(lines[0]['error'], 'Processing failed: unreadable')
+        self.assertIn('partTime', lines[1]['group_to_keyword_dict']['jobType'])
+
+    def test_batch_not_an_array(self):
+        response = self.app.post('/batch', data=json.dumps({'description': 'x'}), content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('Expected a JSON array', response.data.decode('utf-8'))
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,56 @@
+import time
+import unittest
+from htmltext import HTMLTextStream, html_to_text
+
+
+class HTMLTextTestCase(unittest.TestCase):
+
+    def test_blocks_become_lines(self):
+        html = '<h1>About us</h1><p>We are hiring.</p><ul><li>Dental</li><li>Vision<br>Life</li></ul>'
+        self.assertEqual(html_to_text(html), 'About us\nWe are hiring.\nDental\nVision\nLife')
+
+    def test_inline_tags_do_not_split_text(self):
+        html = '<p>A <strong>full</strong>-time role at <a href="/jobs">our store</a>.</p>'
+        self.assertEqual(html_to_text(html), 'A full-time role at our store.')
+
+    def test_entities_are_decoded(self):
+        self.assertEqual(html_to_text('<p>Health &amp; dental&nbsp;insurance, pay &lt; $20/hr</p>'),
+                         'Health & dental insurance, pay < $20/hr')
+
+    def test_script_style_and_attributes_are_dropped(self):
+        html = ('<style>p > span { color: red; }</style>'
+                '<p title="a > b">Remote role</p><script>if (a > b) { pay = "$999999"; }</script>')
+        self.assertEqual(html_to_text(html), 'Remote role')
+
+    def test_whitespace_is_collapsed(self):
+        self.assertEqual(html_to_text('<p>Full\n   time\troles</p>\n\n<p> Apply </p>'), 'Full time roles\nApply')
+
+    def test_plain_text_is_kept(self):
+        self.assertEqual(html_to_text('Remote role. Apply today!'), 'Remote role. Apply today!')
+
+    def test_incremental_feed(self):
+        stream = HTMLTextStream()
+        self.assertEqual(stream.feed('<p>First para'), [])
+        self.assertEqual(stream.feed('graph</p><p class="x'), ['First paragraph'])
+        self.assertEqual(stream.feed('">Second</p><p>Third'), ['Second'])
+        self.assertEqual(stream.close(), ['Third'])
+
+    def test_skipped_content_across_chunks(self):
+        stream = HTMLTextStream()
+        self.assertEqual(stream.feed('<p>Remote</p><script>var pay = "$999'), ['Remote'])
+        self.assertEqual(stream.feed('999";</scr'), [])
+        self.assertEqual(stream.feed('ipt><!-- note --'), [])
+        self.assertEqual(stream.feed('><p>Apply</p>'), ['Apply'])
+        self.assertEqual(stream.close(), [])
+
+    def test_unclosed_skipped_tags_are_linear(self):
+        # Every opener used to rescan the rest of the input for its end tag
+        for html in ('<style>' * 8000, '<script>x' * 16000, '<!--x>' * 16000):
+            start = time.perf_counter()
+            self.assertEqual(html_to_text('<p>Remote role</p>' + html), 'Remote role')
+            self.assertLess(time.perf_counter() - start, 1)
+        self.assertEqual(html_to_text('<p>Remote</p><script>x<p>Hidden</p>'), 'Remote')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,36 @@
+import unittest
+from unittest.mock import patch, MagicMock
+from langmodel import LazyModel, process_rss
+
+
+class LazyModelTestCase(unittest.TestCase):
+
+    @patch('langmodel.fasttext.load_model')
+    def test_loads_once_on_first_use(self, mock_load_model):
+        mock_model = MagicMock()
+        mock_model.predict.return_value = ([['__label__en']], [[0.99]])
+        mock_load_model.return_value = mock_model
+
+        lang_model = LazyModel('lid.176.ftz')
+        mock_load_model.assert_not_called()
+        self.assertFalse(lang_model.metrics()['loaded'])
+
+        self.assertEqual(lang_model.predict(['hello there'], k=1), ([['__label__en']], [[0.99]]))
+        lang_model.predict(['hello again'], k=1)
+        mock_load_model.assert_called_once_with('lid.176.ftz')
+        self.assertTrue(lang_model.metrics()['loaded'])
+        self.assertIsNotNone(lang_model.metrics()['loadSeconds'])
+
+    @patch('langmodel.fasttext.load_model')
+    def test_load_failure(self, mock_load_model):
+        mock_load_model.side_effect = ValueError('missing file')
+        with self.assertRaises(RuntimeError) as context:
+            LazyModel('missing.bin').get()
+        self.assertIn('Failed to load language model', str(context.exception))
+
+    def test_process_rss(self):
+        self.assertGreater(process_rss(), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
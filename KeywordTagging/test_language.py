@@ -0,0 +1,70 @@
+import unittest
+from unittest.mock import MagicMock
+from language import detect_languages, SentenceMemo
+
+
+def fake_predict(sentences, k=1):
+    # Pretend every sentence containing 'hola' is Spanish, uncertain when it contains 'maybe'
+    labels = [['__label__es'] if 'hola' in sentence else ['__label__en'] for sentence in sentences]
+    confidences = [[0.5] if 'maybe' in sentence else [0.99] for sentence in sentences]
+    return labels, confidences
+
+
+class DetectLanguagesTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.lang_model = MagicMock()
+        self.lang_model.predict.side_effect = fake_predict
+
+    def test_one_batched_call_for_many_descriptions(self):
+        jobDescriptions = [
+            '<p>We are hiring a cook. hola, buscamos un cocinero.</p>',
+            '<p>We maybe hire soon, who knows. Short.</p>',
+            '',
+        ]
+        detected = detect_languages(self.lang_model, jobDescriptions)
+
+        self.assertEqual(detected, [{'en', 'es'}, set(), set()])
+        self.lang_model.predict.assert_called_once()
+        sentences = self.lang_model.predict.call_args[0][0]
+        # 'Short' is below the minimum sentence length
+        self.assertNotIn('Short', sentences)
+
+    def test_duplicate_sentences_are_classified_once(self):
+        jobDescriptions = ['We are hiring a cook.', 'We are hiring a cook!']
+        detected = detect_languages(self.lang_model, jobDescriptions)
+
+        self.assertEqual(detected, [{'en'}, {'en'}])
+        self.assertEqual(self.lang_model.predict.call_args[0][0], ['We are hiring a cook'])
+
+    def test_sentences_never_contain_newlines(self):
+        detect_languages(self.lang_model, ['We are hiring\na line cook'])
+        self.assertEqual(self.lang_model.predict.call_args[0][0], ['We are hiring', 'a line cook'])
+
+    def test_no_sentences_skips_the_model(self):
+        self.assertEqual(detect_languages(self.lang_model, ['<p></p>']), [set()])
+        self.lang_model.predict.assert_not_called()
+
+
+    def test_memo_only_classifies_changed_sentences(self):
+        memo = SentenceMemo(maxsize=100)
+        detect_languages(self.lang_model, ['We are hiring a cook. The shift starts at noon.'], memo=memo)
+        self.assertEqual(self.lang_model.predict.call_args[0][0], ['We are hiring a cook', 'The shift starts at noon'])
+
+        # Autosave after editing the second sentence
+        detected = detect_languages(self.lang_model, ['We are hiring a cook. hola, the shift starts at one.'], memo=memo)
+        self.assertEqual(detected, [{'en', 'es'}])
+        self.assertEqual(self.lang_model.predict.call_args[0][0], ['hola, the shift starts at one'])
+        self.assertEqual(memo.metrics(), {'hits': 1, 'misses': 3, 'size': 3, 'maxsize': 100})
+
+        # Nothing changed: no model call at all
+        detect_languages(self.lang_model, ['We are hiring a cook. hola, the shift starts at one.'], memo=memo)
+        self.assertEqual(self.lang_model.predict.call_count, 2)
+
+    def test_memo_is_bounded(self):
+        memo = SentenceMemo(maxsize=2)
+        detect_languages(self.lang_model, ['First sentence here. Second sentence here. Third sentence here.'], memo=memo)
+        self.assertEqual(memo.metrics()['size'], 2)
+
+if __name__ == '__main__':
+    unittest.main()
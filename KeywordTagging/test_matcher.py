@@ -0,0 +1,45 @@
+import unittest
+from matcher import TagMatcher, normalize_phrase
+from tags import tagDict, phraseDict
+
+
+class TagMatcherTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tagMatcher = TagMatcher(tagDict, phraseDict)
+
+    def group_values(self, text):
+        return self.tagMatcher.group_values([word.lower() for word in text.split()])
+
+    def test_normalize_phrase(self):
+        self.assertEqual(normalize_phrase('401(k)'), ('401', 'k'))
+        self.assertEqual(normalize_phrase('On-Site'), ('on', 'site'))
+        self.assertEqual(normalize_phrase('Paid time off'), ('paid', 'time', 'off'))
+
+    def test_single_words(self):
+        self.assertEqual(self.group_values('remote dental bonus'),
+                         {'workplace': {'remote'}, 'benefits': {'dental', 'bonus'}})
+
+    def test_phrases(self):
+        self.assertEqual(self.group_values('on site 401 k and paid time off'),
+                         {'workplace': {'onSite'}, 'benefits': {'_401k', 'paidTimeOff'}})
+
+    def test_site_alone_is_not_tagged(self):
+        self.assertEqual(self.group_values('visit our job site'), {})
+
+    def test_longest_match_wins(self):
+        matcher = TagMatcher({'time': ['a', 'time']}, {'paid time off': ['benefits', 'paidTimeOff']})
+        self.assertEqual(list(matcher.matches(['paid', 'time', 'off'])), [(0, 3, ['benefits', 'paidTimeOff'])])
+        # A partial phrase falls back to the words it contains
+        self.assertEqual(list(matcher.matches(['paid', 'time', 'on'])), [(1, 2, ['a', 'time'])])
+
+    def test_matches_do_not_overlap(self):
+        matcher = TagMatcher({}, {'a b': ['g', 'ab'], 'b c': ['g', 'bc']})
+        self.assertEqual(list(matcher.matches(['a', 'b', 'c'])), [(0, 2, ['g', 'ab'])])
+
+    def test_size(self):
+        self.assertEqual(self.tagMatcher.size, len(tagDict) + len(phraseDict))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,56 @@
+import unittest
+from salary import Salary, extract_salaries, best_salary
+from tokenizer import tokenize
+
+
+def words_of(text):
+    return [text[start:end].lower() for start, end in tokenize(text).words]
+
+
+class SalaryTestCase(unittest.TestCase):
+
+    def best(self, text):
+        return best_salary(extract_salaries(words_of(text)))
+
+    def test_k_suffix_range_in_one_word(self):
+        self.assertEqual(self.best('Pay: $60k–$80k a year'), Salary(60000, 80000, 'yearly', 1.0))
+        self.assertEqual(self.best('Pay: $60–80k'), Salary(60000, 80000, 'yearly', 0.7))
+
+    def test_k_suffix_range_in_separate_words(self):
+        self.assertEqual(self.best('Pay: $60-80k'), Salary(60000, 80000, 'yearly', 0.7))
+        self.assertEqual(self.best('Pay: $60 - $80k a year'), Salary(60000, 80000, 'yearly', 1.0))
+        self.assertEqual(self.best('Pay: $60k-80k'), Salary(60000, 80000, 'yearly', 0.7))
+        self.assertEqual(self.best('$18-22/hr'), Salary(18, 22, 'hourly', 1.0))
+
+    def test_hourly(self):
+        self.assertEqual(self.best('Starting at $25/hr'), Salary(25, 25, 'hourly', 0.8))
+        self.assertEqual(self.best('$18-22/hr'), Salary(18, 22, 'hourly', 1.0))
+        self.assertEqual(self.best('hourly rate of $20.50'), Salary(20.5, 20.5, 'hourly', 0.8))
+
+    def test_currency_word(self):
+        self.assertEqual(self.best('USD 50,000 per year'), Salary(50000, 50000, 'yearly', 0.8))
+
+    def test_range_words(self):
+        self.assertEqual(self.best('$50000 to $70000 per year'), Salary(50000, 70000, 'yearly', 1.0))
+        self.assertEqual(self.best('$4,000 - $5,000 monthly'), Salary(4000, 5000, 'monthly', 1.0))
+
+    def test_numeric_comparison(self):
+        # Sorting strings put '$9' above '$80000'
+        self.assertEqual(self.best('Salary $80000 plus $9 tips'), Salary(80000, 80000, 'yearly', 0.4))
+
+    def test_prefers_pay_over_other_amounts(self):
+        salaries = extract_salaries(words_of('$18 - $22 per hour plus a $500 sign-on bonus'))
+        self.assertEqual(len(salaries), 2)
+        self.assertEqual(best_salary(salaries), Salary(18, 22, 'hourly', 0.9))
+
+    def test_period_inferred_from_amount(self):
+        self.assertEqual(self.best('Salary: $45,000'), Salary(45000, 45000, 'yearly', 0.5))
+        self.assertEqual(self.best('Pay: $15'), Salary(15, 15, 'hourly', 0.5))
+
+    def test_no_salary(self):
+        self.assertEqual(extract_salaries(words_of('Call us at 555 1234, $ signs and usd alone')), [])
+        self.assertIsNone(best_salary([]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+import json
+import os
+import tempfile
+import time
+import unittest
+from tagstore import TagStore
+
+
+class TagStoreTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'tags.json')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def write(self, data, path=None):
+        path = path or self.path
+        with open(path, 'w') as file:
+            file.write(data if isinstance(data, str) else json.dumps(data))
+        # Make sure the change is visible even on file systems with coarse timestamps
+        os.utime(path, ns=(time.time_ns(), time.time_ns() + 10 ** 9))
+
+    def group_values(self, tagStore, text):
+        return tagStore.current.matcher.group_values(text.split())
+
+    def test_builtin_dictionary(self):
+        tagStore = TagStore()
+        self.assertTrue(tagStore.current.version.startswith('builtin-'))
+        self.assertEqual(self.group_values(tagStore, 'remote'), {'workplace': {'remote'}})
+        self.assertFalse(tagStore.reload())
+
+    def test_load_and_reload(self):
+        self.write({'version': 'v1', 'tags': {'remote': ['workplace', 'remote']}})
+        tagStore = TagStore(self.path)
+        self.assertEqual(tagStore.current.version, 'v1')
+        self.assertEqual(tagStore.current.entries, 1)
+        self.assertFalse(tagStore.reload())
+
+        oldIndex = tagStore.current
+        self.write({'version': 'v2', 'tags': {'nurse': ['skills', 'Nursing']}, 'phrases': {'night shift': ['workShift', 'nightShift']}})
+        self.assertTrue(tagStore.reload())
+        self.assertEqual(tagStore.metrics()['version'], 'v2')
+        self.assertEqual(tagStore.metrics()['reloads'], 1)
+        self.assertEqual(self.group_values(tagStore, 'nurse night shift'),
+                         {'skills': {'Nursing'}, 'workShift': {'nightShift'}})
+        # A snapshot taken before the swap keeps working with the old dictionary
+        self.assertEqual(oldIndex.matcher.group_values(['remote']), {'workplace': {'remote'}})
+
+    def test_version_defaults_to_content_hash(self):
+        self.write({'tags': {'remote': ['workplace', 'remote']}})
+        version = TagStore(self.path).current.version
+        self.write({'tags': {'hybrid': ['workplace', 'hybrid']}})
+        self.assertNotEqual(TagStore(self.path).current.version, version)
+
+    def test_invalid_file_keeps_previous_version(self):
+        self.write({'version': 'v1', 'tags': {'remote': ['workplace', 'remote']}})
+        tagStore = TagStore(self.path)
+        self.write('{not json')
+        self.assertFalse(tagStore.reload())
+        self.assertEqual(tagStore.current.version, 'v1')
+        self.assertIn('JSONDecodeError', tagStore.metrics()['lastError'])
+
+    def test_invalid_entry_keeps_previous_version(self):
+        self.write({'version': 'v1', 'tags': {'remote': ['workplace', 'remote']}})
+        tagStore = TagStore(self.path)
+        for tags, phrases in (({'nurse': 'skills'}, {}), ({'nurse': ['skills']}, {}),
+                              ({'nurse': ['skills', 7]}, {}), ({}, {'night shift': ['workShift', 'nightShift', 'x']})):
+            self.write({'version': 'v2', 'tags': tags, 'phrases': phrases})
+            self.assertFalse(tagStore.reload())
+            self.assertEqual(tagStore.current.version, 'v1')
+            self.assertIn('ValueError', tagStore.metrics()['lastError'])
+
+    def test_maybe_reload_runs_in_background(self):
+        self.write({'version': 'v1', 'tags': {}})
+        tagStore = TagStore(self.path, reloadInterval=0)
+        self.write({'version': 'v2', 'tags': {}})
+        tagStore.maybe_reload()
+        for _ in range(100):
+            if tagStore.current.version == 'v2':
+                break
+            time.sleep(0.01)
+        self.assertEqual(tagStore.current.version, 'v2')
+
+    def test_yaml_file(self):
+        path = os.path.join(self.directory.name, 'tags.yaml')
+        self.write('version: y1\ntags:\n  remote: [workplace, remote]\n', path)
+        try:
+            tagStore = TagStore(path)
+        except RuntimeError:
+            self.skipTest('PyYAML is not installed')
+        self.assertEqual(tagStore.current.version, 'y1')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,49 @@
+import unittest
+from tokenizer import tokenize
+
+
+class TokenizerTestCase(unittest.TestCase):
+
+    def spans_to_text(self, text, spans):
+        return [text[start:end] for start, end in spans]
+
+    def test_words_are_trimmed_of_unnecessary_ends(self):
+        text = 'Offering (flexible) hours, bonuses! and $60,000.'
+        words = self.spans_to_text(text, tokenize(text).words)
+        self.assertEqual(words, ['Offering', 'flexible', 'hours', 'bonuses', 'and', '$60,000'])
+
+    def test_word_stoppers_split_words(self):
+        text = 'full-time/part-time: remote+hybrid'
+        words = self.spans_to_text(text, tokenize(text).words)
+        self.assertEqual(words, ['full', 'time', 'part', 'time', 'remote', 'hybrid'])
+
+    def test_sentences_split_on_stoppers(self):
+        text = 'We are hiring. Apply today! これは説明です。Thanks'
+        sentences = self.spans_to_text(text, tokenize(text).sentences)
+        self.assertEqual(sentences, ['We are hiring', 'Apply today', 'これは説明です', 'Thanks'])
+
+    def test_newlines_end_sentences(self):
+        text = 'Benefits\nHealth insurance\nPaid time off'
+        tokens = tokenize(text)
+        self.assertEqual(self.spans_to_text(text, tokens.sentences), ['Benefits', 'Health insurance', 'Paid time off'])
+        self.assertEqual(self.spans_to_text(text, tokens.words), ['Benefits', 'Health', 'insurance', 'Paid', 'time', 'off'])
+
+    def test_angle_brackets_are_stoppers(self):
+        # Decoded text can still contain them, ex: '&lt;' in the HTML
+        text = 'Pay <$20/hr> for nights'
+        tokens = tokenize(text)
+        self.assertEqual(self.spans_to_text(text, tokens.words), ['Pay', '$20', 'hr', 'for', 'nights'])
+        self.assertEqual(self.spans_to_text(text, tokens.sentences), ['Pay', '$20/hr', 'for nights'])
+
+    def test_last_character_is_kept(self):
+        text = 'Benefits include dental'
+        tokens = tokenize(text)
+        self.assertEqual(self.spans_to_text(text, tokens.words)[-1], 'dental')
+        self.assertEqual(self.spans_to_text(text, tokens.sentences), [text])
+
+    def test_empty_description(self):
+        self.assertEqual(tokenize(''), ([], []))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+import re
+from collections import namedtuple
+
+# Set to use to detect when to catch a word for tagging
+wordStopperSet = {' ', '(', ')', '{', '}', '[', ']', '-', '/', ':', ';', '&', '+', '<', '>'}
+# Set to use to detect some unnecessary ends of a word. Newly added for salary info processing
+unnecessaryEndsSet = {'.', ',', '(', ')', '{', '}', '[', ']', '-', '!', '/', ':', ';', '&', '+', '<', '>'}
+# Set to use to detect when to catch a sentence for language detection
+# '\n' separates the blocks (p, li, h1...) of the text produced by htmltext.html_to_text()
+sentenceStopperSet = {'.', '!', '。', '<', '>', '\n'}
+
+# Spans are (start, end) offsets into the text, already trimmed of unnecessary ends
+Tokens = namedtuple('Tokens', ['sentences', 'words'])
+
+
+def _charClass(chars):
+    return ''.join(re.escape(char) for char in sorted(chars))
+
+
+# Arguments for str.strip(), which trims both ends in C instead of slicing one char at a time
+_wordEnds = ''.join(unnecessaryEndsSet)
+_sentenceEnds = _wordEnds + ' \t\n\r\f\v'
+
+# One lexer over the whole text, one match per word or run of sentence stoppers.
+# Word stoppers and whitespace in front of a token are consumed by the same match.
+#   stop  - sentence stoppers that are not inside a word, e.g. 'team.', '!' or a block boundary
+#   word  - run of word characters, may contain '.', '!' or '。', e.g. '$60.5k' or 'x.com'
+#   inner - set when the word contains those, which still end the sentence
+# Whitespace other than ' ' also separates words so that 'full\ttime' is not one token.
+_inWordStops = sentenceStopperSet - wordStopperSet - {'\n'}
+_separators = ' \t\r\f\v\xa0' + _charClass(wordStopperSet - sentenceStopperSet)
+_wordChars = r'[^\s' + _charClass(wordStopperSet | sentenceStopperSet) + r']+'
+_lexer = re.compile(
+    r'[' + _separators + r']*'
+    r'(?:(?P<stop>[' + _charClass(sentenceStopperSet) + r']+)'
+    r'|(?P<word>' + _wordChars + r'(?:(?P<inner>[' + _charClass(_inWordStops) + r']+)' + _wordChars + r')*)'
+    r'|\Z)'
+)
+_innerStop = re.compile(r'[' + _charClass(_inWordStops) + r']+')
+
+
+def _trim(text, start, end, chars):
+    segment = text[start:end]
+    stripped = segment.lstrip(chars)
+    start += len(segment) - len(stripped)
+    return start, start + len(stripped.rstrip(chars))
+
+
+def tokenize(text):
+    # Single linear pass over plain text (see htmltext.py) producing sentence spans (for language detection)
+    # and word spans (for tagging and salary info)
+    sentences = []
+    words = []
+    sentenceStart = 0
+
+    def endSentence(boundaryStart, boundaryEnd):
+        start, end = _trim(text, sentenceStart, boundaryStart, _sentenceEnds)
+        if start < end:
+            sentences.append((start, end))
+        return boundaryEnd
+
+    for match in _lexer.finditer(text):
+        kind = match.lastgroup
+        if kind == 'word':
+            start, end = match.span('word')
+            if text[start] in unnecessaryEndsSet or text[end - 1] in unnecessaryEndsSet:
+                start, end = _trim(text, start, end, _wordEnds)
+            if start < end:
+                words.append((start, end))
+            if match.start('inner') >= 0:
+                for stop in _innerStop.finditer(text, *match.span('word')):
+                    sentenceStart = endSentence(*stop.span())
+        elif kind == 'stop':
+            sentenceStart = endSentence(*match.span('stop'))
+
+    endSentence(len(text), len(text))
+    return Tokens(sentences, words)
@@ -0,0 +1,163 @@
+"""
+Benchmark of resume scoring: the one-resume-at-a-time loop of handler.py before scoring.py
+against the batch engine, in resumes per second. No PDF or network is needed.
+
+$ python benchmark.py
+$ python benchmark.py index [count]    # the resume index (index.py), 100,000 resumes by default
+$ python benchmark.py ingest [count]   # PDF parsing (ingest.py), 500 two-page PDFs by default
+"""
+
+import os
+import random
+import sys
+import tempfile
+import time
+import fitz  # PyMuPDF
+from index import ResumeIndex
+from ingest import parse_many
+from keywords import extract_keywords, extract_keyword_scores, NUMBER_OF_KEYWORDS
+from scoring import ResumeMatrix, SCORING_MODES, wordStopperSet, unnecessaryEndsSet
+
+job_description = """
+We are seeking a Senior Software Developer to join our team. The ideal candidate will have experience developing
+software applications using Python, JavaScript and cloud technologies such as AWS, Azure or Google Cloud.
+Requirements: 5+ years of experience, Django, Flask, React or Angular, Git and CI/CD pipelines, Docker and Kubernetes.
+Knowledge of machine learning, data analysis and Agile development processes is a plus.
+"""
+
+skillPool = ['python', 'javascript', 'django', 'flask', 'react', 'angular', 'aws', 'azure', 'docker', 'kubernetes',
+             'git', 'agile', 'java', 'c++', 'sql', 'excel', 'sales', 'marketing', 'nursing', 'forklift', 'cooking']
+fillerPool = ('led a team of developers to build and maintain web applications for customers across the region '
+              'responsible for the day to day operation of the department and its budget').split()
+
+
+def make_resumes(count, words=400, seed=7):
+    random.seed(seed)
+    resumes = []
+    for _ in range(count):
+        resume = random.choices(fillerPool, k=words) + random.sample(skillPool, 8)
+        random.shuffle(resume)
+        resumes.append('Experience: ' + ' '.join(resume) + '.\nSkills: ' + ', '.join(random.sample(skillPool, 5)))
+    return resumes
+
+
+def legacy_score(resumeText, job_description):
+    # What handler.score_resume() did for every resume, kept only for comparison
+    beginningOfWord = 0
+    jobKeywords = {keyword.lower(): False for keyword in extract_keywords(job_description)}
+    for resumeTextIndex, char in enumerate(resumeText):
+        if char in wordStopperSet and beginningOfWord < resumeTextIndex or resumeTextIndex == len(resumeText) - 1:
+            word = resumeText[beginningOfWord: resumeTextIndex].strip().lower()
+            while word and word[-1] in unnecessaryEndsSet:
+                word = word[:-1]
+            while word and word[0] in unnecessaryEndsSet:
+                word = word[1:]
+            if word and word in jobKeywords:
+                jobKeywords[word] = True
+            beginningOfWord = resumeTextIndex + 1
+    return int(sum(100 / NUMBER_OF_KEYWORDS for keyword in jobKeywords if jobKeywords[keyword]))
+
+
+def rate(count, seconds):
+    return f'{count / seconds:12,.0f} resumes/s'
+
+
+def bench_scoring(count=5000):
+    resumes = make_resumes(count)
+    print(f'ranking {count} resumes against one posting')
+
+    legacyCount = 100
+    start = time.perf_counter()
+    for resume in resumes[:legacyCount]:
+        legacy_score(resume, job_description)
+    print('  before (YAKE + char loop per resume)', rate(legacyCount, time.perf_counter() - start))
+
+    start = time.perf_counter()
+    keywords = extract_keywords(job_description)
+    matrix = ResumeMatrix.from_texts(resumes)
+    ranked = matrix.rank(keywords)
+    print('  after (tokenize + rank)             ', rate(count, time.perf_counter() - start))
+
+    start = time.perf_counter()
+    matrix.rank(keywords)
+    print('  after, resumes already tokenized    ', rate(count, time.perf_counter() - start))
+    print('  best:', ranked[0]['score'], ranked[0]['hits'])
+
+    scoredKeywords = extract_keyword_scores(job_description)
+    for mode in SCORING_MODES:
+        start = time.perf_counter()
+        matrix.rank(scoredKeywords, mode=mode)
+        print(f'  {mode:<6} mode, already tokenized     ', rate(count, time.perf_counter() - start))
+
+
+def bench_index(count=100000, batch=1000):
+    resumes = make_resumes(count)
+    keywords = extract_keywords(job_description)
+    path = os.path.join(tempfile.mkdtemp(), 'resumes.sqlite')
+    index = ResumeIndex(path)
+    print(f'indexing {count} resumes')
+
+    start = time.perf_counter()
+    for offset in range(0, count, batch):
+        index.add_many(enumerate(resumes[offset:offset + batch], offset))
+    print('  build (tokenize + insert)           ', rate(count, time.perf_counter() - start))
+    size = sum(os.path.getsize(path + suffix) for suffix in ('', '-wal') if os.path.exists(path + suffix))
+    print(f'  on disk                              {size / 2 ** 20:12,.0f} MiB')
+
+    start = time.perf_counter()
+    ranked = index.search(keywords, top=100)
+    print(f'  search one posting (top 100)         {(time.perf_counter() - start) * 1000:12,.0f} ms')
+
+    start = time.perf_counter()
+    index.search(extract_keyword_scores(job_description), top=100, mode='bm25')
+    print(f'  same in bm25 mode                    {(time.perf_counter() - start) * 1000:12,.0f} ms')
+
+    start = time.perf_counter()
+    ResumeMatrix.from_texts(resumes).rank(keywords, top=100)
+    print(f'  same ranking without the index       {(time.perf_counter() - start) * 1000:12,.0f} ms')
+    print('  best:', ranked[0]['score'], ranked[0]['hits'])
+    index.close()
+
+
+def make_pdfs(count, pages=2):
+    pdfs = []
+    for resume in make_resumes(count):
+        with fitz.open() as doc:
+            for page in range(pages):
+                doc.new_page().insert_textbox(fitz.Rect(36, 36, 576, 756), resume, fontsize=9)
+            pdfs.append(doc.tobytes())
+    return pdfs
+
+
+def legacy_parse(pdf_content):
+    # What parse_pdf() did before ingest.py, kept only for comparison
+    with fitz.open(stream=pdf_content, filetype="pdf") as doc:
+        text = ""
+        for page in doc:
+            text += page.get_text()
+    return text
+
+
+def bench_ingest(count=500):
+    pdfs = make_pdfs(count)
+    print(f'parsing {count} PDFs, {os.cpu_count()} CPUs')
+
+    start = time.perf_counter()
+    for pdf in pdfs:
+        legacy_parse(pdf)
+    print('  before (one thread, text +=)        ', rate(count, time.perf_counter() - start))
+
+    for workers in sorted({1, os.cpu_count() or 1}):
+        start = time.perf_counter()
+        for resume in parse_many(enumerate(pdfs), workers=workers):
+            assert resume.error is None
+        print(f'  after (parse_many, {workers} workers)      ', rate(count, time.perf_counter() - start))
+
+
+if __name__ == '__main__':
+    if sys.argv[1:2] == ['index']:
+        bench_index(*map(int, sys.argv[2:3]))
+    elif sys.argv[1:2] == ['ingest']:
+        bench_ingest(*map(int, sys.argv[2:3]))
+    else:
+        bench_scoring()
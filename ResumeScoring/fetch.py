@@ -0,0 +1,206 @@
+import asyncio
+import hashlib
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from ingest import MAX_PDF_BYTES, read_limited
+
+
+class FetchError(Exception):
+    def __init__(self, url, status):
+        super().__init__(f"Failed to fetch the PDF ({status}): {url}")
+        self.url = url
+        self.status = status
+
+
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+
+class URLNotAllowedError(ValueError):
+    pass
+
+
+def check_url(url, allowedHosts, allowedSchemes=('https',)):
+    # Raises URLNotAllowedError unless url is on one of allowedHosts: the URLs come from clients and are fetched
+    # from inside the network (ex: an internal service or the cloud metadata address must not be reachable)
+    try:
+        parts = urlsplit(url)
+        port = parts.port
+    except ValueError:
+        raise URLNotAllowedError(f"Not a valid URL: {url}")
+    host = (parts.hostname or '').lower()
+    # Hosts are allowed on the default port of the scheme, another port has to be listed with the host (ex: host:8443)
+    defaultPort = port in (None, DEFAULT_PORTS.get(parts.scheme))
+    allowed = f'{host}:{port}' in allowedHosts or (host in allowedHosts and defaultPort)
+    if parts.scheme not in allowedSchemes or parts.username is not None or not allowed:
+        raise URLNotAllowedError(f"Resumes are only fetched from {', '.join(sorted(allowedHosts))}: {url}")
+    return url
+
+
+class PDFCache:
+    # Downloaded PDFs on disk, content-addressed: a file named by the SHA-256 of its bytes, shared by every URL serving
+    # the same PDF. A SQLite file maps each URL to its file and to the ETag / Last-Modified to revalidate it with.
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(os.path.join(directory, 'objects'), exist_ok=True)
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(os.path.join(directory, 'index.sqlite'), check_same_thread=False,
+                                           isolation_level=None)
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.execute(
+            'CREATE TABLE IF NOT EXISTS urls (url TEXT PRIMARY KEY, digest TEXT NOT NULL, etag TEXT, lastModified TEXT, '
+            'checkedAt REAL NOT NULL)'
+        )
+
+    def _path(self, digest):
+        return os.path.join(self.directory, 'objects', digest[:2], digest)
+
+    def lookup(self, url):
+        # (digest, etag, lastModified, checkedAt) of a URL, None when it was never fetched or its file is gone
+        with self._lock:
+            row = self._connection.execute(
+                'SELECT digest, etag, lastModified, checkedAt FROM urls WHERE url = ?', (url,)
+            ).fetchone()
+        if row is None or not os.path.exists(self._path(row[0])):
+            return None
+        return row
+
+    def read(self, digest):
+        with open(self._path(digest), 'rb') as file:
+            return file.read()
+
+    def store(self, url, content, etag=None, lastModified=None, checkedAt=None):
+        digest = hashlib.sha256(content).hexdigest()
+        path = self._path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Written aside then renamed, a reader never sees half a file
+            descriptor, temporaryPath = tempfile.mkstemp(dir=os.path.dirname(path))
+            with os.fdopen(descriptor, 'wb') as file:
+                file.write(content)
+            os.replace(temporaryPath, path)
+        self.touch(url, digest, etag, lastModified, checkedAt)
+        return digest
+
+    def touch(self, url, digest, etag=None, lastModified=None, checkedAt=None):
+        with self._lock:
+            self._connection.execute(
+                'INSERT OR REPLACE INTO urls VALUES (?, ?, ?, ?, ?)',
+                (url, digest, etag, lastModified, time.time() if checkedAt is None else checkedAt),
+            )
+
+
+class Fetcher:
+    # Fetches resume PDFs over a shared pool of keep-alive connections, with retries on connection errors and
+    # 429/5xx, and through an optional PDFCache: a URL checked less than maxAge seconds ago is read from disk,
+    # an older one is revalidated with If-None-Match / If-Modified-Since and read from disk on a 304
+    # With allowedHosts only those hosts are fetched (see check_url) and redirects are not followed, they could lead
+    # anywhere
+
+    def __init__(self, cache=None, maxAge=300, poolSize=10, retries=3, timeout=10, maxBytes=MAX_PDF_BYTES,
+                 allowedHosts=None, allowedSchemes=('https',)):
+        self.cache = cache
+        self.allowedHosts = allowedHosts
+        self.allowedSchemes = allowedSchemes
+        self.maxAge = maxAge
+        self.poolSize = poolSize
+        self.timeout = timeout
+        self.maxBytes = maxBytes
+        self.session = requests.Session()
+        retry = Retry(total=retries, backoff_factor=0.5, status_forcelist=(429, 500, 502, 503, 504),
+                      allowed_methods=('GET',), raise_on_status=False)
+        adapter = HTTPAdapter(pool_connections=poolSize, pool_maxsize=poolSize, max_retries=retry)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.hits = 0
+        self.revalidated = 0
+        self.downloads = 0
+        self.errors = 0
+
+    def fetch(self, url):
+        if self.allowedHosts is not None:
+            check_url(url, self.allowedHosts, self.allowedSchemes)
+        entry = self.cache.lookup(url) if self.cache is not None else None
+        headers = {}
+        if entry is not None:
+            digest, etag, lastModified, checkedAt = entry
+            if time.time() - checkedAt < self.maxAge:
+                self.hits += 1
+                return self.cache.read(digest)
+            if etag:
+                headers['If-None-Match'] = etag
+            if lastModified:
+                headers['If-Modified-Since'] = lastModified
+        try:
+            with self.session.get(url, headers=headers, stream=True, timeout=self.timeout,
+                                  allow_redirects=self.allowedHosts is None) as response:
+                if response.status_code == 304 and entry is not None:
+                    self.revalidated += 1
+                    self.cache.touch(url, digest, response.headers.get('ETag', etag),
+                                     response.headers.get('Last-Modified', lastModified))
+                    return self.cache.read(digest)
+                if response.status_code != 200:
+                    raise FetchError(url, response.status_code)
+                content = read_limited(response, self.maxBytes)
+        except Exception:
+            self.errors += 1
+            raise
+        self.downloads += 1
+        if self.cache is not None:
+            self.cache.store(url, content, response.headers.get('ETag'), response.headers.get('Last-Modified'))
+        return content
+
+    def fetch_many(self, urls, concurrency=None):
+        # PDFs of urls in order, at most concurrency downloads at once (the pool size by default)
+        # A URL that failed has its exception in place of its PDF
+        def fetch(url):
+            try:
+                return self.fetch(url)
+            except Exception as e:
+                return e
+        with ThreadPoolExecutor(concurrency or self.poolSize) as executor:
+            return list(executor.map(fetch, urls))
+
+    def metrics(self):
+        return {
+            'hits': self.hits,
+            'revalidated': self.revalidated,
+            'downloads': self.downloads,
+            'errors': self.errors,
+        }
+
+    def close(self):
+        self.session.close()
+
+
+class AsyncFetcher:
+    # asyncio front of a Fetcher: each fetch runs in a thread, at most concurrency at once, over the same pool
+
+    def __init__(self, fetcher, concurrency=10):
+        self.fetcher = fetcher
+        self.concurrency = concurrency
+        self._semaphore = None
+        self._loop = None
+
+    def semaphore(self):
+        # Created on the running event loop, asyncio primitives can not move between loops
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+            self._loop = loop
+        return self._semaphore
+
+    async def fetch(self, url):
+        async with self.semaphore():
+            return await asyncio.to_thread(self.fetcher.fetch, url)
+
+    async def fetch_many(self, urls):
+        return await asyncio.gather(*(self.fetch(url) for url in urls), return_exceptions=True)
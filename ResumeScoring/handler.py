@@ -1,29 +1,70 @@
-import yake
-import requests
-import fitz  # PyMuPDF
+import time
+import os
 import json
+import threading
+from flask import Flask, request, jsonify
+from flask_cors import cross_origin
+import keywords
+from fetch import Fetcher, PDFCache, check_url
+from ingest import parse_pdf, parse_many, ParsePool, MAX_PDF_BYTES
+from keywords import job_keywords, job_keyword_scores, configure_keyword_cache
+from index import ResumeIndex
+from scoring import ResumeMatrix, rank_resumes, SCORING_MODES
 
-# Set to use to detect when to catch a word for tagging
-wordStopperSet = {' ', '(', ')', '{', '}', '[', ']', '-', '/', ':', ';', '&', '+', '<', '>'}
-# Set to use to detect some unnecessary ends of a word. Newly added for salary info processing
-unnecessaryEndsSet = {'.', ',', '(', ')', '{', '}', '[', ']', '-', '!', '/', ':', ';', '&', '+', '<', '>'}
+# Nothing is loaded, opened or fetched at import: the caches, the HTTP pool and YAKE are set up by warm_up(),
+# called by create_app() (ex: gunicorn 'handler:create_app()') or otherwise on the first request
+app = Flask(__name__)
+app.config['CORS_HEADERS'] = 'Content-Type'
+app.config['MAX_CONTENT_LENGTH'] = int(os.getenv('MAX_UPLOAD_BYTES', str(10 * MAX_PDF_BYTES)))
 
-NUMBER_OF_KEYWORDS = 20 # Number of keywords to extract
-N = 1 # Number of words each keyword can contain
+# Worker processes parsing the PDFs of /rank requests, they are shared by every request
+RANK_WORKERS = int(os.getenv('RANK_WORKERS', str(os.cpu_count() or 1)))
+# Most resumes in one /rank request
+RANK_MAX_RESUMES = int(os.getenv('RANK_MAX_RESUMES', '1000'))
+# Hosts resume URLs are fetched from (https only), any other URL is refused with a 400
+ALLOWED_RESUME_HOSTS = {
+    host.strip().lower() for host in os.getenv('ALLOWED_RESUME_HOSTS', 'cdn.workonward.com').split(',') if host.strip()
+}
+# binary, yake, tfidf or bm25 when a request does not give its 'mode'
+SCORING_MODE = os.getenv('SCORING_MODE', 'binary')
 
-def fetch_pdf(url):
-    response = requests.get(url)
-    if response.status_code == 200:
-        return response.content
-    else:
-        raise Exception("Failed to fetch the PDF")
+fetcher = None
+# With RESUME_INDEX_PATH, tfidf and bm25 scores are relative to every resume of that index (see ingest.index_resumes)
+# instead of only the resumes of the request
+resumeIndex = None
+parsePool = None
+startupSeconds = None
+_warmUpLock = threading.Lock()
+
+
+def warm_up():
+    # Opens the keyword cache (KEYWORD_CACHE_PATH keeps it in a SQLite file) and the PDF fetcher
+    # (PDF_CACHE_DIR keeps the downloaded PDFs on disk), then runs YAKE once so its stop words are loaded
+    # The parse pool is created once here, not forked by every /rank request from a server running many threads
+    global fetcher, resumeIndex, parsePool, startupSeconds
+    with _warmUpLock:
+        if fetcher is not None:
+            return
+        start = time.perf_counter()
+        configure_keyword_cache(int(os.getenv('KEYWORD_CACHE_SIZE', '1024')), os.getenv('KEYWORD_CACHE_PATH'))
+        pdfCacheDirectory = os.getenv('PDF_CACHE_DIR')
+        resumeIndexPath = os.getenv('RESUME_INDEX_PATH')
+        resumeIndex = ResumeIndex(resumeIndexPath) if resumeIndexPath else None
+        job_keywords('Python developer with experience in cloud services.')
+        parsePool = ParsePool(RANK_WORKERS)
+        fetcher = Fetcher(
+            PDFCache(pdfCacheDirectory) if pdfCacheDirectory else None,
+            maxAge=float(os.getenv('PDF_CACHE_MAX_AGE', '300')),
+            poolSize=int(os.getenv('FETCH_POOL_SIZE', '10')),
+            allowedHosts=ALLOWED_RESUME_HOSTS,
+        )
+        startupSeconds = time.perf_counter() - start
+
+
+def create_app():
+    warm_up()
+    return app
 
-def parse_pdf(pdf_content):
-    with fitz.open(stream=pdf_content, filetype="pdf") as doc:
-        text = ""
-        for page in doc:
-            text += page.get_text()
-    return text
 
 def extract_resume_data(text):
     # Example: Extracting sections based on keywords
@@ -31,7 +72,7 @@ def extract_resume_data(text):
     name = None
     contact_info = []
     skills = []
-    
+
     for line in lines:
         if "Name" in line:
             name = line.split(':')[1].strip()
@@ -40,137 +81,186 @@ def extract_resume_data(text):
         elif "Skills" in line:
             skills_line_index = lines.index(line) + 1
             skills = lines[skills_line_index].strip().split(', ')
-    
+
     resume_data = {
         'name': name,
         'contact_info': contact_info,
         'skills': skills
     }
-    
+
     return resume_data
 
 def structure_data(resume_data):
     return json.dumps(resume_data, indent=2)
 
-url = "https://cdn.workonward.com/bfd60054-85e7-4c4a-ac01-81e2f10feec3.pdf"
-pdf_content = fetch_pdf(url)
-text = parse_pdf(pdf_content)
-resume_data = extract_resume_data(text)
-structured_resume = structure_data(resume_data)
+def score_resume(parsed_data, job_description):
+    # One resume against one job description, scoring.rank_resumes() ranks many at once
+    # Returns {'score', 'hits', 'breakdown'}
+    return rank_resumes(job_description, [parsed_data])[0]
+
 
-print(pdf_content)
-print(text)
-print(resume_data)
-print(structured_resume)
+def read_body():
+    # JSON body, or the form fields of a multipart upload (resumes are then its files)
+    if request.is_json:
+        return request.get_json(silent=True) or {}
+    return request.form.to_dict()
 
-def extract_keywords(text, language="en", deduplication_threshold=0.9, num_of_keywords=NUMBER_OF_KEYWORDS):
-    kw_extractor = yake.KeywordExtractor(lan=language, n=N, dedupLim=deduplication_threshold, top=num_of_keywords, features=None)
-    keywords = kw_extractor.extract_keywords(text)
-    return [kw for kw, score in keywords]
 
-def score_resume(parsed_data, job_description):
-    resumeText = parsed_data
-    beginningOfWord = 0
-    jobKeywords = {keyword.lower(): False for keyword in extract_keywords(job_description)}
-    for resumeTextIndex, char in enumerate(resumeText):
-        if char in wordStopperSet and beginningOfWord < resumeTextIndex or resumeTextIndex == len(resumeText) - 1:
-            # Process each word in lowercase
-            word = resumeText[beginningOfWord: resumeTextIndex].strip().lower()
-            while word and word[-1] in unnecessaryEndsSet:
-                word = word[:-1]
-            while word and word[0] in unnecessaryEndsSet:
-                word = word[1:]
-            if word and word in jobKeywords:
-                if word in jobKeywords:
-                    jobKeywords[word] = True
-            # Update beginningOfWord
-            beginningOfWord = resumeTextIndex + 1
-
-    print(f"Job Keywords: {jobKeywords}", len(jobKeywords))
-    score = 0
-    for keyword in jobKeywords:
-        if jobKeywords[keyword]:
-            score += (100/NUMBER_OF_KEYWORDS)
-    print(f"Score: {int(score)}", score)
-    score = int(score)
-    # resumeText = ' '.join([parsed_data.get('summary', ''), ' '.join(parsed_data.get('skills', []))])
-    # resume_keywords = extract_keywords(resumeText)
-    # jobKeywords = extract_keywords(job_description)
-
-    # matched_keywords = set(resume_keywords).intersection(set(jobKeywords))
-    # unmatched_keywords = set(resume_keywords).difference(set(jobKeywords))
-    # print(f"Resume Keywords: {resume_keywords}", len(resume_keywords))
-    # print(f"Job Keywords: {jobKeywords}", len(jobKeywords))
-    # print(f"Matched Keywords: {matched_keywords}", len(matched_keywords))
-    # print(f"Unmatched Keywords: {unmatched_keywords}", len(matched_keywords))
-    # score = (len(matched_keywords) / len(jobKeywords)) * 100 if jobKeywords else 0
-
-    return score
-
-# Example usage
-resume_parsed_data = {
-    'summary': 'Seasoned software developer with over 7 years of experience in Python, JavaScript, and cloud technologies. Adept at developing scalable applications and working with cross-functional teams to deliver high-quality software solutions.',
-    'skills': [
-        'Python', 'JavaScript', 'Django', 'Flask', 'React', 'AWS', 'Azure', 'Google Cloud', 
-        'microservices', 'Docker', 'Kubernetes', 'machine learning', 'data analysis', 'Git', 'CI/CD', 'Agile'
-    ],
-    'experience': [
-        {
-            'job_title': 'Senior Software Developer',
-            'company': 'Tech Innovators Inc.',
-            'duration': '3 years',
-            'responsibilities': 'Led a team of developers to build and maintain web applications using Python, Django, and React. Implemented CI/CD pipelines and deployed applications on AWS.'
+def scoring_mode(data):
+    mode = data.get('mode') or SCORING_MODE
+    if mode not in SCORING_MODES:
+        raise ValueError(f"Unknown scoring mode '{mode}', expected one of {', '.join(SCORING_MODES)}")
+    return mode
+
+
+def rank_texts(jobDescription, texts, ids, top, mode):
+    scoredKeywords = job_keyword_scores(jobDescription)
+    stats = resumeIndex.stats(scoredKeywords) if resumeIndex is not None and mode in ('tfidf', 'bm25') else None
+    if stats is not None and not stats.documents:
+        # Nothing indexed yet, the resumes of the request are scored against each other
+        stats = None
+    return ResumeMatrix.from_texts(texts, ids).rank(scoredKeywords, top, mode, stats)
+
+
+def resume_text(resume):
+    # Text of one resume given as {'text'}, {'url'} of a PDF or an uploaded PDF file
+    if isinstance(resume, dict) and not all(isinstance(value, (str, type(None))) for value in resume.values()):
+        raise ValueError("'resumeText' and 'resumeUrl' should be strings")
+    if isinstance(resume, dict) and resume.get('text'):
+        return resume['text']
+    if isinstance(resume, dict) and resume.get('url'):
+        return parse_pdf(fetcher.fetch(check_url(resume['url'], ALLOWED_RESUME_HOSTS)))
+    if hasattr(resume, 'read'):
+        return parse_pdf(resume.read())
+    raise ValueError("Expected a resume 'text', 'url' or an uploaded PDF")
+
+
+@app.route('/score', methods=['POST'])
+@cross_origin()
+def score():
+    # Body: {'jobDescription', 'resumeUrl' or 'resumeText', 'mode'} or a multipart form with a 'resume' PDF file
+    warm_up()
+    data = read_body()
+    jobDescription = data.get('jobDescription')
+    if not jobDescription:
+        return jsonify({'error': 'No job description provided'}), 400
+    if 'resume' in request.files:
+        resume = request.files['resume']
+    else:
+        resume = {'text': data.get('resumeText'), 'url': data.get('resumeUrl')}
+    try:
+        mode = scoring_mode(data)
+        text = resume_text(resume)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': f'Failed to read the resume: {str(e)}'}), 502
+    try:
+        result = rank_texts(jobDescription, [text], None, None, mode)[0]
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': f'Failed to score the resume: {str(e)}'}), 500
+    return jsonify({
+        'score': result['score'],
+        'hits': result['hits'],
+        'breakdown': result['breakdown'],
+        'mode': mode,
+        'keywords': job_keywords(jobDescription),
+    }), 200
+
+
+def collect_resumes(data):
+    # (id, source, resume) of every resume of a /rank request, source: 'text', 'url' or 'pdf' (the bytes of an upload)
+    resumes = [(file.filename or str(index), 'pdf', file.read())
+               for index, file in enumerate(request.files.getlist('resumes'))]
+    items = data.get('resumes') or []
+    if not isinstance(items, list):
+        raise ValueError("'resumes' should be a list")
+    for index, item in enumerate(items):
+        if not isinstance(item, dict):
+            raise ValueError(f"Resume {index}: expected an object with 'text' or 'url'")
+        resumeId = item.get('id', index)
+        if isinstance(resumeId, bool) or not isinstance(resumeId, (str, int)):
+            raise ValueError(f"Resume {index}: 'id' should be a string or an integer")
+        text, url = item.get('text'), item.get('url')
+        if not isinstance(text, (str, type(None))) or not isinstance(url, (str, type(None))):
+            raise ValueError(f"Resume {index}: 'text' and 'url' should be strings")
+        if text:
+            resumes.append((resumeId, 'text', text))
+        elif url:
+            resumes.append((resumeId, 'url', check_url(url, ALLOWED_RESUME_HOSTS)))
+        else:
+            raise ValueError(f"Resume {index}: expected an object with 'text' or 'url'")
+    return resumes
+
+
+@app.route('/rank', methods=['POST'])
+@cross_origin()
+def rank():
+    # Body: {'jobDescription', 'resumes': [{'id', 'text' or 'url'}], 'top', 'mode'} or a multipart form with 'resumes'
+    # PDF files
+    # Responds with the resumes sorted by score and the ones that could not be read
+    warm_up()
+    data = read_body()
+    jobDescription = data.get('jobDescription')
+    if not jobDescription:
+        return jsonify({'error': 'No job description provided'}), 400
+    try:
+        mode = scoring_mode(data)
+        resumes = collect_resumes(data)
+        top = int(data['top']) if data.get('top') is not None else None
+        if top is not None and top < 1:
+            raise ValueError("'top' should be at least 1")
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if not resumes:
+        return jsonify({'error': 'No resumes provided'}), 400
+    if len(resumes) > RANK_MAX_RESUMES:
+        return jsonify({'error': f'At most {RANK_MAX_RESUMES} resumes'}), 413
+
+    # Texts are scored as they are, URLs are fetched together, then every PDF is parsed in the process pool
+    texts = {index: resume for index, (_, source, resume) in enumerate(resumes) if source == 'text'}
+    pdfs = {index: resume for index, (_, source, resume) in enumerate(resumes) if source == 'pdf'}
+    urlIndexes = [index for index, (_, source, _) in enumerate(resumes) if source == 'url']
+    pdfs.update(zip(urlIndexes, fetcher.fetch_many([resumes[index][2] for index in urlIndexes])))
+    errors = []
+    for index in sorted(pdfs):
+        if isinstance(pdfs[index], Exception):
+            errors.append({'id': resumes[index][0], 'error': f'Failed to fetch the resume: {str(pdfs.pop(index))}'})
+    if pdfs:
+        for parsed in parse_many(pdfs.items(), workers=min(RANK_WORKERS, len(pdfs)),
+                                 pool=parsePool):
+            if parsed.error is not None:
+                errors.append({'id': resumes[parsed.resumeId][0], 'error': f'Failed to parse the resume: {str(parsed.error)}'})
+            else:
+                texts[parsed.resumeId] = parsed.text
+
+    order = sorted(texts)
+    ranked = []
+    if order:
+        ranked = rank_texts(jobDescription, [texts[index] for index in order], [resumes[index][0] for index in order],
+                            top, mode)
+    return jsonify({'ranked': ranked, 'errors': errors, 'mode': mode}), 200
+
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    return jsonify({
+        'process': {
+            'pid': os.getpid(),
+            'startupSeconds': startupSeconds,
         },
-        {
-            'job_title': 'Software Developer',
-            'company': 'Cloud Solutions Ltd.',
-            'duration': '4 years',
-            'responsibilities': 'Developed and maintained software solutions using Flask and Angular. Worked with cloud platforms such as Azure and Google Cloud. Participated in Agile development processes and code reviews.'
-        }
-    ],
-    'education': [
-        {
-            'degree': 'Bachelor of Science in Computer Science',
-            'institution': 'University of Technology',
-            'year': '2014'
-        }
-    ],
-    'certifications': [
-        'AWS Certified Solutions Architect',
-        'Certified Kubernetes Administrator'
-    ]
-}
-resume_parsed_data = text
-
-job_description = """
-We are seeking a highly skilled and experienced Senior Software Developer to join our dynamic team. 
-The ideal candidate will have extensive experience in developing and maintaining software applications using Python, JavaScript, and cloud technologies. 
-Key responsibilities include:
-- Designing, developing, and implementing software applications that meet business needs.
-- Collaborating with cross-functional teams to define, design, and ship new features.
-- Troubleshooting, debugging, and upgrading existing software.
-- Ensuring the performance, quality, and responsiveness of applications.
-- Maintaining code quality, organization, and automation.
-
-Requirements:
-- Bachelor's degree in Computer Science, Information Technology, or related field.
-- 5+ years of professional experience in software development.
-- Proficiency in Python, JavaScript, and experience with frameworks such as Django, Flask, React, or Angular.
-- Experience with cloud platforms such as AWS, Azure, or Google Cloud.
-- Strong understanding of software development methodologies, version control (Git), and CI/CD pipelines.
-- Excellent problem-solving skills and attention to detail.
-- Strong communication and teamwork skills.
-
-Preferred Qualifications:
-- Master's degree in Computer Science or related field.
-- Experience with microservices architecture and containerization (Docker, Kubernetes).
-- Knowledge of machine learning and data analysis.
-- Familiarity with Agile development processes.
-- Certifications in relevant technologies.
-
-We offer a competitive salary, comprehensive benefits package, and opportunities for professional growth and development. If you are passionate about software development and eager to work in a fast-paced, innovative environment, we encourage you to apply.
-"""
-
-
-score = score_resume(resume_parsed_data, job_description)
-print(f"Resume Score: {score}")
\ No newline at end of file
+        'keywordCache': keywords.keywordCache.metrics(),
+        'fetcher': fetcher.metrics() if fetcher is not None else None,
+        'resumeIndex': {'resumes': len(resumeIndex)} if resumeIndex is not None else None,
+        'parsePool': parsePool.metrics() if parsePool is not None else None,
+    }), 200
+
+
+if __name__ == '__main__':
+    warm_up()
+    try:
+        app.run(debug=True, port=3003)
+    except Exception as e:
+        raise RuntimeError(f"Failed to start the application: {str(e)}")
@@ -0,0 +1,208 @@
+import sqlite3
+import threading
+from collections import defaultdict
+import numpy as np
+from scipy import sparse
+from scoring import tokenize_words, normalize_keywords, score_keywords, top_rows, describe, CorpusStats
+
+
+class ResumeIndex:
+    # Inverted index of parsed resumes in one SQLite file: term -> resumes with the count and positions of the term
+    # Resumes are tokenized once when uploaded, a new posting is then scored from the posting lists of its keywords
+    # instead of reading every resume. Postings are clustered by term (WITHOUT ROWID), a posting list is one range scan.
+
+    def __init__(self, path=':memory:'):
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.executescript('''
+            CREATE TABLE IF NOT EXISTS resumes (
+                id INTEGER PRIMARY KEY, resumeId TEXT NOT NULL UNIQUE, length INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS terms (id INTEGER PRIMARY KEY, term TEXT NOT NULL UNIQUE);
+            CREATE TABLE IF NOT EXISTS postings (
+                termId INTEGER NOT NULL, docId INTEGER NOT NULL, count INTEGER NOT NULL, positions BLOB NOT NULL,
+                PRIMARY KEY (termId, docId)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS postingsByDoc ON postings (docId);
+            -- Kept up to date with every change of resumes, for the corpus statistics
+            CREATE TABLE IF NOT EXISTS corpus (id INTEGER PRIMARY KEY CHECK (id = 0), documents INTEGER NOT NULL,
+                                               totalLength INTEGER NOT NULL);
+            INSERT OR IGNORE INTO corpus SELECT 0, COUNT(*), COALESCE(SUM(length), 0) FROM resumes;
+        ''')
+        # term -> id, the vocabulary stays small next to the postings
+        # Other handles on the file (ex: other workers) add terms too, a term missing here is looked up in the table
+        self._termIds = dict(self._connection.execute('SELECT term, id FROM terms'))
+
+    def _term_id(self, term):
+        # Id of a term or None, the caller holds the lock
+        termId = self._termIds.get(term)
+        if termId is None:
+            row = self._connection.execute('SELECT id FROM terms WHERE term = ?', (term,)).fetchone()
+            if row is not None:
+                termId = self._termIds[term] = row[0]
+        return termId
+
+    def add(self, resumeId, text):
+        self.add_many([(resumeId, text)])
+
+    def add_many(self, resumes):
+        # resumes: iterable of (resumeId, text), one transaction for the batch
+        # Adding a resume id again (ex: a new upload) replaces its postings
+        with self._lock:
+            cursor = self._connection.cursor()
+            # Takes the write lock now, a deferred transaction could fail to upgrade while another handle writes
+            cursor.execute('BEGIN IMMEDIATE')
+            try:
+                for resumeId, text in resumes:
+                    self._add(cursor, str(resumeId), tokenize_words(text))
+                cursor.execute('COMMIT')
+            except BaseException:
+                cursor.execute('ROLLBACK')
+                # Ids of the terms added by the batch are gone with it
+                self._termIds = {}
+                raise
+
+    def _add(self, cursor, resumeId, words):
+        row = cursor.execute('SELECT id, length FROM resumes WHERE resumeId = ?', (resumeId,)).fetchone()
+        if row is not None:
+            docId, previousLength = row
+            cursor.execute('DELETE FROM postings WHERE docId = ?', (docId,))
+            cursor.execute('UPDATE resumes SET length = ? WHERE id = ?', (len(words), docId))
+            cursor.execute('UPDATE corpus SET totalLength = totalLength + ?', (len(words) - previousLength,))
+        else:
+            docId = cursor.execute('INSERT INTO resumes (resumeId, length) VALUES (?, ?)', (resumeId, len(words))).lastrowid
+            cursor.execute('UPDATE corpus SET documents = documents + 1, totalLength = totalLength + ?', (len(words),))
+        positions = defaultdict(list)
+        for position, word in enumerate(words):
+            positions[word].append(position)
+        rows = []
+        for term, termPositions in positions.items():
+            termId = self._termIds.get(term)
+            if termId is None:
+                # Another handle may have added the term since it was last looked up
+                cursor.execute('INSERT OR IGNORE INTO terms (term) VALUES (?)', (term,))
+                termId = self._termIds[term] = cursor.execute('SELECT id FROM terms WHERE term = ?', (term,)).fetchone()[0]
+            rows.append((termId, docId, len(termPositions), np.array(termPositions, dtype=np.uint32).tobytes()))
+        cursor.executemany('INSERT INTO postings VALUES (?, ?, ?, ?)', rows)
+
+    def remove(self, resumeId):
+        with self._lock:
+            cursor = self._connection.cursor()
+            cursor.execute('BEGIN IMMEDIATE')
+            row = cursor.execute('SELECT id, length FROM resumes WHERE resumeId = ?', (str(resumeId),)).fetchone()
+            if row is not None:
+                cursor.execute('DELETE FROM postings WHERE docId = ?', (row[0],))
+                cursor.execute('DELETE FROM resumes WHERE id = ?', (row[0],))
+                cursor.execute('UPDATE corpus SET documents = documents - 1, totalLength = totalLength - ?', (row[1],))
+            cursor.execute('COMMIT')
+
+    def postings(self, term):
+        # Posting list of a term: sorted document ids and the count of the term in each
+        with self._lock:
+            termId = self._term_id(term.lower())
+            if termId is None:
+                return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+            rows = self._connection.execute('SELECT docId, count FROM postings WHERE termId = ?', (termId,)).fetchall()
+        postings = np.array(rows, dtype=np.int64).reshape(-1, 2)
+        return postings[:, 0], postings[:, 1]
+
+    def _doc_ids(self, term):
+        # Document ids of a posting list without the counts, all that search() needs
+        with self._lock:
+            termId = self._term_id(term)
+            if termId is None:
+                return np.empty(0, dtype=np.int64)
+            rows = self._connection.execute('SELECT docId FROM postings WHERE termId = ?', (termId,)).fetchall()
+        return np.array(rows, dtype=np.int64).reshape(-1)
+
+    def positions(self, term, resumeId):
+        # Word positions of a term in a resume, ex: to match phrases
+        with self._lock:
+            row = self._connection.execute(
+                'SELECT positions FROM postings JOIN resumes ON resumes.id = postings.docId '
+                'WHERE termId = ? AND resumeId = ?', (self._term_id(term.lower()), str(resumeId))
+            ).fetchone()
+        return [] if row is None else np.frombuffer(row[0], dtype=np.uint32).tolist()
+
+    def intersect(self, keywords):
+        # Resume ids containing every keyword, the shortest posting lists are intersected first
+        lists = sorted((self._doc_ids(keyword.lower()) for keyword in keywords), key=len)
+        if not lists:
+            return []
+        docIds = lists[0]
+        for other in lists[1:]:
+            if not len(docIds):
+                break
+            docIds = np.intersect1d(docIds, other, assume_unique=True)
+        return self._resume_ids(docIds)
+
+    def stats(self, keywords):
+        # CorpusStats of every indexed resume, ex: to score a batch of new resumes against the whole store
+        keywords = normalize_keywords(keywords)[0]
+        with self._lock:
+            documents, totalLength = self._connection.execute('SELECT documents, totalLength FROM corpus').fetchone()
+            termIds = {keyword: self._term_id(keyword) for keyword in keywords}
+            documentFrequencies = {
+                keyword: self._connection.execute('SELECT COUNT(*) FROM postings WHERE termId = ?', (termId,)).fetchone()[0]
+                if termId is not None else 0
+                for keyword, termId in termIds.items()
+            }
+        return CorpusStats(documents, totalLength / documents if documents else 0.0, documentFrequencies)
+
+    def search(self, keywords, top=None, mode='binary'):
+        # Ranked list of {'id', 'score', 'hits', 'breakdown'} like ResumeMatrix.rank(), for the resumes hitting
+        # at least one keyword. Only the posting lists of the keywords are read, whatever the number of resumes.
+        keywords, yakeScores = normalize_keywords(keywords)
+        postingLists = [self.postings(keyword) for keyword in keywords]
+        if not any(len(docIds) for docIds, _ in postingLists):
+            return []
+        # Keyword counts of the resumes hitting any keyword, one row per resume in docId order
+        allDocIds = np.concatenate([docIds for docIds, _ in postingLists])
+        docIds, rows = np.unique(allDocIds, return_inverse=True)
+        columns = np.repeat(np.arange(len(keywords)), [len(docIds) for docIds, _ in postingLists])
+        counts = np.concatenate([counts for _, counts in postingLists])
+        tf = sparse.csr_matrix((counts, (rows, columns)), shape=(len(docIds), len(keywords)))
+        stats = lengths = None
+        if mode in ('tfidf', 'bm25'):
+            with self._lock:
+                documents, totalLength = self._connection.execute('SELECT documents, totalLength FROM corpus').fetchone()
+            # The posting lists give the document frequencies
+            stats = CorpusStats(documents, totalLength / documents, {
+                keyword: len(docIdList) for keyword, (docIdList, _) in zip(keywords, postingLists)
+            })
+            if mode == 'bm25':
+                lengths = self._lengths(docIds)
+        scores, contributions = score_keywords(tf, lengths, keywords, yakeScores, stats, mode)
+        rows = top_rows(scores, top)
+        return describe(self._resume_ids(docIds[rows]), rows, scores, contributions, keywords)
+
+    def _lengths(self, docIds):
+        lengths = {}
+        with self._lock:
+            for start in range(0, len(docIds), 900):
+                chunk = [int(docId) for docId in docIds[start:start + 900]]
+                lengths.update(self._connection.execute(
+                    f"SELECT id, length FROM resumes WHERE id IN ({','.join('?' * len(chunk))})", chunk
+                ))
+        return np.array([lengths[int(docId)] for docId in docIds], dtype=np.float64)
+
+    def _resume_ids(self, docIds):
+        docIds = [int(docId) for docId in docIds]
+        resumeIds = {}
+        with self._lock:
+            # SQLite limits the number of parameters of a statement
+            for start in range(0, len(docIds), 900):
+                chunk = docIds[start:start + 900]
+                resumeIds.update(self._connection.execute(
+                    f"SELECT id, resumeId FROM resumes WHERE id IN ({','.join('?' * len(chunk))})", chunk
+                ))
+        return [resumeIds[docId] for docId in docIds]
+
+    def __len__(self):
+        with self._lock:
+            return self._connection.execute('SELECT COUNT(*) FROM resumes').fetchone()[0]
+
+    def close(self):
+        self._connection.close()
@@ -0,0 +1,223 @@
+import multiprocessing
+import os
+import threading
+import time
+import weakref
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, CancelledError, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+import requests
+import fitz  # PyMuPDF
+
+MAX_PDF_BYTES = 10 * 2 ** 20 # Larger resumes are refused
+MAX_PAGES = 20 # Pages after this one are not parsed
+CHUNK_SIZE = 64 * 2 ** 10 # Bytes read at a time from a download
+TIMEOUT = 30.0 # Seconds to parse one resume
+
+
+class PDFTooLargeError(ValueError):
+    pass
+
+
+class PDFTimeoutError(TimeoutError):
+    pass
+
+
+# One parsed resume, text is None when error says why it could not be parsed
+ParsedResume = namedtuple('ParsedResume', ['resumeId', 'text', 'error'])
+
+
+def read_limited(response, maxBytes=MAX_PDF_BYTES):
+    # Body of a streamed response read in chunks, stops as soon as it is larger than maxBytes
+    length = response.headers.get('Content-Length')
+    if length and length.isdigit() and int(length) > maxBytes:
+        raise PDFTooLargeError(f"The PDF is larger than {maxBytes} bytes")
+    content = bytearray()
+    for chunk in response.iter_content(CHUNK_SIZE):
+        content += chunk
+        if len(content) > maxBytes:
+            raise PDFTooLargeError(f"The PDF is larger than {maxBytes} bytes")
+    return bytes(content)
+
+
+def download_pdf(url, maxBytes=MAX_PDF_BYTES, timeout=10, session=None):
+    # Streams the download, fetch.Fetcher adds a connection pool, retries and a cache on top
+    with (session or requests).get(url, stream=True, timeout=timeout) as response:
+        if response.status_code != 200:
+            raise Exception("Failed to fetch the PDF")
+        return read_limited(response, maxBytes)
+
+
+def iter_pages(pdf_content, maxPages=MAX_PAGES):
+    # Text of each page, one page at a time
+    with fitz.open(stream=pdf_content, filetype="pdf") as doc:
+        for pageNumber in range(min(doc.page_count, maxPages)):
+            yield doc[pageNumber].get_text()
+
+
+def parse_pdf(pdf_content, maxPages=MAX_PAGES, maxBytes=MAX_PDF_BYTES):
+    if len(pdf_content) > maxBytes:
+        raise PDFTooLargeError(f"The PDF is larger than {maxBytes} bytes")
+    return ''.join(iter_pages(pdf_content, maxPages))
+
+
+def _stop(executor):
+    # A worker stuck in PyMuPDF never gives the GIL back to be cancelled, its process is killed instead
+    for process in list((getattr(executor, '_processes', None) or {}).values()):
+        process.terminate()
+    executor.shutdown(wait=False, cancel_futures=True)
+
+
+class ParsePool:
+    # Worker processes parsing PDFs, kept across calls of parse_many (ex: every /rank request of a server)
+    # A pool killed after a timeout is replaced on the next submit. Workers are started by a fork server (spawned
+    # where there is none) instead of forking the caller, a fork of a multithreaded server could copy a held lock.
+
+    def __init__(self, workers=None):
+        self.workers = workers or os.cpu_count() or 1
+        methods = multiprocessing.get_all_start_methods()
+        self._context = multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+        if 'forkserver' in methods:
+            # Workers are forked from a server with PyMuPDF already imported, a new pool starts quickly
+            self._context.set_forkserver_preload([__name__])
+        self._executor = None
+        # Executors killed on purpose, their documents are submitted again for free
+        self._killed = weakref.WeakSet()
+        self._lock = threading.Lock()
+        self.restarts = 0
+
+    def executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(self.workers, mp_context=self._context)
+            return self._executor
+
+    def kill(self, executor):
+        # Stops executor and its workers, the next call of executor() starts a new pool
+        # Other calls sharing it get a BrokenProcessPool or CancelledError and submit their documents again
+        with self._lock:
+            self._killed.add(executor)
+            if self._executor is executor:
+                self._executor = None
+                self.restarts += 1
+        _stop(executor)
+
+    def killed(self, executor):
+        with self._lock:
+            return executor in self._killed
+
+    def metrics(self):
+        return {'workers': self.workers, 'restarts': self.restarts}
+
+    def close(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown()
+
+
+def parse_many(documents, workers=None, timeout=TIMEOUT, maxPages=MAX_PAGES, maxBytes=MAX_PDF_BYTES, parse=parse_pdf,
+               pool=None):
+    # documents: iterable of (resumeId, pdf content), read lazily
+    # Yields a ParsedResume per document as soon as it is parsed (not in the order of documents)
+    # PyMuPDF holds the GIL, the documents are parsed in a ParsePool: pool, shared with other calls, or one of
+    # workers processes for this call only. At most workers documents of this call are submitted at a time, a document
+    # gets timeout seconds from when it starts. When one runs late the pool is killed and replaced, the other documents
+    # running then are submitted again.
+    ownPool = pool is None
+    if ownPool:
+        pool = ParsePool(workers)
+    workers = workers or pool.workers
+    documents = iter(documents)
+    # future -> (resumeId, pdf content, deadline, executor, submissions)
+    running = {}
+
+    def submit(resumeId, pdf_content, submissions=1):
+        executor = pool.executor()
+        try:
+            future = executor.submit(parse, pdf_content, maxPages, maxBytes)
+        except (BrokenProcessPool, RuntimeError):
+            # Killed by another call since
+            pool.kill(executor)
+            executor = pool.executor()
+            future = executor.submit(parse, pdf_content, maxPages, maxBytes)
+        running[future] = (resumeId, pdf_content, time.monotonic() + timeout, executor, submissions)
+
+    try:
+        while True:
+            while len(running) < workers:
+                document = next(documents, None)
+                if document is None:
+                    break
+                submit(*document)
+            if not running:
+                return
+            nextDeadline = min(deadline for _, _, deadline, _, _ in running.values())
+            done, _ = wait(running, timeout=max(0, nextDeadline - time.monotonic()), return_when=FIRST_COMPLETED)
+            for future in done:
+                resumeId, pdf_content, _, executor, submissions = running.pop(future)
+                try:
+                    text = future.result()
+                except (BrokenProcessPool, CancelledError) as e:
+                    # The pool was killed (ex: a timeout of another call sharing it) or a worker crashed on a document:
+                    # such a document is only tried twice
+                    killed = pool.killed(executor)
+                    pool.kill(executor)
+                    if killed or submissions < 2:
+                        submit(resumeId, pdf_content, submissions if killed else submissions + 1)
+                    else:
+                        yield ParsedResume(resumeId, None, e)
+                except Exception as e:
+                    yield ParsedResume(resumeId, None, e)
+                else:
+                    yield ParsedResume(resumeId, text, None)
+            now = time.monotonic()
+            late = []
+            for future, (resumeId, pdf_content, deadline, executor, submissions) in list(running.items()):
+                if deadline > now:
+                    continue
+                if future.running():
+                    late.append(future)
+                else:
+                    # Still queued behind the documents of other calls, its time starts when it does
+                    running[future] = (resumeId, pdf_content, now + timeout, executor, submissions)
+            if late:
+                lateIds = [running[future][0] for future in late]
+                lateExecutors = {running.pop(future)[3] for future in late}
+                for executor in lateExecutors:
+                    pool.kill(executor)
+                for future, (resumeId, pdf_content, _, executor, submissions) in list(running.items()):
+                    if executor in lateExecutors:
+                        del running[future]
+                        submit(resumeId, pdf_content, submissions)
+                for resumeId in lateIds:
+                    yield ParsedResume(resumeId, None, PDFTimeoutError(f"Parsing took more than {timeout} seconds"))
+    finally:
+        if ownPool:
+            if running:
+                # The caller stopped early
+                for executor in {executor for _, _, _, executor, _ in running.values()}:
+                    pool.kill(executor)
+            pool.close()
+        else:
+            # The shared workers finish the documents already started
+            for future in running:
+                future.cancel()
+
+
+def index_resumes(index, documents, batch=500, **options):
+    # Parses documents (see parse_many) into a ResumeIndex, batch resumes per transaction
+    # Returns the ParsedResume of every document that could not be parsed
+    failed = []
+    parsed = []
+    for resume in parse_many(documents, **options):
+        if resume.error is not None:
+            failed.append(resume)
+            continue
+        parsed.append((resume.resumeId, resume.text))
+        if len(parsed) >= batch:
+            index.add_many(parsed)
+            parsed = []
+    if parsed:
+        index.add_many(parsed)
+    return failed
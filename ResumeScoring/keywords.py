@@ -0,0 +1,129 @@
+import hashlib
+import json
+import sqlite3
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+import yake
+
+NUMBER_OF_KEYWORDS = 20 # Number of keywords to extract
+N = 1 # Number of words each keyword can contain
+
+
+@lru_cache(maxsize=16)
+def _extractor(language, deduplication_threshold, num_of_keywords):
+    # Building an extractor loads its stop word list from disk, one per set of parameters is enough
+    return yake.KeywordExtractor(lan=language, n=N, dedupLim=deduplication_threshold, top=num_of_keywords, features=None)
+
+
+def extract_keyword_scores(text, language="en", deduplication_threshold=0.9, num_of_keywords=NUMBER_OF_KEYWORDS):
+    # (keyword, YAKE score) pairs, the lower the score the more relevant the keyword
+    # Runs YAKE on every call, job_keyword_scores() memoizes it per job description
+    return [(kw, score) for kw, score in _extractor(language, deduplication_threshold, num_of_keywords).extract_keywords(text)]
+
+
+def extract_keywords(text, language="en", deduplication_threshold=0.9, num_of_keywords=NUMBER_OF_KEYWORDS):
+    return [kw for kw, score in extract_keyword_scores(text, language, deduplication_threshold, num_of_keywords)]
+
+
+class KeywordCache:
+    # Job keywords and their YAKE scores memoized by the hash of the job description and the YAKE parameters
+    # In memory: an LRU of maxsize job descriptions. With path: also kept in a SQLite file across restarts
+
+    def __init__(self, maxsize=1024, path=None):
+        self.maxsize = maxsize
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._connection = None
+        if path:
+            self._connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+            self._connection.execute('PRAGMA journal_mode=WAL')
+            self._connection.execute('CREATE TABLE IF NOT EXISTS keywords (key TEXT PRIMARY KEY, value TEXT NOT NULL)')
+
+    def key(self, text, language="en", deduplication_threshold=0.9, num_of_keywords=NUMBER_OF_KEYWORDS):
+        digest = hashlib.sha256(text.encode('utf-8')).hexdigest()
+        # v2: entries are (keyword, score) pairs
+        return f"{digest}:{language}:{deduplication_threshold}:{num_of_keywords}:{N}:v2"
+
+    def get(self, key):
+        with self._lock:
+            keywords = self._entries.get(key)
+            if keywords is not None:
+                self._entries.move_to_end(key)
+                return keywords
+            if self._connection is None:
+                return None
+            row = self._connection.execute('SELECT value FROM keywords WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            return None
+        keywords = [tuple(pair) for pair in json.loads(row[0])]
+        self._remember(key, keywords)
+        return keywords
+
+    def set(self, key, keywords):
+        self._remember(key, keywords)
+        if self._connection is not None:
+            with self._lock:
+                self._connection.execute('INSERT OR REPLACE INTO keywords VALUES (?, ?)', (key, json.dumps(keywords)))
+
+    def _remember(self, key, keywords):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[key] = keywords
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def scored_keywords(self, text, language="en", deduplication_threshold=0.9, num_of_keywords=NUMBER_OF_KEYWORDS):
+        key = self.key(text, language, deduplication_threshold, num_of_keywords)
+        keywords = self.get(key)
+        if keywords is not None:
+            self.hits += 1
+            return list(keywords)
+        self.misses += 1
+        keywords = extract_keyword_scores(text, language, deduplication_threshold, num_of_keywords)
+        self.set(key, keywords)
+        return list(keywords)
+
+    def keywords(self, text, language="en", deduplication_threshold=0.9, num_of_keywords=NUMBER_OF_KEYWORDS):
+        return [kw for kw, score in self.scored_keywords(text, language, deduplication_threshold, num_of_keywords)]
+
+    def metrics(self):
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hitRate': self.hits / lookups if lookups else 0,
+            'size': len(self._entries),
+            'maxsize': self.maxsize,
+            'persistent': self._connection is not None,
+        }
+
+
+keywordCache = KeywordCache()
+
+
+def configure_keyword_cache(maxsize=1024, path=None):
+    # Replaces the process-wide cache, ex: configure_keyword_cache(path='keywords.sqlite') to keep it across restarts
+    global keywordCache
+    keywordCache = KeywordCache(maxsize, path)
+    return keywordCache
+
+
+def job_keywords(text, language="en", deduplication_threshold=0.9, num_of_keywords=NUMBER_OF_KEYWORDS):
+    # Keywords of a job description, YAKE only runs the first time a posting is seen
+    return keywordCache.keywords(text, language, deduplication_threshold, num_of_keywords)
+
+
+def job_keyword_scores(text, language="en", deduplication_threshold=0.9, num_of_keywords=NUMBER_OF_KEYWORDS):
+    # (keyword, YAKE score) pairs of a job description, from the same cache as job_keywords()
+    return keywordCache.scored_keywords(text, language, deduplication_threshold, num_of_keywords)
+
+
+def precompute_keywords(text, language="en", deduplication_threshold=0.9, num_of_keywords=NUMBER_OF_KEYWORDS):
+    # Hook to call when a posting is published, so that scoring resumes against it never waits on YAKE
+    return job_keywords(text, language, deduplication_threshold, num_of_keywords)
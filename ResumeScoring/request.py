@@ -1,55 +1,83 @@
-import requests
-import fitz  # PyMuPDF
-import json
-
-def fetch_pdf(url):
-    response = requests.get(url)
-    if response.status_code == 200:
-        return response.content
-    else:
-        raise Exception("Failed to fetch the PDF")
-
-def parse_pdf(pdf_content):
-    with fitz.open(stream=pdf_content, filetype="pdf") as doc:
-        text = ""
-        for page in doc:
-            text += page.get_text()
-    return text
-
-def extract_resume_data(text):
-    # Example: Extracting sections based on keywords
-    lines = text.split('\n')
-    name = None
-    contact_info = []
-    skills = []
-    
-    for line in lines:
-        if "Name" in line:
-            name = line.split(':')[1].strip()
-        elif "Email" in line or "Phone" in line:
-            contact_info.append(line.strip())
-        elif "Skills" in line:
-            skills_line_index = lines.index(line) + 1
-            skills = lines[skills_line_index].strip().split(', ')
-    
-    resume_data = {
-        'name': name,
-        'contact_info': contact_info,
-        'skills': skills
+# Example: score the resume of a CDN URL against a job description, in this process without the service
+# The service (handler.py) does the same for POST /score
+
+from ingest import download_pdf, parse_pdf
+from handler import extract_resume_data, structure_data, score_resume
+
+if __name__ == '__main__':
+    url = "https://cdn.workonward.com/bfd60054-85e7-4c4a-ac01-81e2f10feec3.pdf"
+    pdf_content = download_pdf(url)
+    text = parse_pdf(pdf_content)
+    resume_data = extract_resume_data(text)
+    structured_resume = structure_data(resume_data)
+
+    print(text)
+    print(structured_resume)
+
+    resume_parsed_data = {
+        'summary': 'Seasoned software developer with over 7 years of experience in Python, JavaScript, and cloud technologies. Adept at developing scalable applications and working with cross-functional teams to deliver high-quality software solutions.',
+        'skills': [
+            'Python', 'JavaScript', 'Django', 'Flask', 'React', 'AWS', 'Azure', 'Google Cloud', 
+            'microservices', 'Docker', 'Kubernetes', 'machine learning', 'data analysis', 'Git', 'CI/CD', 'Agile'
+        ],
+        'experience': [
+            {
+                'job_title': 'Senior Software Developer',
+                'company': 'Tech Innovators Inc.',
+                'duration': '3 years',
+                'responsibilities': 'Led a team of developers to build and maintain web applications using Python, Django, and React. Implemented CI/CD pipelines and deployed applications on AWS.'
+            },
+            {
+                'job_title': 'Software Developer',
+                'company': 'Cloud Solutions Ltd.',
+                'duration': '4 years',
+                'responsibilities': 'Developed and maintained software solutions using Flask and Angular. Worked with cloud platforms such as Azure and Google Cloud. Participated in Agile development processes and code reviews.'
+            }
+        ],
+        'education': [
+            {
+                'degree': 'Bachelor of Science in Computer Science',
+                'institution': 'University of Technology',
+                'year': '2014'
+            }
+        ],
+        'certifications': [
+            'AWS Certified Solutions Architect',
+            'Certified Kubernetes Administrator'
+        ]
     }
-    
-    return resume_data
-
-def structure_data(resume_data):
-    return json.dumps(resume_data, indent=2)
-
-url = "https://cdn.workonward.com/bfd60054-85e7-4c4a-ac01-81e2f10feec3.pdf"
-pdf_content = fetch_pdf(url)
-text = parse_pdf(pdf_content)
-resume_data = extract_resume_data(text)
-structured_resume = structure_data(resume_data)
-
-print(pdf_content)
-print(text)
-print(resume_data)
-print(structured_resume)
+    resume_parsed_data = text
+
+    job_description = """
+    We are seeking a highly skilled and experienced Senior Software Developer to join our dynamic team. 
+    The ideal candidate will have extensive experience in developing and maintaining software applications using Python, JavaScript, and cloud technologies. 
+    Key responsibilities include:
+    - Designing, developing, and implementing software applications that meet business needs.
+    - Collaborating with cross-functional teams to define, design, and ship new features.
+    - Troubleshooting, debugging, and upgrading existing software.
+    - Ensuring the performance, quality, and responsiveness of applications.
+    - Maintaining code quality, organization, and automation.
+
+    Requirements:
+    - Bachelor's degree in Computer Science, Information Technology, or related field.
+    - 5+ years of professional experience in software development.
+    - Proficiency in Python, JavaScript, and experience with frameworks such as Django, Flask, React, or Angular.
+    - Experience with cloud platforms such as AWS, Azure, or Google Cloud.
+    - Strong understanding of software development methodologies, version control (Git), and CI/CD pipelines.
+    - Excellent problem-solving skills and attention to detail.
+    - Strong communication and teamwork skills.
+
+    Preferred Qualifications:
+    - Master's degree in Computer Science or related field.
+    - Experience with microservices architecture and containerization (Docker, Kubernetes).
+    - Knowledge of machine learning and data analysis.
+    - Familiarity with Agile development processes.
+    - Certifications in relevant technologies.
+
+    We offer a competitive salary, comprehensive benefits package, and opportunities for professional growth and development. If you are passionate about software development and eager to work in a fast-paced, innovative environment, we encourage you to apply.
+    """
+
+
+    result = score_resume(resume_parsed_data, job_description)
+    print(f"Job Keywords hit: {result['hits']}", len(result['hits']))
+    print(f"Resume Score: {result['score']}")
@@ -0,0 +1,187 @@
+import re
+import numpy as np
+from scipy import sparse
+from keywords import job_keyword_scores
+
+# Set to use to detect when to catch a word, whitespace always ends a word too
+wordStopperSet = {' ', '(', ')', '{', '}', '[', ']', '-', '/', ':', ';', '&', '+', '<', '>'}
+# Set to use to detect some unnecessary ends of a word
+unnecessaryEndsSet = {'.', ',', '(', ')', '{', '}', '[', ']', '-', '!', '/', ':', ';', '&', '+', '<', '>'}
+
+# A word: characters up to a word stopper or whitespace, without unnecessary ends, ex: 'node.js,' -> 'node.js'
+_stoppers = '\\s' + re.escape(''.join(sorted(wordStopperSet)))
+_ends = re.escape(''.join(sorted(unnecessaryEndsSet - wordStopperSet)))
+_word = re.compile(f'[^{_stoppers}{_ends}]+(?:[{_ends}]+[^{_stoppers}{_ends}]+)*')
+
+# binary: every keyword found counts the same. yake: keywords weigh by their YAKE relevance
+# tfidf: cosine of the keyword counts (log-scaled, times idf) with the posting's keywords (idf)
+# bm25: Okapi BM25 over the keywords, divided by the most a resume could get
+# Every mode scores from 0 to 100
+SCORING_MODES = ('binary', 'yake', 'tfidf', 'bm25')
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+
+def tokenize_words(text):
+    # Lowercase words of a resume, ex: 'Python, Flask/Django.' -> ['python', 'flask', 'django']
+    return _word.findall(text.lower())
+
+
+class CorpusStats:
+    # Statistics of the resumes a score is relative to (tfidf and bm25): how many there are, their average length
+    # in words, and for each keyword the number of resumes containing it
+
+    def __init__(self, documents, averageLength, documentFrequencies):
+        self.documents = documents
+        self.averageLength = averageLength
+        self.documentFrequencies = documentFrequencies
+
+    def frequencies(self, keywords):
+        return np.array([self.documentFrequencies.get(keyword, 0) for keyword in keywords], dtype=np.float64)
+
+
+def normalize_keywords(keywords):
+    # Keywords as given (names, or (name, YAKE score) pairs) -> unique lowercase names and their YAKE scores
+    # (None without scores). The first occurrence of a keyword wins.
+    scores = {}
+    for keyword in keywords:
+        name, score = keyword if isinstance(keyword, (tuple, list)) else (keyword, None)
+        scores.setdefault(name.lower(), score)
+    names = list(scores)
+    if any(score is None for score in scores.values()):
+        return names, None
+    return names, np.array([scores[name] for name in names], dtype=np.float64)
+
+
+def score_keywords(tf, lengths, keywords, yakeScores, stats, mode='binary'):
+    # tf: CSR matrix (resumes x keywords) of keyword counts, lengths: words of each resume
+    # Returns the scores (0 to 100) and a CSR matrix of the same shape as tf with the part of each keyword in them
+    if mode not in SCORING_MODES:
+        raise ValueError(f"Unknown scoring mode '{mode}', expected one of {', '.join(SCORING_MODES)}")
+    tf = tf.tocsr().astype(np.float64)
+    tf.eliminate_zeros()
+    tf.sort_indices()
+    contributions = tf.copy()
+    columns = tf.indices
+    if mode == 'binary':
+        # Divided by the number of keywords YAKE found, it can be fewer than NUMBER_OF_KEYWORDS
+        contributions.data[:] = 100 / max(len(keywords), 1)
+    elif mode == 'yake':
+        if yakeScores is None:
+            raise ValueError("The yake scoring mode needs the YAKE score of every keyword")
+        # The lower the YAKE score the more relevant: weights are inverse scores adding up to 1
+        weights = 1 / np.maximum(yakeScores, 1e-9)
+        weights /= weights.sum()
+        contributions.data = 100 * weights[columns]
+    elif mode == 'tfidf':
+        documentFrequencies = stats.frequencies(keywords)
+        idf = np.log((1 + stats.documents) / (1 + documentFrequencies)) + 1
+        contributions.data = (1 + np.log(tf.data)) * idf[columns]
+        norms = np.sqrt(np.asarray(contributions.multiply(contributions).sum(axis=1)).ravel())
+        rows = np.repeat(np.arange(tf.shape[0]), np.diff(tf.indptr))
+        contributions.data *= 100 * idf[columns] / (norms[rows] * np.linalg.norm(idf))
+    else:
+        documentFrequencies = stats.frequencies(keywords)
+        idf = np.log(1 + (stats.documents - documentFrequencies + 0.5) / (documentFrequencies + 0.5))
+        rows = np.repeat(np.arange(tf.shape[0]), np.diff(tf.indptr))
+        # Stats without any word (ex: of empty resumes) leave every resume at the average length
+        lengthRatio = (np.asarray(lengths, dtype=np.float64)[rows] / stats.averageLength if stats.averageLength > 0
+                       else np.ones(len(rows)))
+        saturation = tf.data * (BM25_K1 + 1) / (tf.data + BM25_K1 * (1 - BM25_B + BM25_B * lengthRatio))
+        contributions.data = 100 * idf[columns] * saturation / (idf.sum() * (BM25_K1 + 1))
+    scores = np.asarray(contributions.sum(axis=1)).ravel()
+    return scores, contributions
+
+
+def describe(ids, rows, scores, contributions, keywords):
+    # {'id', 'score', 'hits', 'breakdown'} of each row, breakdown: the part of each keyword hit in the score
+    ranked = []
+    for resumeId, row in zip(ids, rows):
+        start, end = contributions.indptr[row], contributions.indptr[row + 1]
+        breakdown = {keywords[column]: round(float(part), 2)
+                     for column, part in zip(contributions.indices[start:end], contributions.data[start:end])}
+        ranked.append({
+            'id': resumeId,
+            'score': round(float(scores[row]), 2),
+            'hits': list(breakdown),
+            'breakdown': breakdown,
+        })
+    return ranked
+
+
+def top_rows(scores, top=None):
+    # Rows by decreasing score, ties keep their order
+    order = np.argsort(-scores, kind='stable')
+    return order if top is None else order[:top]
+
+
+class ResumeMatrix:
+    # Every resume as a sparse term vector: row i counts the words of resume i, one column per distinct word
+    # Built once, then scored against any number of postings without tokenizing the resumes again
+
+    def __init__(self, ids, vocabulary, counts):
+        self.ids = ids
+        # vocabulary: word -> column
+        self.vocabulary = vocabulary
+        # counts: CSR matrix of shape (number of resumes, number of words)
+        self.counts = counts
+
+    @classmethod
+    def from_texts(cls, texts, ids=None):
+        vocabulary = {}
+        indices = []
+        indptr = [0]
+        for text in texts:
+            indices.extend([vocabulary.setdefault(word, len(vocabulary)) for word in tokenize_words(text)])
+            indptr.append(len(indices))
+        ids = list(ids) if ids is not None else list(range(len(indptr) - 1))
+        counts = sparse.csr_matrix(
+            (np.ones(len(indices), dtype=np.int32), np.array(indices, dtype=np.int64), np.array(indptr, dtype=np.int64)),
+            shape=(len(ids), len(vocabulary)),
+        )
+        # Repeated words of a resume add up into one count
+        counts.sum_duplicates()
+        return cls(ids, vocabulary, counts)
+
+    def keyword_counts(self, keywords):
+        # CSR matrix (resumes x keywords) of how many times each resume contains each keyword
+        columns = [self.vocabulary.get(keyword) for keyword in keywords]
+        present = [index for index, column in enumerate(columns) if column is not None]
+        selector = sparse.csr_matrix(
+            (np.ones(len(present), dtype=np.int32), ([columns[index] for index in present], present)),
+            shape=(len(self.vocabulary), len(keywords)),
+        )
+        return (self.counts @ selector).tocsr()
+
+    def keyword_hits(self, keywords):
+        # Boolean CSR matrix (resumes x keywords), True where the resume contains the keyword
+        return self.keyword_counts(keywords).astype(bool).tocsr()
+
+    def lengths(self):
+        return np.asarray(self.counts.sum(axis=1)).ravel()
+
+    def stats(self, keywords):
+        # Corpus statistics of these resumes only, see ResumeIndex.stats() for the whole resume store
+        keywords = normalize_keywords(keywords)[0]
+        lengths = self.lengths()
+        frequencies = np.diff(self.keyword_hits(keywords).tocsc().indptr)
+        return CorpusStats(len(self.ids), float(lengths.mean()) if len(lengths) else 0.0,
+                           dict(zip(keywords, frequencies.tolist())))
+
+    def rank(self, keywords, top=None, mode='binary', stats=None):
+        # Ranked list of {'id', 'score', 'hits', 'breakdown'}
+        # keywords: names, or (name, YAKE score) pairs for the yake mode
+        # stats: CorpusStats the tfidf and bm25 modes are relative to, these resumes by default
+        keywords, yakeScores = normalize_keywords(keywords)
+        if stats is None and mode in ('tfidf', 'bm25'):
+            stats = self.stats(keywords)
+        # One sparse product counts every keyword in every resume
+        scores, contributions = score_keywords(self.keyword_counts(keywords), self.lengths(), keywords, yakeScores, stats,
+                                              mode)
+        rows = top_rows(scores, top)
+        return describe([self.ids[row] for row in rows], rows, scores, contributions, keywords)
+
+
+def rank_resumes(job_description, resumes, ids=None, top=None, mode='binary', stats=None):
+    # Rank many resume texts against one job description, its keywords come from the keyword cache
+    return ResumeMatrix.from_texts(resumes, ids).rank(job_keyword_scores(job_description), top, mode, stats)
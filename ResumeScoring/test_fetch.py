@@ -0,0 +1,127 @@
+import asyncio
+import os
+import tempfile
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from fetch import Fetcher, AsyncFetcher, PDFCache, FetchError, URLNotAllowedError
+from ingest import PDFTooLargeError
+
+PDF = b'%PDF-1.4 resume'
+
+
+class CDNHandler(BaseHTTPRequestHandler):
+    # Stand-in for the resume CDN: /resume.pdf with an ETag, /other.pdf with the same bytes, /missing.pdf is a 404
+    requests = []
+
+    def do_GET(self):
+        CDNHandler.requests.append((self.path, self.headers.get('If-None-Match')))
+        if self.path == '/missing.pdf':
+            self.send_response(404)
+            self.end_headers()
+            return
+        if self.path == '/redirect.pdf':
+            self.send_response(302)
+            self.send_header('Location', 'http://localhost:1/internal')
+            self.end_headers()
+            return
+        if self.path == '/slow.pdf':
+            time.sleep(0.2)
+        if self.headers.get('If-None-Match') == '"v1"':
+            self.send_response(304)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header('ETag', '"v1"')
+        self.send_header('Last-Modified', 'Mon, 01 Jan 2024 00:00:00 GMT')
+        self.send_header('Content-Length', str(len(PDF)))
+        self.end_headers()
+        self.wfile.write(PDF)
+
+    def log_message(self, *args):
+        pass
+
+
+class FetchTestCase(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), CDNHandler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.base = f'http://127.0.0.1:{cls.server.server_address[1]}'
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        CDNHandler.requests = []
+        self.directory = tempfile.mkdtemp()
+
+    def test_fresh_copy_read_from_disk(self):
+        fetcher = Fetcher(PDFCache(self.directory))
+        self.assertEqual(fetcher.fetch(self.base + '/resume.pdf'), PDF)
+        self.assertEqual(fetcher.fetch(self.base + '/resume.pdf'), PDF)
+        self.assertEqual(len(CDNHandler.requests), 1)
+        self.assertEqual(fetcher.metrics()['hits'], 1)
+
+    def test_revalidates_with_etag(self):
+        cache = PDFCache(self.directory)
+        Fetcher(cache).fetch(self.base + '/resume.pdf')
+        # A new process with the same cache directory and no freshness window
+        fetcher = Fetcher(PDFCache(self.directory), maxAge=0)
+        self.assertEqual(fetcher.fetch(self.base + '/resume.pdf'), PDF)
+        self.assertEqual(CDNHandler.requests[-1], ('/resume.pdf', '"v1"'))
+        self.assertEqual(fetcher.metrics()['revalidated'], 1)
+
+    def test_content_addressed(self):
+        fetcher = Fetcher(PDFCache(self.directory))
+        fetcher.fetch(self.base + '/resume.pdf')
+        fetcher.fetch(self.base + '/other.pdf')
+        files = [name for _, _, names in os.walk(os.path.join(self.directory, 'objects')) for name in names]
+        self.assertEqual(len(files), 1)
+
+    def test_errors(self):
+        fetcher = Fetcher(retries=0)
+        with self.assertRaises(FetchError):
+            fetcher.fetch(self.base + '/missing.pdf')
+        with self.assertRaises(PDFTooLargeError):
+            Fetcher(maxBytes=4).fetch(self.base + '/resume.pdf')
+        self.assertEqual(fetcher.metrics()['errors'], 1)
+
+    def test_allowed_hosts(self):
+        address = f'127.0.0.1:{self.server.server_address[1]}'
+        fetcher = Fetcher(retries=0, allowedHosts={address}, allowedSchemes=('http',))
+        self.assertEqual(fetcher.fetch(self.base + '/resume.pdf'), PDF)
+        with self.assertRaises(URLNotAllowedError):
+            fetcher.fetch(self.base.replace('127.0.0.1', 'localhost') + '/resume.pdf')
+        # A redirect is not followed, it could lead to any host
+        with self.assertRaises(FetchError):
+            fetcher.fetch(self.base + '/redirect.pdf')
+        with self.assertRaises(URLNotAllowedError):
+            Fetcher(allowedHosts={address}).fetch(self.base + '/resume.pdf')
+        with self.assertRaises(URLNotAllowedError):
+            Fetcher(allowedHosts={'127.0.0.1'}, allowedSchemes=('http',)).fetch(self.base + '/resume.pdf')
+
+    def test_fetch_many(self):
+        results = Fetcher().fetch_many([self.base + '/resume.pdf', self.base + '/missing.pdf'])
+        self.assertEqual(results[0], PDF)
+        self.assertIsInstance(results[1], Exception)
+
+    def test_async_bounded_concurrency(self):
+        fetcher = AsyncFetcher(Fetcher(), concurrency=2)
+
+        async def fetch_all():
+            return await fetcher.fetch_many([self.base + '/slow.pdf'] * 4)
+
+        start = time.monotonic()
+        results = asyncio.run(fetch_all())
+        self.assertEqual(results, [PDF] * 4)
+        # Two waves of two
+        self.assertGreaterEqual(time.monotonic() - start, 0.4)
+
+
+if __name__ == '__main__':
+    unittest.main()
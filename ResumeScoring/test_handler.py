@@ -0,0 +1,166 @@
+import io
+import subprocess
+import sys
+import unittest
+from unittest.mock import patch, MagicMock
+import handler
+from handler import app
+from index import ResumeIndex
+from test_ingest import make_pdf
+
+JOB_DESCRIPTION = 'We need a Python developer with Django experience. Python and Django are required.'
+
+
+class HandlerTestCase(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.app = app.test_client()
+        cls.app.testing = True
+
+    def setUp(self):
+        handler.warm_up()
+        self.fetcher = MagicMock()
+        patcher = patch('handler.fetcher', self.fetcher)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_import_does_no_work(self):
+        code = ('import handler; '
+                'assert handler.fetcher is None and handler.parsePool is None and handler.startupSeconds is None')
+        subprocess.run([sys.executable, '-c', code], check=True, capture_output=True)
+
+    def test_score_text(self):
+        response = self.app.post('/score', json={'jobDescription': JOB_DESCRIPTION, 'resumeText': 'Django and Python'})
+        self.assertEqual(response.status_code, 200)
+        data = response.get_json()
+        self.assertEqual(sorted(data['hits']), ['django', 'python'])
+        # 2 of the 5 keywords
+        self.assertEqual(data['score'], 40)
+        self.assertIn('Python', data['keywords'])
+
+    def test_score_resume_does_not_print(self):
+        output = io.StringIO()
+        with patch('sys.stdout', output):
+            result = handler.score_resume('Django and Python', JOB_DESCRIPTION)
+        self.assertEqual((result['score'], sorted(result['hits'])), (40, ['django', 'python']))
+        self.assertEqual(output.getvalue(), '')
+
+    def test_score_modes(self):
+        for mode in ('binary', 'yake', 'tfidf', 'bm25'):
+            response = self.app.post('/score', json={'jobDescription': JOB_DESCRIPTION, 'resumeText': 'Django and Python',
+                                                     'mode': mode})
+            data = response.get_json()
+            self.assertEqual(data['mode'], mode)
+            self.assertEqual(sorted(data['breakdown']), ['django', 'python'])
+        response = self.app.post('/score', json={'jobDescription': JOB_DESCRIPTION, 'resumeText': 'Python', 'mode': 'magic'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_rank_with_index_stats(self):
+        index = ResumeIndex()
+        index.add_many([(index, 'Python developer') for index in range(9)] + [(9, 'Django developer')])
+        with patch('handler.resumeIndex', index):
+            response = self.app.post('/rank', json={'jobDescription': JOB_DESCRIPTION, 'mode': 'bm25', 'resumes': [
+                {'id': 'python', 'text': 'Python'},
+                {'id': 'django', 'text': 'Django'},
+            ]})
+        # Django is rarer than Python in the resume store
+        self.assertEqual([resume['id'] for resume in response.get_json()['ranked']], ['django', 'python'])
+
+    def test_rank_with_an_empty_index(self):
+        with patch('handler.resumeIndex', ResumeIndex()):
+            response = self.app.post('/rank', json={'jobDescription': JOB_DESCRIPTION, 'mode': 'bm25', 'resumes': [
+                {'id': 'python', 'text': 'Python'},
+                {'id': 'none', 'text': 'Java'},
+            ]})
+        ranked = response.get_json()['ranked']
+        self.assertEqual([resume['id'] for resume in ranked], ['python', 'none'])
+        self.assertGreater(ranked[0]['score'], 0)
+
+    def test_score_url(self):
+        self.fetcher.fetch.return_value = make_pdf('Python engineer')
+        response = self.app.post('/score', json={'jobDescription': JOB_DESCRIPTION, 'resumeUrl': 'https://cdn.workonward.com/resume.pdf'})
+        self.assertEqual(response.get_json()['hits'], ['python'])
+        self.fetcher.fetch.assert_called_once_with('https://cdn.workonward.com/resume.pdf')
+
+    def test_score_upload(self):
+        response = self.app.post('/score', data={
+            'jobDescription': JOB_DESCRIPTION,
+            'resume': (io.BytesIO(make_pdf('Django')), 'resume.pdf'),
+        }, content_type='multipart/form-data')
+        self.assertEqual(response.get_json()['hits'], ['django'])
+
+    def test_score_errors(self):
+        self.assertEqual(self.app.post('/score', json={'resumeText': 'Python'}).status_code, 400)
+        self.assertEqual(self.app.post('/score', json={'jobDescription': JOB_DESCRIPTION}).status_code, 400)
+        for body in ({'resumeText': 123}, {'resumeText': ['Python']}, {'resumeUrl': {'url': 'x'}}):
+            response = self.app.post('/score', json={'jobDescription': JOB_DESCRIPTION, **body})
+            self.assertEqual(response.status_code, 400, body)
+        for url in ('http://cdn.workonward.com/a.pdf', 'https://169.254.169.254/latest/meta-data',
+                    'https://cdn.workonward.com.evil.com/a.pdf', 'https://cdn.workonward.com@10.0.0.1/a.pdf',
+                    'https://cdn.workonward.com:8080/a.pdf', 'file:///etc/passwd'):
+            response = self.app.post('/score', json={'jobDescription': JOB_DESCRIPTION, 'resumeUrl': url})
+            self.assertEqual(response.status_code, 400, url)
+            response = self.app.post('/rank', json={'jobDescription': JOB_DESCRIPTION, 'resumes': [{'url': url}]})
+            self.assertEqual(response.status_code, 400, url)
+        self.fetcher.fetch.assert_not_called()
+        self.fetcher.fetch_many.assert_not_called()
+        with patch('handler.rank_texts', side_effect=RuntimeError('broken')):
+            response = self.app.post('/score', json={'jobDescription': JOB_DESCRIPTION, 'resumeText': 'Python'})
+        self.assertEqual((response.status_code, response.get_json()['error']), (500, 'Failed to score the resume: broken'))
+        self.fetcher.fetch.side_effect = Exception('404')
+        response = self.app.post('/score', json={'jobDescription': JOB_DESCRIPTION, 'resumeUrl': 'https://cdn.workonward.com/missing.pdf'})
+        self.assertEqual(response.status_code, 502)
+
+    def test_rank(self):
+        self.fetcher.fetch_many.return_value = [make_pdf('Python and Django'), Exception('404')]
+        response = self.app.post('/rank', json={'jobDescription': JOB_DESCRIPTION, 'resumes': [
+            {'id': 'chef', 'text': 'Chef'},
+            {'id': 'dev', 'url': 'https://cdn.workonward.com/dev.pdf'},
+            {'id': 'gone', 'url': 'https://cdn.workonward.com/gone.pdf'},
+            {'id': 'junior', 'text': 'Python'},
+        ]})
+        self.assertEqual(response.status_code, 200)
+        data = response.get_json()
+        self.assertEqual([resume['id'] for resume in data['ranked']], ['dev', 'junior', 'chef'])
+        self.assertEqual([error['id'] for error in data['errors']], ['gone'])
+
+    def test_rank_uploads_and_top(self):
+        self.fetcher.fetch_many.return_value = []
+        response = self.app.post('/rank', data={
+            'jobDescription': JOB_DESCRIPTION,
+            'top': '1',
+            'resumes': [(io.BytesIO(make_pdf('Python')), 'a.pdf'), (io.BytesIO(b'broken'), 'b.pdf'),
+                        (io.BytesIO(make_pdf('Python Django')), 'c.pdf')],
+        }, content_type='multipart/form-data')
+        data = response.get_json()
+        self.assertEqual([resume['id'] for resume in data['ranked']], ['c.pdf'])
+        self.assertEqual([error['id'] for error in data['errors']], ['b.pdf'])
+
+    def test_rank_errors(self):
+        self.assertEqual(self.app.post('/rank', json={'jobDescription': JOB_DESCRIPTION}).status_code, 400)
+        response = self.app.post('/rank', json={'jobDescription': JOB_DESCRIPTION, 'resumes': [{'id': 1}]})
+        self.assertEqual(response.status_code, 400)
+        for resume in ({'id': 'a', 'text': 123}, {'text': {'x': 1}}, {'url': ['https://cdn.workonward.com/a.pdf']},
+                       {'id': {'x': 1}, 'text': 'Python'}):
+            response = self.app.post('/rank', json={'jobDescription': JOB_DESCRIPTION, 'resumes': [resume]})
+            self.assertEqual(response.status_code, 400, resume)
+        self.fetcher.fetch_many.assert_not_called()
+        for top in (0, -5, 'many'):
+            response = self.app.post('/rank', json={'jobDescription': JOB_DESCRIPTION, 'top': top,
+                                                    'resumes': [{'text': 'a'}, {'text': 'b'}]})
+            self.assertEqual(response.status_code, 400, top)
+        with patch('handler.RANK_MAX_RESUMES', 1):
+            response = self.app.post('/rank', json={'jobDescription': JOB_DESCRIPTION,
+                                                    'resumes': [{'text': 'a'}, {'text': 'b'}]})
+        self.assertEqual(response.status_code, 413)
+
+    def test_metrics(self):
+        self.fetcher.metrics.return_value = {'hits': 0}
+        data = self.app.get('/metrics').get_json()
+        self.assertIn('hitRate', data['keywordCache'])
+        self.assertEqual(data['fetcher'], {'hits': 0})
+        self.assertEqual(data['parsePool']['workers'], handler.RANK_WORKERS)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+import os
+import tempfile
+import unittest
+from index import ResumeIndex
+from scoring import ResumeMatrix
+
+resumes = {
+    'a': 'I know Python, Flask and AWS. Python every day.',
+    'b': 'Java developer',
+    'c': 'python, docker, aws',
+}
+
+
+class ResumeIndexTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.index = ResumeIndex()
+        self.index.add_many(resumes.items())
+
+    def test_postings(self):
+        docIds, counts = self.index.postings('Python')
+        self.assertEqual(len(docIds), 2)
+        self.assertEqual(sorted(counts.tolist()), [1, 2])
+        self.assertEqual(self.index.positions('python', 'a'), [2, 6])
+        self.assertEqual(len(self.index.postings('rust')[0]), 0)
+
+    def test_search_matches_resume_matrix(self):
+        keywords = ['Docker', 'Python', 'AWS', 'Kubernetes']
+        expected = [resume for resume in ResumeMatrix.from_texts(resumes.values(), resumes.keys()).rank(keywords)
+                    if resume['hits']]
+        self.assertEqual(self.index.search(keywords), expected)
+        self.assertEqual(self.index.search(keywords, top=1), expected[:1])
+        self.assertEqual(self.index.search(['rust']), [])
+
+    def test_modes_match_resume_matrix(self):
+        matrix = ResumeMatrix.from_texts(resumes.values(), resumes.keys())
+        keywords = [('Python', 0.1), ('AWS', 0.2), ('Docker', 0.4)]
+        for mode in ('yake', 'tfidf', 'bm25'):
+            expected = [resume for resume in matrix.rank(keywords, mode=mode) if resume['hits']]
+            self.assertEqual(self.index.search(keywords, mode=mode), expected)
+
+    def test_stats(self):
+        stats = self.index.stats(['Python', 'rust'])
+        self.assertEqual((stats.documents, stats.averageLength), (3, 14 / 3))
+        self.assertEqual(stats.documentFrequencies, {'python': 2, 'rust': 0})
+        self.index.add('b', 'Rust')
+        self.index.remove('c')
+        stats = self.index.stats(['python', 'rust'])
+        self.assertEqual((stats.documents, stats.averageLength), (2, 5.0))
+        self.assertEqual(stats.documentFrequencies, {'python': 1, 'rust': 1})
+
+    def test_intersect(self):
+        self.assertEqual(sorted(self.index.intersect(['python', 'aws'])), ['a', 'c'])
+        self.assertEqual(self.index.intersect(['python', 'java']), [])
+
+    def test_add_again_replaces_and_remove(self):
+        self.index.add('b', 'Python developer')
+        self.assertEqual(len(self.index), 3)
+        self.assertEqual(sorted(self.index.intersect(['python'])), ['a', 'b', 'c'])
+        self.index.remove('a')
+        self.assertEqual(sorted(self.index.intersect(['python'])), ['b', 'c'])
+        self.assertEqual(len(self.index), 2)
+
+    def test_persistent(self):
+        path = os.path.join(tempfile.mkdtemp(), 'resumes.sqlite')
+        ResumeIndex(path).add_many(resumes.items())
+        index = ResumeIndex(path)
+        self.assertEqual(sorted(index.intersect(['aws'])), ['a', 'c'])
+        index.add('d', 'AWS')
+        self.assertEqual(sorted(index.intersect(['aws'])), ['a', 'c', 'd'])
+
+    def test_handles_sharing_a_file(self):
+        # ex: two workers, or a worker and an ingestion process
+        path = os.path.join(tempfile.mkdtemp(), 'resumes.sqlite')
+        first, second = ResumeIndex(path), ResumeIndex(path)
+        first.add('a', 'Python and Rust')
+        second.add('b', 'Rust and Go')
+        self.assertEqual(sorted(second.intersect(['python'])), ['a'])
+        self.assertEqual(sorted(first.intersect(['rust'])), ['a', 'b'])
+        self.assertEqual(first.stats(['go']).documentFrequencies, {'go': 1})
+        self.assertEqual([resume['id'] for resume in first.search(['go'])], ['b'])
+
+
+if __name__ == '__main__':
+    unittest.main()
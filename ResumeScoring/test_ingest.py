@@ -0,0 +1,89 @@
+import threading
+import time
+import unittest
+import fitz  # PyMuPDF
+from index import ResumeIndex
+from ingest import parse_pdf, parse_many, index_resumes, iter_pages, ParsePool, PDFTooLargeError, PDFTimeoutError
+
+
+def make_pdf(*pages):
+    # A PDF fixture with one page per text
+    with fitz.open() as doc:
+        for text in pages:
+            doc.new_page().insert_text((72, 72), text)
+        return doc.tobytes()
+
+
+def slow_parse(pdf_content, maxPages, maxBytes):
+    if pdf_content == b'slow':
+        time.sleep(60)
+    if pdf_content.startswith(b'sleep '):
+        time.sleep(float(pdf_content.split()[1]))
+        return 'slept'
+    return parse_pdf(pdf_content, maxPages, maxBytes)
+
+
+class IngestTestCase(unittest.TestCase):
+
+    def test_parse_pdf(self):
+        pdf = make_pdf('Python developer', 'Skills: Django')
+        self.assertEqual(list(iter_pages(pdf)), ['Python developer\n', 'Skills: Django\n'])
+        self.assertEqual(parse_pdf(pdf), 'Python developer\nSkills: Django\n')
+
+    def test_limits(self):
+        pdf = make_pdf('first', 'second', 'third')
+        self.assertEqual(parse_pdf(pdf, maxPages=2), 'first\nsecond\n')
+        with self.assertRaises(PDFTooLargeError):
+            parse_pdf(pdf, maxBytes=100)
+
+    def test_parse_many(self):
+        documents = [('a', make_pdf('Python')), ('b', b'not a pdf'), ('c', make_pdf('Java', 'AWS'))]
+        results = {resume.resumeId: resume for resume in parse_many(documents, workers=2)}
+        self.assertEqual(results['a'].text, 'Python\n')
+        self.assertEqual(results['c'].text, 'Java\nAWS\n')
+        self.assertIsNone(results['b'].text)
+        self.assertIsNotNone(results['b'].error)
+
+    def test_timeout(self):
+        documents = [('slow', b'slow'), ('a', make_pdf('Python')), ('b', make_pdf('Java'))]
+        start = time.monotonic()
+        results = {resume.resumeId: resume for resume in parse_many(documents, workers=2, timeout=1, parse=slow_parse)}
+        self.assertLess(time.monotonic() - start, 10)
+        self.assertIsInstance(results['slow'].error, PDFTimeoutError)
+        self.assertEqual(results['a'].text, 'Python\n')
+        self.assertEqual(results['b'].text, 'Java\n')
+
+    def test_shared_pool(self):
+        pool = ParsePool(2)
+        try:
+            self.assertEqual([resume.text for resume in parse_many([('a', make_pdf('Python'))], pool=pool)], ['Python\n'])
+            executor = pool.executor()
+            self.assertEqual([resume.text for resume in parse_many([('b', make_pdf('Java'))], pool=pool)], ['Java\n'])
+            self.assertIs(pool.executor(), executor)
+
+            # A timeout of one call kills the pool under another call, whose document is parsed again
+            other = []
+            thread = threading.Thread(target=lambda: other.extend(
+                parse_many([('other', b'sleep 2')], timeout=10, parse=slow_parse, pool=pool)
+            ))
+            thread.start()
+            time.sleep(0.5)
+            results = list(parse_many([('slow', b'slow')], timeout=1, parse=slow_parse, pool=pool))
+            thread.join()
+            self.assertIsInstance(results[0].error, PDFTimeoutError)
+            self.assertEqual([(resume.text, resume.error) for resume in other], [('slept', None)])
+            self.assertEqual(pool.metrics()['restarts'], 1)
+            self.assertIsNot(pool.executor(), executor)
+        finally:
+            pool.close()
+
+    def test_index_resumes(self):
+        index = ResumeIndex()
+        failed = index_resumes(index, [('a', make_pdf('Python')), ('b', b'broken'), ('c', make_pdf('Python'))],
+                               batch=1, workers=1)
+        self.assertEqual([resume.resumeId for resume in failed], ['b'])
+        self.assertEqual(sorted(index.intersect(['python'])), ['a', 'c'])
+
+
+if __name__ == '__main__':
+    unittest.main()
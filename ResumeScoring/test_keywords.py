@@ -0,0 +1,56 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+import keywords
+from keywords import KeywordCache, extract_keyword_scores
+
+JOB_DESCRIPTION = 'We need a Python developer with Django experience. Python and Django are required.'
+
+
+class KeywordCacheTestCase(unittest.TestCase):
+
+    def test_runs_yake_once_per_job_description(self):
+        cache = KeywordCache()
+        with patch('keywords.extract_keyword_scores', wraps=extract_keyword_scores) as extract:
+            first = cache.keywords(JOB_DESCRIPTION)
+            second = cache.keywords(JOB_DESCRIPTION)
+        self.assertEqual(first, second)
+        self.assertEqual(extract.call_count, 1)
+        self.assertEqual(cache.metrics()['hits'], 1)
+
+    def test_parameters_are_part_of_the_key(self):
+        cache = KeywordCache()
+        self.assertEqual(len(cache.keywords(JOB_DESCRIPTION, num_of_keywords=2)), 2)
+        self.assertGreater(len(cache.keywords(JOB_DESCRIPTION)), 2)
+        self.assertEqual(cache.metrics()['misses'], 2)
+
+    def test_evicts_least_recently_used(self):
+        cache = KeywordCache(maxsize=2)
+        for text in ('Python developer', 'Java developer', 'Python developer', 'Rust developer'):
+            cache.keywords(text)
+        self.assertIsNotNone(cache.get(cache.key('Python developer')))
+        self.assertIsNone(cache.get(cache.key('Java developer')))
+
+    def test_persisted_across_instances(self):
+        path = os.path.join(tempfile.mkdtemp(), 'keywords.sqlite')
+        expected = KeywordCache(path=path).keywords(JOB_DESCRIPTION)
+        with patch('keywords.extract_keyword_scores') as extract:
+            self.assertEqual(KeywordCache(path=path).keywords(JOB_DESCRIPTION), expected)
+        extract.assert_not_called()
+
+    def test_scored_keywords(self):
+        cache = KeywordCache()
+        scored = cache.scored_keywords(JOB_DESCRIPTION)
+        self.assertEqual([kw for kw, score in scored], cache.keywords(JOB_DESCRIPTION))
+        self.assertTrue(all(score > 0 for kw, score in scored))
+
+    def test_precompute_keywords(self):
+        with patch('keywords.keywordCache', KeywordCache()) as cache:
+            keywords.precompute_keywords(JOB_DESCRIPTION)
+            keywords.job_keywords(JOB_DESCRIPTION)
+            self.assertEqual(cache.metrics()['hits'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+import unittest
+from scoring import tokenize_words, ResumeMatrix, CorpusStats, rank_resumes
+
+
+class ScoringTestCase(unittest.TestCase):
+
+    def test_tokenize_words(self):
+        text = 'Skills: Python, Flask/Django. Node.js (AWS)!\nCI/CD'
+        self.assertEqual(tokenize_words(text), ['skills', 'python', 'flask', 'django', 'node.js', 'aws', 'ci', 'cd'])
+
+    def test_matrix_counts_words(self):
+        matrix = ResumeMatrix.from_texts(['python python docker', 'java'])
+        self.assertEqual(matrix.counts.shape, (2, 3))
+        self.assertEqual(matrix.counts[0, matrix.vocabulary['python']], 2)
+
+    def test_rank_orders_by_score_with_hits(self):
+        matrix = ResumeMatrix.from_texts(['I know Python, Flask and AWS.', 'Java developer', 'python, docker, aws'],
+                                         ids=['a', 'b', 'c'])
+        ranked = matrix.rank(['Docker', 'Python', 'AWS', 'Kubernetes'])
+        self.assertEqual([resume['id'] for resume in ranked], ['c', 'a', 'b'])
+        # Every keyword found counts 100 / 4 keywords
+        self.assertEqual(ranked[0], {'id': 'c', 'score': 75, 'hits': ['docker', 'python', 'aws'],
+                                     'breakdown': {'docker': 25, 'python': 25, 'aws': 25}})
+        self.assertEqual(ranked[2]['hits'], [])
+
+    def test_rank_top(self):
+        matrix = ResumeMatrix.from_texts(['python', 'python aws', 'java'])
+        self.assertEqual([resume['id'] for resume in matrix.rank(['python', 'aws'], top=2)], [1, 0])
+
+    def test_yake_mode_weighs_relevant_keywords_more(self):
+        matrix = ResumeMatrix.from_texts(['python', 'aws'], ids=['python', 'aws'])
+        ranked = matrix.rank([('Python', 0.1), ('AWS', 0.3)], mode='yake')
+        self.assertEqual([(resume['id'], resume['score']) for resume in ranked], [('python', 75), ('aws', 25)])
+        with self.assertRaises(ValueError):
+            matrix.rank(['python', 'aws'], mode='yake')
+
+    def test_tfidf_mode_favours_rare_keywords(self):
+        matrix = ResumeMatrix.from_texts(['python', 'python', 'python rust', 'rust'], ids=['a', 'b', 'c', 'd'])
+        ranked = matrix.rank(['python', 'rust'], mode='tfidf')
+        self.assertEqual(ranked[0]['id'], 'c')
+        self.assertEqual(ranked[0]['score'], 100)
+        # rust is in fewer resumes than python
+        self.assertEqual(ranked[1]['id'], 'd')
+        self.assertGreater(ranked[1]['score'], ranked[2]['score'])
+
+    def test_bm25_mode(self):
+        matrix = ResumeMatrix.from_texts(['python python python', 'python and many other words here', 'java'],
+                                         ids=['a', 'b', 'c'])
+        ranked = matrix.rank(['python', 'django'], mode='bm25')
+        self.assertEqual([resume['id'] for resume in ranked], ['a', 'b', 'c'])
+        self.assertLess(ranked[0]['score'], 100)
+        self.assertAlmostEqual(sum(ranked[0]['breakdown'].values()), ranked[0]['score'], places=1)
+        self.assertEqual(ranked[2]['score'], 0)
+
+    def test_stats_of_another_corpus(self):
+        pool = ResumeMatrix.from_texts(['python'] * 9 + ['rust'])
+        stats = pool.stats(['python', 'rust'])
+        self.assertEqual((stats.documents, stats.documentFrequencies), (10, {'python': 9, 'rust': 1}))
+        ranked = ResumeMatrix.from_texts(['python', 'rust'], ids=['p', 'r']).rank(['python', 'rust'], mode='bm25', stats=stats)
+        self.assertEqual(ranked[0]['id'], 'r')
+
+    def test_stats_without_words(self):
+        stats = CorpusStats(0, 0.0, {})
+        ranked = ResumeMatrix.from_texts(['python'], ids=['p']).rank(['python'], mode='bm25', stats=stats)
+        self.assertGreater(ranked[0]['score'], 0)
+
+    def test_unknown_mode(self):
+        with self.assertRaises(ValueError):
+            ResumeMatrix.from_texts(['python']).rank(['python'], mode='magic')
+
+    def test_no_resumes(self):
+        self.assertEqual(ResumeMatrix.from_texts([]).rank(['python']), [])
+
+    def test_rank_resumes(self):
+        job_description = 'We need a Python developer with Django experience. Python and Django are required.'
+        ranked = rank_resumes(job_description, ['Django and Python developer', 'Chef'], ids=['dev', 'chef'])
+        self.assertEqual([resume['id'] for resume in ranked], ['dev', 'chef'])
+        self.assertIn('python', ranked[0]['hits'])
+
+
+if __name__ == '__main__':
+    unittest.main()